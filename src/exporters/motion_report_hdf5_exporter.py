@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import os
+from typing import Dict
+
+import h5py
+import numpy as np
+
+from src.reports.motion_report import MotionReport
+
+CHUNK_SIZE = 4096
+COMPRESSION = "gzip"
+COMPRESSION_LEVEL = 4
+
+STEP_PARAMETERS_DTYPE = np.dtype([("side", "S5"), ("speed", "f8"), ("height", "f8"), ("length", "f8"),
+								  ("cadence", "f8"), ("frames_duration", "i4"), ("cycle_start", "i4"), ("cycle_stop", "i4")])
+CYCLE_PHASES_DTYPE = np.dtype([("side", "S5"), ("bipodal_1", "f8"), ("monopodal", "f8"), ("bipodal_2", "f8"), ("balance", "f8")])
+
+
+def export(report: MotionReport, report_name: str, output_directory: str) -> None:
+	if not os.path.exists(output_directory):
+		os.makedirs(output_directory)
+
+	output_path = os.path.join(output_directory, f"{report_name}.h5")
+	with h5py.File(output_path, "w") as file:
+		file.attrs["subject_name"] = report.subject_name
+		file.attrs["frame_rate"] = report.frame_rate
+		file.attrs["start_frame"] = report.start_frame
+		file.attrs["end_frame"] = report.end_frame
+
+		_add_all_angles(file.create_group("angles/all_frames"), report)
+		_add_cycle_gait_angles(file.create_group("angles/cycle"), report)
+		_add_gait_cycles(file, report)
+		_add_step_parameters(file, report)
+		_add_gait_indices(file.create_group("gait_indices"), report)
+		_add_events(file.create_group("events"), report)
+		_add_markers(file.create_group("markers"), report)
+		_add_channels(file.create_group("devices"), report)
+		_add_emg_spectral(file.create_group("emg_spectral"), report)
+
+
+def _dataset_name(name: str) -> str:
+	# "/" separates groups in HDF5 paths, so it can not be part of a device, channel or marker name
+	return name.replace("/", "_")
+
+
+def _create_dataset(group: h5py.Group, name: str, data: np.ndarray, **attrs) -> h5py.Dataset:
+	data = np.asarray(data)
+	chunks = (min(max(len(data), 1), CHUNK_SIZE),) + data.shape[1:] if data.ndim else None
+	dataset = group.create_dataset(name, data=data, chunks=chunks, compression=COMPRESSION,
+								   compression_opts=COMPRESSION_LEVEL, shuffle=True)
+	for key, value in attrs.items():
+		dataset.attrs[key] = value
+	return dataset
+
+
+def _add_all_angles(group: h5py.Group, report: MotionReport) -> None:
+	group.attrs["first_frame"] = report.start_frame
+	datasets: Dict[str, h5py.Dataset] = {}
+	for side in ("left", "right"):
+		for joint in ("hip", "knee", "foot"):
+			# Grown window by window, so the angles of the whole recording are never needed at once
+			datasets[f"{side}_{joint}"] = group.create_dataset(f"{side}_{joint}", shape=(0,), maxshape=(None,), dtype=report.dtype, chunks=(CHUNK_SIZE,),
+															   compression=COMPRESSION, compression_opts=COMPRESSION_LEVEL, shuffle=True)
+			datasets[f"{side}_{joint}"].attrs["unit"] = "deg"
+
+	for start_frame, angles in report.iterate_all_frames_angles():
+		for side, side_name in (("L", "left"), ("R", "right")):
+			for joint, values in angles[side].items():
+				dataset = datasets[f"{side_name}_{joint}"]
+				dataset.resize((start_frame + len(values),))
+				dataset[start_frame:] = values
+
+
+def _add_cycle_gait_angles(group: h5py.Group, report: MotionReport) -> None:
+	angles = report.gait_angles_report
+	curves = {"left_hip": angles.left_hip_angles, "left_knee": angles.left_knee_angles, "left_foot": angles.left_foot_angles,
+			  "right_hip": angles.right_hip_angles, "right_knee": angles.right_knee_angles, "right_foot": angles.right_foot_angles,
+			  "reference_hip": report.reference_hip_angles, "reference_knee": report.reference_knee_angles, "reference_foot": report.reference_foot_angles}
+	for name, values in curves.items():
+		_create_dataset(group, name, np.asarray(values, dtype=np.float64), unit="deg", x="gait cycle (%)")
+
+
+def _add_gait_cycles(file: h5py.File, report: MotionReport) -> None:
+	cycle = report.gait_cycle_report
+	rows = [(side.encode(), durations["Bipodal 1"], durations["Monopodal"], durations["Bipodal 2"], durations["Balance"])
+			for side, durations in (("left", cycle.left_phases_percentage_duration), ("right", cycle.right_phases_percentage_duration))]
+	dataset = file.create_dataset("cycle_phases", data=np.array(rows, dtype=CYCLE_PHASES_DTYPE))
+	dataset.attrs["unit"] = "%"
+
+	for side, phases in (("left", cycle.left_cycle_phases), ("right", cycle.right_cycle_phases)):
+		for phase, frame in phases.items():
+			dataset.attrs[f"{side}_{phase.lower()}_frame"] = frame + report.start_frame
+
+
+def _add_step_parameters(file: h5py.File, report: MotionReport) -> None:
+	step = report.gait_step_report
+	rows = [(b"left", step.left_step_speed, step.left_step_height, step.left_step_length, step.left_step_cadence, step.left_step_frames_duration,
+			 report.left_leg.strike_event.frames[0] + report.start_frame, report.left_leg.strike_event.frames[1] + report.start_frame),
+			(b"right", step.right_step_speed, step.right_step_height, step.right_step_length, step.right_step_cadence, step.right_step_frames_duration,
+			 report.right_leg.strike_event.frames[0] + report.start_frame, report.right_leg.strike_event.frames[1] + report.start_frame)]
+	dataset = file.create_dataset("step_parameters", data=np.array(rows, dtype=STEP_PARAMETERS_DTYPE))
+	dataset.attrs["units"] = ["", "mm/s", "mm", "mm", "steps/min", "frames", "frame", "frame"]
+
+
+def _add_gait_indices(group: h5py.Group, report: MotionReport) -> None:
+	gait_index_report = report.get_gait_index_report()
+	group.attrs["overall_gps"] = gait_index_report.overall_gait_profile_score
+	for side, side_name in (("L", "left"), ("R", "right")):
+		side_group = group.create_group(side_name)
+		_create_dataset(side_group, "gvs", gait_index_report.gait_variable_scores[side], unit="deg", columns=["hip", "knee", "foot"])
+		_create_dataset(side_group, "gps", gait_index_report.gait_profile_scores[side], unit="deg")
+		_create_dataset(side_group, "gdi", gait_index_report.gait_deviation_indices[side])
+
+
+def _add_events(group: h5py.Group, report: MotionReport) -> None:
+	for name, event in report.events.items():
+		event_group = group.create_group(_dataset_name(name))
+		event_group.attrs["context"] = event.context
+		event_group.attrs["name"] = event.name
+		event_group.create_dataset("frames", data=np.asarray(event.frames, dtype=np.int32) + report.start_frame)
+		event_group.create_dataset("offsets", data=np.asarray(event.offsets, dtype=np.float64))
+
+
+def _add_markers(group: h5py.Group, report: MotionReport) -> None:
+	group.attrs["first_frame"] = report.start_frame
+	for name, marker in report.markers.items():
+		marker_group = group.create_group(_dataset_name(name))
+		_create_dataset(marker_group, "trajectory", marker.trajectory, unit="mm")
+		_create_dataset(marker_group, "exists", np.asarray(marker.is_exist_trajectory, dtype=bool))
+
+
+def _add_channels(group: h5py.Group, report: MotionReport) -> None:
+	for device_key, device in report.devices.items():
+		device_group = group.create_group(_dataset_name(device_key))
+		device_group.attrs["type"] = device.device_type
+		device_group.attrs["rate"] = device.rate
+		for output in device.outputs:
+			output_group = device_group.require_group(_dataset_name(output.name))
+			for channel in output.channels:
+				_create_dataset(output_group, _dataset_name(channel.name), np.asarray(channel.data, dtype=np.float32), unit=channel.unit, rate=channel.rate)
+
+
+def _add_emg_spectral(group: h5py.Group, report: MotionReport) -> None:
+	emg_spectral_report = report.get_emg_spectral_report()
+	group.attrs["channels"] = emg_spectral_report.channel_names
+	for side, side_name in (("L", "left"), ("R", "right")):
+		side_group = group.create_group(side_name)
+		_create_dataset(side_group, "cycle_times", emg_spectral_report.cycle_times[side], unit="s")
+		# Channels x cycles, so a channel is a row of the dataset
+		_create_dataset(side_group, "median_frequencies", emg_spectral_report.median_frequencies[side], unit="Hz")
+		_create_dataset(side_group, "mean_frequencies", emg_spectral_report.mean_frequencies[side], unit="Hz")
+		_create_dataset(side_group, "median_frequency_slopes", emg_spectral_report.median_frequency_slopes[side], unit="Hz/min")
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import base64
+import html
+import json
+import os
+from typing import List, Dict, Tuple, Any
+
+import numpy as np
+
+from src.exporters.motion_report_pdf_exporter import REFERENCE_PHASES_PERCENT, get_leg_angles
+from src.reports.motion_report import MotionReport, get_channels
+
+# Each level of a trace keeps the minimum and maximum of buckets PYRAMID_FACTOR times larger than the previous level
+PYRAMID_FACTOR = 4
+# Buckets of the coarsest level, about the width of a chart in pixels; it is the only level decoded when the page opens
+OVERVIEW_BUCKETS = 2048
+JOINT_TITLES = {'hip': "Variația amplitudinii unghiului șoldului", 'knee': "Variația amplitudinii unghiului genunchiului",
+				'foot': "Variația amplitudinii unghiului gleznei"}
+JOINT_NAMES = {'hip': "Șold", 'knee': "Genunchi", 'foot': "Picior"}
+SIDE_TITLES = {'L': "Analiza unghiurilor membrului inferior stâng", 'R': "Analiza unghiurilor membrului inferior drept"}
+
+
+def get_min_max_pyramid(values: np.ndarray) -> List[np.ndarray]:
+	"""The samples of a trace, followed by levels of interleaved (minimum, maximum) pairs, down to about OVERVIEW_BUCKETS pairs."""
+	values = np.asarray(values, dtype=np.float32)
+	levels = [values]
+	minimums = maximums = values
+	while len(minimums) > OVERVIEW_BUCKETS:
+		padding = -len(minimums) % PYRAMID_FACTOR
+		# fmin and fmax ignore NaN (gaps and the padding), unless the whole bucket is NaN
+		minimums = np.fmin.reduce(np.pad(minimums, (0, padding), constant_values=np.nan).reshape(-1, PYRAMID_FACTOR), axis=1)
+		maximums = np.fmax.reduce(np.pad(maximums, (0, padding), constant_values=np.nan).reshape(-1, PYRAMID_FACTOR), axis=1)
+		levels.append(np.column_stack((minimums, maximums)).ravel())
+	return levels
+
+
+def _encode(values: np.ndarray) -> str:
+	return base64.b64encode(np.ascontiguousarray(values, dtype='<f4').tobytes()).decode('ascii')
+
+
+def _finite_range(values: np.ndarray) -> List[float]:
+	finite = values[np.isfinite(values)]
+	if not len(finite):
+		return [0.0, 1.0]
+	low, high = float(finite.min()), float(finite.max())
+	return [low, high] if high > low else [low - 1, high + 1]
+
+
+def _nullable(values) -> List[Any]:
+	return [None if not np.isfinite(value) else value for value in np.asarray(values, dtype=np.float64).tolist()]
+
+
+def _add_trace(traces: List[Dict[str, Any]], blocks: List[str], group: str, name: str, unit: str, rate: float, values: np.ndarray) -> None:
+	pyramid = get_min_max_pyramid(values)
+	levels = []
+	for i, level in enumerate(pyramid):
+		block_id = f't{len(traces)}l{i}'
+		levels.append({'id': block_id, 'bucket': PYRAMID_FACTOR ** i})
+		blocks.append(f'<script type="application/octet-stream" id="{block_id}">{_encode(level)}</script>')
+	# The coarsest level has the same extremes as the samples
+	traces.append({'group': group, 'name': name, 'unit': unit, 'rate': float(rate), 'length': len(values), 'levels': levels,
+				   'range': _finite_range(pyramid[-1])})
+
+
+def get_cycles(report: MotionReport) -> List[Dict[str, Any]]:
+	cycles = []
+	for side in ('L', 'R'):
+		leg_angles, reference_angles, reference_deviation, phases = get_leg_angles(report, side)
+		cycles.append({'title': SIDE_TITLES[side], 'phases': [float(phase) for phase in phases], 'referencePhases': REFERENCE_PHASES_PERCENT,
+					   'joints': [{'title': title, 'measured': _nullable(leg_angles[joint]), 'reference': _nullable(reference_angles[joint]),
+								   'deviation': _nullable(reference_deviation[joint]) if reference_deviation[joint] else None}
+								  for joint, title in JOINT_TITLES.items()]})
+	return cycles
+
+
+def get_events(report: MotionReport) -> List[Dict[str, Any]]:
+	return [{'name': name, 'side': event.context[0], 'isStrike': event.name == 'Foot Strike',
+			 'times': [frame / report.frame_rate for frame in event.frames]} for name, event in report.events.items()]
+
+
+def export(report: MotionReport, report_name: str, output_directory: str, export_channels: bool = False) -> None:
+	"""
+	Self contained HTML report, drawn by the browser. The whole trial traces are stored as float32 min/max pyramids in
+	separate blocks, which are only decoded when a zoom level needs them, so the page opens on the overview.
+	"""
+	traces: List[Dict[str, Any]] = []
+	blocks: List[str] = []
+	# The traces are stored in float32 anyway, so the angles are gathered window by window in float32
+	windows: Dict[Tuple[str, str], List[np.ndarray]] = {}
+	for _, angles in report.iterate_all_frames_angles():
+		for side, side_angles in angles.items():
+			for joint, values in side_angles.items():
+				windows.setdefault((side, joint), []).append(values.astype(np.float32))
+	for side, side_name in (('L', 'stâng'), ('R', 'drept')):
+		for joint in JOINT_NAMES:
+			values = np.concatenate(windows.pop((side, joint), [np.empty(0, dtype=np.float32)]))
+			_add_trace(traces, blocks, 'angles', f'{JOINT_NAMES[joint]} {side_name}', 'grade', report.frame_rate, values)
+	if export_channels:
+		for channel in get_channels(report.devices):
+			_add_trace(traces, blocks, 'emg', channel.name, channel.unit, channel.rate, np.asarray(channel.data))
+
+	meta = {'title': report_name, 'subject': report.subject_name, 'startTime': report.start_frame / report.frame_rate,
+			'cycles': get_cycles(report), 'events': get_events(report), 'traces': traces}
+	# "</" would end the script element that holds the JSON
+	meta_json = json.dumps(meta, ensure_ascii=False).replace('</', '<\\/')
+	page = (HTML_TEMPLATE.replace('__TITLE__', html.escape(report_name)).replace('__META__', meta_json)
+			.replace('__BLOCKS__', '\n'.join(blocks)))
+
+	if not os.path.exists(output_directory):
+		os.makedirs(output_directory)
+	with open(os.path.join(output_directory, f"{report_name}.html"), 'w', encoding='utf-8') as file:
+		file.write(page)
+
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="ro">
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+body { font-family: Helvetica, Arial, sans-serif; margin: 16px 24px; color: #222; }
+h1 { font-size: 20px; } h2 { font-size: 16px; margin-top: 28px; }
+canvas { width: 100%; display: block; margin-bottom: 6px; }
+.cycles { display: grid; grid-template-columns: repeat(auto-fit, minmax(420px, 1fr)); gap: 0 24px; }
+.hint { color: #777; font-size: 12px; }
+</style>
+</head>
+<body>
+<h1>__TITLE__</h1>
+<div class="cycles" id="cycles"></div>
+<h2>Unghiurile pe toată proba</h2>
+<p class="hint">Rotița mouse-ului mărește, tragerea deplasează, dublu clic revine la toată proba.</p>
+<div id="angles"></div>
+<div id="emg-section"><h2>Canalele EMG</h2><div id="emg"></div></div>
+<script type="application/json" id="meta">__META__</script>
+__BLOCKS__
+<script>
+"use strict";
+const meta = JSON.parse(document.getElementById("meta").textContent);
+const decoded = {};
+const MARGIN = {left: 52, right: 10, top: 20, bottom: 22};
+const duration = Math.max(1e-3, ...meta.traces.map(t => t.length / t.rate));
+const view = {t0: 0, t1: duration};
+const plots = [];
+
+function level(id) {
+  // A level is decoded the first time a zoom needs it
+  if (!decoded[id]) {
+    const text = atob(document.getElementById(id).textContent);
+    const bytes = new Uint8Array(text.length);
+    for (let i = 0; i < text.length; i++) bytes[i] = text.charCodeAt(i);
+    decoded[id] = new Float32Array(bytes.buffer);
+  }
+  return decoded[id];
+}
+
+function makeCanvas(parent, height) {
+  const canvas = document.createElement("canvas");
+  canvas.style.height = height + "px";
+  parent.appendChild(canvas);
+  return canvas;
+}
+
+function prepare(canvas) {
+  const ratio = window.devicePixelRatio || 1;
+  canvas.width = canvas.clientWidth * ratio;
+  canvas.height = canvas.clientHeight * ratio;
+  const g = canvas.getContext("2d");
+  g.setTransform(ratio, 0, 0, ratio, 0, 0);
+  g.clearRect(0, 0, canvas.clientWidth, canvas.clientHeight);
+  g.font = "11px Helvetica, Arial, sans-serif";
+  return {g, width: canvas.clientWidth - MARGIN.left - MARGIN.right, height: canvas.clientHeight - MARGIN.top - MARGIN.bottom};
+}
+
+function ticks(low, high, count) {
+  const step = Math.pow(10, Math.floor(Math.log10((high - low) / count)));
+  const nice = [1, 2, 5, 10].map(k => k * step).find(s => (high - low) / s <= count);
+  const values = [];
+  for (let v = Math.ceil(low / nice) * nice; v <= high + 1e-9; v += nice) values.push(+v.toFixed(10));
+  return values;
+}
+
+function axes(area, x0, x1, y0, y1, title, xLabel) {
+  const {g, width, height} = area;
+  const X = x => MARGIN.left + (x - x0) / (x1 - x0) * width;
+  const Y = y => MARGIN.top + (1 - (y - y0) / (y1 - y0)) * height;
+  g.strokeStyle = "#444"; g.lineWidth = 1; g.fillStyle = "#222";
+  g.strokeRect(MARGIN.left, MARGIN.top, width, height);
+  g.textAlign = "center"; g.fillText(title, MARGIN.left + width / 2, 13);
+  for (const x of ticks(x0, x1, Math.max(2, width / 70))) g.fillText(x, X(x), MARGIN.top + height + 13);
+  g.textAlign = "right";
+  for (const y of ticks(y0, y1, Math.max(2, height / 30))) g.fillText(y, MARGIN.left - 4, Y(y) + 4);
+  g.textAlign = "left"; g.fillStyle = "#777";
+  if (xLabel) g.fillText(xLabel, MARGIN.left + width - g.measureText(xLabel).width, MARGIN.top + height + 13);
+  g.save(); g.beginPath(); g.rect(MARGIN.left, MARGIN.top, width, height); g.clip();
+  return {X, Y};
+}
+
+function polyline(g, xs, ys, color, dash) {
+  g.strokeStyle = color; g.setLineDash(dash || []); g.beginPath();
+  let drawing = false;
+  for (let i = 0; i < xs.length; i++) {
+    if (ys[i] === null || !isFinite(ys[i])) { drawing = false; continue; }
+    if (drawing) g.lineTo(xs[i], ys[i]); else g.moveTo(xs[i], ys[i]);
+    drawing = true;
+  }
+  g.stroke(); g.setLineDash([]);
+}
+
+function drawCycle(canvas, cycle, joint) {
+  const area = prepare(canvas);
+  const deviation = joint.deviation || joint.reference.map(() => 0);
+  const values = joint.measured.concat(joint.reference.map((v, i) => v - deviation[i]), joint.reference.map((v, i) => v + deviation[i]))
+    .filter(v => v !== null);
+  const low = Math.min(...values), high = Math.max(...values), padding = (high - low) * 0.05 || 1;
+  const {X, Y} = axes(area, 0, 100, low - padding, high + padding, joint.title, "Ciclul de mers (procente)");
+  const g = area.g, percent = n => [...Array(n).keys()].map(i => X(i * 100 / (n - 1)));
+  if (joint.deviation) {
+    const n = joint.reference.length, xs = percent(n);
+    g.fillStyle = "rgba(255, 165, 0, 0.2)"; g.beginPath();
+    for (let i = 0; i < n; i++) g.lineTo(xs[i], Y(joint.reference[i] + deviation[i]));
+    for (let i = n - 1; i >= 0; i--) g.lineTo(xs[i], Y(joint.reference[i] - deviation[i]));
+    g.fill();
+  }
+  polyline(g, percent(joint.reference.length), joint.reference.map(v => v === null ? null : Y(v)), "orange", [6, 4]);
+  polyline(g, percent(joint.measured.length), joint.measured.map(v => v === null ? null : Y(v)), "blue");
+  for (const phase of cycle.phases) polyline(g, [X(phase), X(phase)], [MARGIN.top, MARGIN.top + area.height], "blue");
+  for (const phase of cycle.referencePhases) polyline(g, [X(phase), X(phase)], [MARGIN.top, MARGIN.top + area.height], "orange", [5, 7]);
+  g.restore();
+}
+
+function drawTrace(canvas, trace) {
+  const area = prepare(canvas), g = area.g;
+  const title = trace.name + (trace.unit ? " (" + trace.unit + ")" : "");
+  const {X, Y} = axes(area, view.t0 + meta.startTime, view.t1 + meta.startTime, trace.range[0], trace.range[1], title, "Timp (s)");
+  // The coarsest level that still has a bucket per pixel
+  const samplesPerPixel = (view.t1 - view.t0) * trace.rate / area.width;
+  let chosen = trace.levels[0];
+  for (const candidate of trace.levels) if (candidate.bucket <= samplesPerPixel) chosen = candidate;
+  const data = level(chosen.id), bucket = chosen.bucket, pairs = bucket > 1 ? 2 : 1, count = data.length / pairs;
+  const first = Math.max(0, Math.floor(view.t0 * trace.rate / bucket) - 1);
+  const last = Math.min(count, Math.ceil(view.t1 * trace.rate / bucket) + 1);
+  const xs = [], ys = [];
+  for (let i = first; i < last; i++) {
+    const x = X((i + (bucket > 1 ? 0.5 : 0)) * bucket / trace.rate + meta.startTime);
+    if (bucket > 1) { xs.push(x, x); ys.push(Y(data[2 * i]), Y(data[2 * i + 1])); }
+    else { xs.push(x); ys.push(Y(data[i])); }
+  }
+  polyline(g, xs, ys, trace.group === "emg" ? "deepskyblue" : "blue");
+  for (const event of meta.events) {
+    const color = event.side === "L" ? "#d62728" : "#2ca02c";
+    for (const time of event.times) {
+      const x = X(time + meta.startTime);
+      polyline(g, [x, x], [MARGIN.top, MARGIN.top + area.height], color, event.isStrike ? [] : [3, 3]);
+    }
+  }
+  g.restore();
+}
+
+function redraw() {
+  for (const plot of plots) drawTrace(plot.canvas, plot.trace);
+}
+
+let pending = false;
+function schedule() {
+  if (!pending) { pending = true; requestAnimationFrame(() => { pending = false; redraw(); }); }
+}
+
+function timeAt(canvas, clientX) {
+  const rect = canvas.getBoundingClientRect();
+  const fraction = (clientX - rect.left - MARGIN.left) / (rect.width - MARGIN.left - MARGIN.right);
+  return view.t0 + Math.min(1, Math.max(0, fraction)) * (view.t1 - view.t0);
+}
+
+function setView(t0, t1) {
+  const span = Math.min(duration, Math.max(t1 - t0, 20 / Math.max(...meta.traces.map(t => t.rate))));
+  t0 = Math.min(Math.max(0, t0), duration - span);
+  view.t0 = t0; view.t1 = t0 + span;
+  schedule();
+}
+
+function interactive(canvas) {
+  canvas.addEventListener("wheel", e => {
+    e.preventDefault();
+    const time = timeAt(canvas, e.clientX), scale = Math.pow(1.2, Math.sign(e.deltaY));
+    setView(time - (time - view.t0) * scale, time + (view.t1 - time) * scale);
+  }, {passive: false});
+  canvas.addEventListener("mousedown", e => {
+    const start = e.clientX, t0 = view.t0, t1 = view.t1, width = canvas.clientWidth - MARGIN.left - MARGIN.right;
+    const move = m => { const shift = (start - m.clientX) / width * (t1 - t0); setView(t0 + shift, t1 + shift); };
+    const up = () => { window.removeEventListener("mousemove", move); window.removeEventListener("mouseup", up); };
+    window.addEventListener("mousemove", move); window.addEventListener("mouseup", up);
+  });
+  canvas.addEventListener("dblclick", () => setView(0, duration));
+}
+
+const cyclePlots = [];
+for (const cycle of meta.cycles) {
+  const column = document.createElement("div");
+  column.innerHTML = "<h2></h2>";
+  column.firstChild.textContent = cycle.title;
+  document.getElementById("cycles").appendChild(column);
+  for (const joint of cycle.joints) cyclePlots.push([makeCanvas(column, 230), cycle, joint]);
+}
+for (const trace of meta.traces) {
+  const canvas = makeCanvas(document.getElementById(trace.group), trace.group === "emg" ? 110 : 130);
+  interactive(canvas);
+  plots.push({canvas, trace});
+}
+if (!meta.traces.some(t => t.group === "emg")) document.getElementById("emg-section").remove();
+
+function drawAll() {
+  for (const [canvas, cycle, joint] of cyclePlots) drawCycle(canvas, cycle, joint);
+  redraw();
+}
+window.addEventListener("resize", drawAll);
+drawAll();
+</script>
+</body>
+</html>
+"""
@@ -5,113 +5,168 @@ Created on December 2024
 @author: Ghimciuc Ioan
 """
 
+import hashlib
+import io
 import os
-from typing import List
+from concurrent.futures import Executor, Future
+from functools import partial
+from typing import List, Dict, Tuple, Callable, BinaryIO, Union
 
 import numpy as np
 from fpdf import FPDF, XPos, YPos
-from matplotlib import pyplot as plt
-from src.reports.gait_angles_report import get_knee_angles, get_hip_angles, get_foot_angles
-from src.reports.motion_report import MotionReport
+from matplotlib.figure import Figure
+from src.reports.motion_report import MotionReport, get_channels
 from src.utils.body import Leg
-from src.utils.vicon_nexus import Event, Channel
+from src.utils.vicon_nexus import Channel
 
 REFERENCE_PHASES_PERCENT = [12, 50, 62]
 
 
-def add_channel_plots(channels: List[Channel], output_directory: str, start_frame: int, end_frame: int, phases: List[int], vicon_frame_rate: int, phase_duration: int) -> List[str]:
+def get_figure_key(*parts) -> str:
+	"""Hash of everything drawn in a figure, used to reuse it when the report is regenerated."""
+	digest = hashlib.blake2b(digest_size=16)
+	for part in parts:
+		if isinstance(part, str):
+			digest.update(part.encode())
+		else:
+			digest.update(np.ascontiguousarray(part, dtype=np.float64).tobytes())
+		digest.update(b'|')
+	return digest.hexdigest()
+
+
+def render_png(plot: Callable[[BinaryIO], None]) -> bytes:
+	buffer = io.BytesIO()
+	plot(buffer)
+	return buffer.getvalue()
+
+
+def render_figures(report: MotionReport, rendered: Dict[str, bytes], figures: List[Tuple[str, Callable[[BinaryIO], None]]], executor: Executor = None) -> List[bytes]:
+	"""
+	Render the figures that are not in the report's figure cache. The plots are given as functools.partial objects of
+	module level functions, so that they can also be rendered by a process pool executor.
+	"""
+	images: Dict[str, bytes] = {}
+	pending: Dict[str, Future] = {}
+	for key, plot in figures:
+		if key in report.figure_cache:
+			images[key] = report.figure_cache[key]
+		elif executor is not None:
+			pending[key] = executor.submit(render_png, plot)
+		else:
+			images[key] = render_png(plot)
+
+	for key, future in pending.items():
+		images[key] = future.result()
+
+	rendered.update(images)
+	return [images[key] for key, _ in figures]
+
+
+def plot_channels_page(channels: List[Channel], channels_data: List[np.ndarray], start_frame: int, phases: List[int], phase_duration: int, output: Union[str, BinaryIO],
+					   activations: List[List[Tuple[float, float]]] = None) -> None:
 	"""Generate plots for EMG channels with gait phases."""
-	image_paths = []
+	fig = Figure(figsize=(10, 14))
+	axs = fig.subplots(8, 1)
+	for j, (channel, data) in enumerate(zip(channels, channels_data)):
+		# Plot the channel data
+		axs[j].plot(data, label=channel.name, color='deepskyblue')
+		axs[j].set_title(channel.name)
+		axs[j].set_xlabel("Ciclul de mers (cadre EMG)")
+		axs[j].set_ylabel(channel.unit)
+		axs[j].set_xticks([])
+		axs[j].grid(False)
+
+		# Convert gait phases to EMG frames
+		emg_phases = [int((phase - start_frame) * len(data) / phase_duration) for phase in phases]
+		reference_emg_phases = [int(percent / 100 * len(data)) for percent in REFERENCE_PHASES_PERCENT]
+
+		# Draw vertical lines for gait phases
+		for phase in emg_phases:
+			axs[j].axvline(x=phase, color='blue', linestyle='solid', linewidth=1)
+
+		for ref_phase in reference_emg_phases:
+			axs[j].axvline(x=ref_phase, color='orange', linestyle='dashed', linewidth=1.5)
+
+		# Draw the detected muscle activations as bars at the bottom of the plot
+		if activations:
+			for onset, offset in activations[j]:
+				axs[j].axvspan(onset / 100 * len(data), offset / 100 * len(data), ymin=0, ymax=0.06, color='green', alpha=0.7, linewidth=0)
+
+	# Remove unused subplots
+	for k in range(len(channels), 8):
+		fig.delaxes(axs[k])
+
+	fig.tight_layout()
+	fig.savefig(output, format='png')
+
+
+def get_channel_cycle(channel: Channel, start_frame: int, end_frame: int, vicon_frame_rate: float) -> np.ndarray:
+	# Map camera frames to EMG frame indices
+	start_index = int(start_frame * channel.rate / vicon_frame_rate)
+	end_index = int(end_frame * channel.rate / vicon_frame_rate)
+	return channel.data[start_index:end_index + 1]
+
+
+def add_channel_plots(report: MotionReport, rendered: Dict[str, bytes], channels: List[Channel], start_frame: int, end_frame: int, phases: List[int], vicon_frame_rate: int, phase_duration: int,
+					  activations: List[List[Tuple[float, float]]] = None, executor: Executor = None) -> List[bytes]:
+	figures = []
 	for i in range(0, len(channels), 8):
-		fig, axs = plt.subplots(8, 1, figsize=(10, 14))
-		for j, channel in enumerate(channels[i:i + 8]):
-			# Map camera frames to EMG frame indices
-			start_index = int(start_frame * channel.rate / vicon_frame_rate)
-			end_index = int(end_frame * channel.rate / vicon_frame_rate)
-			data = channel.data[start_index:end_index + 1]
-
-			# Plot the channel data
-			axs[j].plot(data, label=channel.name, color='deepskyblue')
-			axs[j].set_title(channel.name)
-			axs[j].set_xlabel("Ciclul de mers (cadre EMG)")
-			axs[j].set_ylabel(channel.unit)
-			axs[j].set_xticks([])
-			axs[j].grid(False)
-
-			# Convert gait phases to EMG frames
-			emg_phases = [int((phase - start_frame) * len(data) / phase_duration) for phase in phases]
-			reference_emg_phases = [int(percent / 100 * len(data)) for percent in REFERENCE_PHASES_PERCENT]
-
-			# Draw vertical lines for gait phases
-			for phase in emg_phases:
-				axs[j].axvline(x=phase, color='blue', linestyle='solid', linewidth=1)
-
-			for ref_phase in reference_emg_phases:
-				axs[j].axvline(x=ref_phase, color='orange', linestyle='dashed', linewidth=1.5)
-
-		# Remove unused subplots
-		for k in range(len(channels[i:i + 8]), 8):
-			fig.delaxes(axs[k])
-
-		plt.tight_layout()
-		# start_frame and end_frame ensure the uniqueness of the name of the image, otherwise the pdf will show the same photo
-		image_path = os.path.join(output_directory, f"{start_frame} {end_frame} channels_page_{i // 8 + 1}.png")
-		plt.savefig(image_path)
-		plt.close(fig)
-		image_paths.append(image_path)
-
-	return image_paths
-
-
-def process_channels(report: MotionReport, output_directory: str, leg: Leg, phase_duration: int, leg_phases: List[int], title: str, pdf: FPDF):
-	channels = []
-	for device in report.devices.values():
-		for output in device.outputs:
-			channels.extend(output.channels)
-
-	channel_images = add_channel_plots(
+		page_channels = channels[i:i + 8]
+		page_activations = activations[i:i + 8] if activations else None
+		page_data = [get_channel_cycle(channel, start_frame, end_frame, vicon_frame_rate) for channel in page_channels]
+
+		key = get_figure_key('channels', [start_frame, phase_duration], phases,
+							 *[part for channel, data in zip(page_channels, page_data) for part in (channel.name, channel.unit, data)],
+							 *(np.asarray(intervals).ravel() for intervals in page_activations or []))
+		figures.append((key, partial(plot_channels_page, page_channels, page_data, start_frame, phases, phase_duration, activations=page_activations)))
+
+	return render_figures(report, rendered, figures, executor)
+
+
+def get_leg_cycle(report: MotionReport, side: str) -> Tuple[Leg, List[int], int]:
+	if side.upper().startswith('L'):
+		return report.left_leg, list(report.gait_cycle_report.left_cycle_phases.values()), report.gait_cycle_report.left_total_frame_duration
+	return report.right_leg, list(report.gait_cycle_report.right_cycle_phases.values()), report.gait_cycle_report.right_total_frame_duration
+
+
+def render_leg_channels(report: MotionReport, rendered: Dict[str, bytes], side: str, executor: Executor = None) -> List[bytes]:
+	leg, leg_phases, phase_duration = get_leg_cycle(report, side)
+	channels = get_channels(report.devices)
+	emg_activation_report = report.get_emg_activation_report()
+	activations = [emg_activation_report.get_intervals(i, side) for i in range(len(channels))]
+
+	return add_channel_plots(
+		report=report,
+		rendered=rendered,
 		channels=channels,
-		output_directory=output_directory,
 		start_frame=leg.strike_event.frames[0],
 		end_frame=leg.strike_event.frames[1],
 		phases=leg_phases,
 		vicon_frame_rate=report.frame_rate,
 		phase_duration=phase_duration,
+		activations=activations,
+		executor=executor,
 	)
 
-	# Add images to the PDF
-	for image_path in channel_images:
-		pdf.add_page()
-		pdf.cell(0, 0, title, new_x=XPos.LMARGIN, new_y=YPos.TOP, align="C")
-		pdf.image(image_path, x=0, y=15, w=200)
-		os.remove(image_path)
 
+def _add_channels(report: MotionReport, pdf: FPDF, rendered: Dict[str, bytes]):
+	for side, title in (('L', "Membrul inferior stâng"), ('R', "Membrul inferior drept")):
+		for image in render_leg_channels(report, rendered, side):
+			pdf.add_page()
+			pdf.cell(0, 0, title, new_x=XPos.LMARGIN, new_y=YPos.TOP, align="C")
+			pdf.image(io.BytesIO(image), x=0, y=15, w=200)
 
-def _add_channels(report: MotionReport, pdf: FPDF, output_directory: str):
-	process_channels(
-		report=report,
-		output_directory=output_directory,
-		leg=report.left_leg,
-		leg_phases=list(report.gait_cycle_report.left_cycle_phases.values()),
-		phase_duration=report.gait_cycle_report.left_total_frame_duration,
-		title="Membrul inferior stâng",
-		pdf=pdf
-	)
 
-	process_channels(
-		report=report,
-		output_directory=output_directory,
-		leg=report.right_leg,
-		leg_phases=list(report.gait_cycle_report.right_cycle_phases.values()),
-		phase_duration=report.gait_cycle_report.right_total_frame_duration,
-		title="Membrul inferior drept",
-		pdf=pdf
-	)
+def get_phase_ticks(phases: List[float]) -> List[int]:
+	"""Ticks every 5 percent of the cycle and at the measured phases, without the ones too close to a phase."""
+	rounded_phases = [round(phase) for phase in phases if phase]
+	return [x for x in range(0, 101, 5) if all(abs(x - phase) >= 3 for phase in rounded_phases)] + rounded_phases
 
 
-def export_plot_leg_angles(angles: dict, reference_angles: dict, phases: List[int], title_prefix: str, output_path: str) -> None:
+def export_plot_leg_angles(angles: dict, reference_angles: dict, phases: List[int], title_prefix: str, output_path: Union[str, BinaryIO], reference_deviation: dict = None) -> None:
 	"""Generates a plot with knee, foot, and hip angles for a specific leg, overlaying real and reference angles."""
-	fig, axs = plt.subplots(3, 1, figsize=(10, 14))
+	fig = Figure(figsize=(10, 14))
+	axs = fig.subplots(3, 1)
 
 	axs[0].plot(angles["hip"], label="Măsurat", color='blue')
 	axs[0].plot(reference_angles["hip"], label="Etalon", linestyle="--", color='orange')
@@ -137,57 +192,65 @@ def export_plot_leg_angles(angles: dict, reference_angles: dict, phases: List[in
 	axs[2].legend()
 	axs[2].grid(False)
 
-	rounded_phases = [round(phase) for phase in phases if phase]
-	xticks = [x for x in range(0, 101, 5) if all(abs(x - phase) >= 3 for phase in rounded_phases)]
+	if reference_deviation:
+		for ax, joint in zip(axs, ("hip", "knee", "foot")):
+			if reference_deviation[joint]:
+				mean = np.asarray(reference_angles[joint])
+				deviation = np.asarray(reference_deviation[joint])
+				ax.fill_between(range(len(mean)), mean - deviation, mean + deviation, color='orange', alpha=0.2, linewidth=0)
 
+	xticks = get_phase_ticks(phases)
 	for ax in axs:
-		ax.set_xticks(xticks + rounded_phases)
+		ax.set_xticks(xticks)
 		for phase in phases:
 			ax.axvline(x=phase, color='blue', linestyle='solid', linewidth=1)
 		for phase in REFERENCE_PHASES_PERCENT:
 			ax.axvline(x=phase, color='orange', linestyle='dashed', linewidth=1.5, dashes=(5, 7))
 
-	plt.tight_layout()
-	plt.savefig(output_path)
-	plt.close(fig)
+	fig.tight_layout()
+	fig.savefig(output_path, format='png')
 
 
-def _add_angles(report: MotionReport, pdf: FPDF, output_directory: str):
-	left_leg_angles = {
-		"knee": report.gait_angles_report.left_knee_angles,
-		"foot": report.gait_angles_report.left_foot_angles,
-		"hip": report.gait_angles_report.left_hip_angles,
-	}
-	right_leg_angles = {
-		"knee": report.gait_angles_report.right_knee_angles,
-		"foot": report.gait_angles_report.right_foot_angles,
-		"hip": report.gait_angles_report.right_hip_angles,
+def get_leg_angles(report: MotionReport, side: str) -> Tuple[Dict[str, List[float]], Dict[str, List[float]], Dict[str, List[float]], List[float]]:
+	"""Measured angles, reference angles and deviations by joint, and the measured phases in percent of the cycle."""
+	side = 'left' if side.upper().startswith('L') else 'right'
+	leg, cycle_phases, total_frame_duration = get_leg_cycle(report, side)
+	leg_angles = {
+		"knee": getattr(report.gait_angles_report, f"{side}_knee_angles"),
+		"foot": getattr(report.gait_angles_report, f"{side}_foot_angles"),
+		"hip": getattr(report.gait_angles_report, f"{side}_hip_angles"),
 	}
 	reference_angles = {
 		"knee": report.reference_knee_angles,
 		"foot": report.reference_foot_angles,
 		"hip": report.reference_hip_angles,
 	}
+	reference_deviation = {
+		"knee": report.reference_knee_deviation,
+		"foot": report.reference_foot_deviation,
+		"hip": report.reference_hip_deviation,
+	}
 
-	left_k = 100 / report.gait_cycle_report.left_total_frame_duration
-	right_k = 100 / report.gait_cycle_report.right_total_frame_duration
-	left_phases: List[int] = [(phase - report.left_leg.strike_event.frames[0]) * left_k for phase in report.gait_cycle_report.left_cycle_phases.values()]
-	right_phases: List[int] = [(phase - report.right_leg.strike_event.frames[0]) * right_k for phase in report.gait_cycle_report.right_cycle_phases.values()]
+	k = 100 / total_frame_duration
+	phases: List[float] = [(phase - leg.strike_event.frames[0]) * k for phase in cycle_phases]
+	return leg_angles, reference_angles, reference_deviation, phases
 
-	pdf.add_page()
-	left_chart_path = os.path.join(output_directory, "left_leg_angles.png")
-	export_plot_leg_angles(left_leg_angles, reference_angles, left_phases, "Left Leg", left_chart_path)
-	pdf.cell(0, 0, f"Analiza unghiurilor membrului inferior stâng", new_x=XPos.LMARGIN, new_y=YPos.TOP, align="C")
-	pdf.image(left_chart_path, x=0, y=15, w=200)
 
-	pdf.add_page()
-	right_chart_path = os.path.join(output_directory, "right_leg_angles.png")
-	export_plot_leg_angles(right_leg_angles, reference_angles, right_phases, "Right Leg", right_chart_path)
-	pdf.cell(0, 0, f"Analiza unghiurilor membrului inferior drept", new_x=XPos.LMARGIN, new_y=YPos.TOP, align="C")
-	pdf.image(right_chart_path, x=0, y=15, w=200)
+def render_leg_angles(report: MotionReport, rendered: Dict[str, bytes], side: str, executor: Executor = None) -> bytes:
+	leg_angles, reference_angles, reference_deviation, phases = get_leg_angles(report, side)
+	title_prefix = "Left Leg" if side.upper().startswith('L') else "Right Leg"
 
-	os.remove(left_chart_path)
-	os.remove(right_chart_path)
+	key = get_figure_key('angles', *[leg_angles[joint] for joint in ("hip", "knee", "foot")], phases,
+						 *[reference_angles[joint] for joint in ("hip", "knee", "foot")], *[reference_deviation[joint] for joint in ("hip", "knee", "foot")])
+	plot = partial(export_plot_leg_angles, leg_angles, reference_angles, phases, title_prefix, reference_deviation=reference_deviation)
+	return render_figures(report, rendered, [(key, plot)], executor)[0]
+
+
+def _add_angles(report: MotionReport, pdf: FPDF, rendered: Dict[str, bytes]):
+	for side, title in (('L', "Analiza unghiurilor membrului inferior stâng"), ('R', "Analiza unghiurilor membrului inferior drept")):
+		pdf.add_page()
+		pdf.cell(0, 0, title, new_x=XPos.LMARGIN, new_y=YPos.TOP, align="C")
+		pdf.image(io.BytesIO(render_leg_angles(report, rendered, side)), x=0, y=15, w=200)
 
 
 def export(report: MotionReport, report_name: str, output_directory: str, export_channels: bool = False) -> None:
@@ -195,10 +258,14 @@ def export(report: MotionReport, report_name: str, output_directory: str, export
 	pdf.set_auto_page_break(auto=True, margin=5)
 	pdf.set_font("Helvetica", "B", 16)
 
-	_add_angles(report, pdf, output_directory)
+	rendered: Dict[str, bytes] = {}
+	_add_angles(report, pdf, rendered)
 
 	if export_channels:
-		_add_channels(report, pdf, output_directory)
+		_add_channels(report, pdf, rendered)
+
+	# Only the figures of this export are kept, so the cache does not grow across regenerations
+	report.figure_cache = rendered
 
 	pdf_output_path = os.path.join(output_directory, f"{report_name}.pdf")
 	pdf.output(pdf_output_path)
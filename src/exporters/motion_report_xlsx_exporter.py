@@ -6,27 +6,31 @@ Created on December 2024
 """
 
 import os
+import numpy as np
 from openpyxl.workbook import Workbook
 from openpyxl.worksheet.worksheet import Worksheet
-from src.reports.gait_angles_report import get_knee_angles, get_hip_angles, get_foot_angles
 from src.reports.motion_report import MotionReport
-from src.utils.body import Leg
-from src.utils.vicon_nexus import Event
 
 
 def export(report: MotionReport, report_name: str, output_directory: str) -> None:
-	workbook = Workbook()
+	# Rows are written to disk as they are appended, instead of keeping a cell object for every value of long recordings
+	workbook = Workbook(write_only=True)
 
-	angles_sheet = workbook.active
-	angles_sheet.title = "Gait Angles Report"
+	angles_sheet = workbook.create_sheet("Gait Angles Report")
 	cycle_sheet = workbook.create_sheet("Gait Cycle Report")
 	step_sheet = workbook.create_sheet("Gait Step Report")
 	all_angles_sheet = workbook.create_sheet("All Gait Angles")
+	gait_index_sheet = workbook.create_sheet("Gait Index Report")
+	emg_activation_sheet = workbook.create_sheet("EMG Activation")
+	emg_spectral_sheet = workbook.create_sheet("EMG Spectral")
 
 	_add_all_angles_xlsx(all_angles_sheet, report)
 	_add_cycle_gait_angles(angles_sheet, report)
 	_add_gait_cycles(cycle_sheet, report)
 	_add_step_parameters(step_sheet, report)
+	_add_gait_indices(gait_index_sheet, report)
+	_add_emg_activations(emg_activation_sheet, report)
+	_add_emg_spectral(emg_spectral_sheet, report)
 
 	if not os.path.exists(output_directory):
 		os.makedirs(output_directory)
@@ -73,32 +77,48 @@ def _add_step_parameters(sheet: Worksheet, report: MotionReport):
 	sheet.append(["Stop ciclu", report.left_leg.strike_event.frames[1] + report.start_frame, report.right_leg.strike_event.frames[1] + report.start_frame, "frame"])
 
 
-def _add_all_angles_xlsx(sheet: Worksheet, report: MotionReport) -> None:
-	left_leg_strike_event = Event(report.left_leg.strike_event.context, report.left_leg.strike_event.name, [0, -1], [])
-	right_leg_strike_event = Event(report.right_leg.strike_event.context, report.right_leg.strike_event.name, [0, -1], [])
-
-	left_leg = Leg(report.left_leg.side, report.left_leg.markers, left_leg_strike_event, report.left_leg.off_event)
-	right_leg = Leg(report.right_leg.side, report.right_leg.markers, right_leg_strike_event, report.right_leg.off_event)
-
-	left_hip_angles = get_hip_angles(left_leg).tolist()
-	left_knee_angles = get_knee_angles(left_leg).tolist()
-	left_foot_angles = get_foot_angles(left_leg).tolist()
+def _add_gait_indices(sheet: Worksheet, report: MotionReport):
+	gait_index_report = report.get_gait_index_report()
+	sheet.append(["Piciorul", "Ciclul", "GVS Șold", "GVS Genunchi", "GVS Picior", "GPS", "GDI"])
+	for side, side_name in (("L", "stâng"), ("R", "drept")):
+		for cycle, (gait_variable_scores, gait_profile_score, gait_deviation_index) in enumerate(zip(
+				gait_index_report.gait_variable_scores[side].tolist(), gait_index_report.gait_profile_scores[side].tolist(),
+				gait_index_report.gait_deviation_indices[side].tolist())):
+			sheet.append([side_name, cycle + 1, *gait_variable_scores, gait_profile_score, "" if np.isnan(gait_deviation_index) else gait_deviation_index])
+	sheet.append(["GPS total", "", "", "", "", gait_index_report.overall_gait_profile_score])
+
+
+def _add_emg_activations(sheet: Worksheet, report: MotionReport):
+	emg_activation_report = report.get_emg_activation_report()
+	sheet.append(["Canal", "Piciorul", "Ciclul", "Început (% din ciclu)", "Sfârșit (% din ciclu)"])
+	for activation in emg_activation_report.activations:
+		side = "stâng" if activation['side'] == 'L' else "drept"
+		sheet.append([emg_activation_report.channel_names[activation['channel']], side, int(activation['cycle']) + 1,
+					  float(activation['onset']), float(activation['offset'])])
+
+
+def _add_emg_spectral(sheet: Worksheet, report: MotionReport):
+	emg_spectral_report = report.get_emg_spectral_report()
+	sheet.append(["Canal", "Piciorul", "Ciclul", "Timp (s)", "Frecvența mediană (Hz)", "Frecvența medie (Hz)", "Tendința frecvenței mediane (Hz/min)"])
+	for side, side_name in (("L", "stâng"), ("R", "drept")):
+		median_frequencies = emg_spectral_report.median_frequencies[side]
+		mean_frequencies = emg_spectral_report.mean_frequencies[side]
+		for i, channel_name in enumerate(emg_spectral_report.channel_names):
+			slope = emg_spectral_report.median_frequency_slopes[side][i]
+			for cycle, time in enumerate(emg_spectral_report.cycle_times[side].tolist()):
+				if np.isnan(median_frequencies[i, cycle]):
+					continue
+				sheet.append([channel_name, side_name, cycle + 1, time, float(median_frequencies[i, cycle]), float(mean_frequencies[i, cycle]),
+							  "" if np.isnan(slope) else float(slope)])
 
-	right_hip_angles = get_hip_angles(right_leg).tolist()
-	right_knee_angles = get_knee_angles(right_leg).tolist()
-	right_foot_angles = get_foot_angles(right_leg).tolist()
 
+def _add_all_angles_xlsx(sheet: Worksheet, report: MotionReport) -> None:
 	sheet.append(["", "Piciorul stâng", "", "", "Piciorul drept", "", ""])
 	sheet.append(["Frame", "Șold", "Genunchi", "Picior", "Șold", "Genunchi", "Picior"])
 
-	max_len = max(len(left_hip_angles),  len(left_knee_angles), len(left_foot_angles), len(right_hip_angles),  len(right_knee_angles), len(right_foot_angles))
-
-	for i in range(max_len):
-		left_hip = left_hip_angles[i] if i < len(left_hip_angles) else ""
-		left_knee = left_knee_angles[i] if i < len(left_knee_angles) else ""
-		left_foot = left_foot_angles[i] if i < len(left_foot_angles) else ""
-		right_hip = right_hip_angles[i] if i < len(right_hip_angles) else ""
-		right_knee = right_knee_angles[i] if i < len(right_knee_angles) else ""
-		right_foot = right_foot_angles[i] if i < len(right_foot_angles) else ""
-
-		sheet.append([i + report.start_frame, left_hip, left_knee, left_foot, right_hip, right_knee, right_foot])
+	# Only one window of angles is converted to Python numbers at a time
+	for start_frame, angles in report.iterate_all_frames_angles():
+		columns = [angles[side][joint].tolist() for side in ("L", "R") for joint in ("hip", "knee", "foot")]
+		first_frame = start_frame + report.start_frame
+		for row in zip(range(first_frame, first_frame + len(columns[0])), *columns):
+			sheet.append(row)
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import os
+import time
+from typing import List, Dict, Tuple, Iterable, Optional
+
+import numpy as np
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+from matplotlib.layout_engine import TightLayoutEngine
+
+from src.exporters.motion_report_pdf_exporter import (REFERENCE_PHASES_PERCENT, get_figure_key, get_phase_ticks, get_leg_angles, get_leg_cycle,
+													  get_channel_cycle)
+from src.reports.motion_report import MotionReport, get_channels
+
+# A4 portrait, in inches
+PAGE_SIZE = (8.27, 11.69)
+# Area of the charts, below the page title
+PAGE_RECT = (0, 0, 1, 0.97)
+CHANNELS_PER_PAGE = 8
+# Measured phases drawn on every chart: Monopodal, Bipodal, Balance
+PHASES_COUNT = 3
+JOINT_TITLES = {'hip': "Variația amplitudinii unghiului șoldului", 'knee': "Variația amplitudinii unghiului genunchiului",
+				'foot': "Variația amplitudinii unghiului gleznei"}
+SIDE_TITLES = {'L': ("Analiza unghiurilor membrului inferior stâng", "Membrul inferior stâng"),
+			   'R': ("Analiza unghiurilor membrului inferior drept", "Membrul inferior drept")}
+
+
+def get_limits(*curves: np.ndarray, margin: float = 0.05) -> Tuple[float, float]:
+	values = np.concatenate([np.ravel(curve) for curve in curves])
+	values = values[np.isfinite(values)]
+	if not len(values):
+		return -1, 1
+	low, high = float(values.min()), float(values.max())
+	padding = (high - low) * margin or 1
+	return low - padding, high + padding
+
+
+class LegAnglesTemplate:
+	"""
+	Angle page with the reference curves, deviation bands, reference phases, titles, legends and layout drawn once.
+	Each trial only changes the data of the measured curves and phase lines, the ticks and the vertical limits.
+	"""
+
+	def __init__(self, reference_angles: Dict[str, List[float]], reference_deviation: Dict[str, List[float]]):
+		self.figure = Figure(figsize=PAGE_SIZE)
+		self.title = self.figure.suptitle('', fontsize=14, fontweight='bold')
+		self.reference_curves: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+		self.axes = dict(zip(JOINT_TITLES, self.figure.subplots(3, 1)))
+		self.measured_lines = {}
+		self.phase_lines = {}
+		for joint, ax in self.axes.items():
+			mean = np.asarray(reference_angles[joint], dtype=np.float64)
+			deviation = np.asarray(reference_deviation[joint] or np.zeros(len(mean)), dtype=np.float64)
+			self.reference_curves[joint] = (mean - deviation, mean + deviation)
+
+			self.measured_lines[joint], = ax.plot(np.zeros(len(mean)), label="Măsurat", color='blue')
+			ax.plot(mean, label="Etalon", linestyle="--", color='orange')
+			ax.set_title(JOINT_TITLES[joint])
+			ax.set_xlabel("Ciclul de mers (procente)")
+			ax.set_ylabel("Unghi (grade)")
+			ax.legend()
+			ax.grid(False)
+			if reference_deviation[joint]:
+				ax.fill_between(range(len(mean)), mean - deviation, mean + deviation, color='orange', alpha=0.2, linewidth=0)
+
+			self.phase_lines[joint] = [ax.axvline(x=0, color='blue', linestyle='solid', linewidth=1) for _ in range(PHASES_COUNT)]
+			for phase in REFERENCE_PHASES_PERCENT:
+				ax.axvline(x=phase, color='orange', linestyle='dashed', linewidth=1.5, dashes=(5, 7))
+			ax.set_xlim(-5, 104)
+			ax.set_xticks(get_phase_ticks([]))
+
+		# The layout is computed once, since every page has the same titles and labels. Unlike figure.tight_layout(), this
+		# does not leave a layout engine on the figure, which would draw every page twice when it is saved
+		TightLayoutEngine(rect=PAGE_RECT).execute(self.figure)
+
+	def update(self, title: str, angles: Dict[str, List[float]], phases: List[float]) -> None:
+		self.title.set_text(title)
+		xticks = get_phase_ticks(phases)
+		for joint, ax in self.axes.items():
+			values = np.asarray(angles[joint], dtype=np.float64)
+			self.measured_lines[joint].set_data(np.arange(len(values)), values)
+			for line, phase in zip(self.phase_lines[joint], phases):
+				line.set_xdata([phase, phase])
+			ax.set_xticks(xticks)
+			ax.set_ylim(*get_limits(values, *self.reference_curves[joint]))
+
+
+class ChannelsTemplate:
+	"""
+	EMG page for channels_count channels, drawn against the cycle percentage so the reference phases stay fixed
+	whatever the number of samples of a cycle.
+	"""
+
+	def __init__(self, channels_count: int):
+		self.figure = Figure(figsize=PAGE_SIZE)
+		self.title = self.figure.suptitle('', fontsize=14, fontweight='bold')
+		axes = self.figure.subplots(CHANNELS_PER_PAGE, 1)
+		self.axes = list(axes[:channels_count])
+		self.lines = []
+		self.phase_lines = []
+		self.activation_spans = [[] for _ in self.axes]
+		for ax in self.axes:
+			line, = ax.plot([0, 100], [0, 0], color='deepskyblue')
+			self.lines.append(line)
+			# Placeholder texts, so that the layout leaves room for the titles and labels
+			ax.set_title('EMG')
+			ax.set_xlabel("Ciclul de mers (cadre EMG)")
+			ax.set_ylabel('V')
+			ax.set_xticks([])
+			ax.grid(False)
+			self.phase_lines.append([ax.axvline(x=0, color='blue', linestyle='solid', linewidth=1) for _ in range(PHASES_COUNT)])
+			for phase in REFERENCE_PHASES_PERCENT:
+				ax.axvline(x=phase, color='orange', linestyle='dashed', linewidth=1.5)
+			ax.set_xlim(-5, 105)
+
+		# Remove unused subplots
+		for ax in axes[channels_count:]:
+			self.figure.delaxes(ax)
+		TightLayoutEngine(rect=PAGE_RECT).execute(self.figure)
+
+	def update(self, title: str, names: List[str], units: List[str], channels_data: List[np.ndarray], phases: List[float],
+			   activations: Optional[List[List[Tuple[float, float]]]] = None) -> None:
+		self.title.set_text(title)
+		for j, (ax, data) in enumerate(zip(self.axes, channels_data)):
+			ax.set_title(names[j])
+			ax.set_ylabel(units[j])
+			self.lines[j].set_data(np.linspace(0, 100, len(data)), data)
+			for line, phase in zip(self.phase_lines[j], phases):
+				line.set_xdata([phase, phase])
+			ax.set_ylim(*get_limits(data))
+
+			# The activations change with every trial, so their bars are the only artists created per page
+			for span in self.activation_spans[j]:
+				span.remove()
+			self.activation_spans[j] = [ax.axvspan(onset, offset, ymin=0, ymax=0.06, color='green', alpha=0.7, linewidth=0)
+										for onset, offset in (activations[j] if activations else [])]
+
+
+class SessionPdfWriter:
+	"""
+	Writes the angle (and EMG) pages of any number of trials into one PDF. Each page is written to the file as soon
+	as it is drawn, so the memory does not grow with the number of trials, and the figures are reused between pages.
+	"""
+
+	def __init__(self, output_path: str, export_channels: bool = False, title: str = 'Raport de sesiune'):
+		self.output_path: str = output_path
+		self.export_channels: bool = export_channels
+		# Title and drawing time of every page, in seconds
+		self.page_seconds: List[Tuple[str, float]] = []
+		self.file_size: int = 0
+		self.trials_count: int = 0
+		self._pdf = PdfPages(output_path, metadata={'Title': title})
+		self._angles_template: Optional[LegAnglesTemplate] = None
+		self._reference_key: str = ''
+		self._channels_templates: Dict[int, ChannelsTemplate] = {}
+
+	def __enter__(self) -> 'SessionPdfWriter':
+		return self
+
+	def __exit__(self, *exception) -> None:
+		self.close()
+
+	def add_trial(self, report: MotionReport, trial_name: str) -> None:
+		for side in ('L', 'R'):
+			leg_angles, reference_angles, reference_deviation, phases = get_leg_angles(report, side)
+			start = time.perf_counter()
+			template = self._get_angles_template(reference_angles, reference_deviation)
+			title = f'{trial_name} - {SIDE_TITLES[side][0]}'
+			template.update(title, leg_angles, phases)
+			self._write_page(title, template.figure, start)
+
+		if self.export_channels:
+			channels = get_channels(report.devices)
+			emg_activation_report = report.get_emg_activation_report()
+			for side in ('L', 'R'):
+				self._add_channels(report, channels, emg_activation_report, side, trial_name)
+		self.trials_count += 1
+
+	def close(self) -> None:
+		if self._pdf is not None:
+			self._pdf.close()
+			self._pdf = None
+			self.file_size = os.path.getsize(self.output_path)
+
+	def _add_channels(self, report: MotionReport, channels, emg_activation_report, side: str, trial_name: str) -> None:
+		leg, leg_phases, phase_duration = get_leg_cycle(report, side)
+		start_frame, end_frame = leg.strike_event.frames[0], leg.strike_event.frames[1]
+		phases = [(phase - start_frame) * 100 / phase_duration for phase in leg_phases]
+		activations = [emg_activation_report.get_intervals(i, side) for i in range(len(channels))]
+		for i in range(0, len(channels), CHANNELS_PER_PAGE):
+			start = time.perf_counter()
+			page_channels = channels[i:i + CHANNELS_PER_PAGE]
+			template = self._channels_templates.get(len(page_channels))
+			if template is None:
+				template = self._channels_templates[len(page_channels)] = ChannelsTemplate(len(page_channels))
+			title = f'{trial_name} - {SIDE_TITLES[side][1]}'
+			template.update(title, [channel.name for channel in page_channels], [channel.unit for channel in page_channels],
+							[get_channel_cycle(channel, start_frame, end_frame, report.frame_rate) for channel in page_channels],
+							phases, activations[i:i + CHANNELS_PER_PAGE])
+			self._write_page(title, template.figure, start)
+
+	def _get_angles_template(self, reference_angles: Dict[str, List[float]], reference_deviation: Dict[str, List[float]]) -> LegAnglesTemplate:
+		# The reference is usually the same for the whole session; the template is only rebuilt when it changes
+		key = get_figure_key(*[reference_angles[joint] for joint in JOINT_TITLES], *[reference_deviation[joint] for joint in JOINT_TITLES])
+		if self._angles_template is None or key != self._reference_key:
+			self._angles_template = LegAnglesTemplate(reference_angles, reference_deviation)
+			self._reference_key = key
+		return self._angles_template
+
+	def _write_page(self, title: str, figure: Figure, start: float) -> None:
+		self._pdf.savefig(figure)
+		self.page_seconds.append((title, time.perf_counter() - start))
+
+	def __str__(self) -> str:
+		seconds = [page_seconds for _, page_seconds in self.page_seconds]
+		return (f'{self.trials_count} trials, {len(seconds)} pages, {self.file_size / 2 ** 20:.2f} MB, '
+				f'{np.mean(seconds) if seconds else 0:.3f} s per page (max {max(seconds, default=0):.3f} s)')
+
+
+def export_session(trials: Iterable[Tuple[str, MotionReport]], output_path: str, export_channels: bool = False) -> SessionPdfWriter:
+	"""
+	One PDF with the pages of all trials, given as (name, report) pairs. The trials can come from a generator, so only
+	one report has to be in memory at a time.
+	"""
+	with SessionPdfWriter(output_path, export_channels) as writer:
+		for trial_name, report in trials:
+			writer.add_trial(report, trial_name)
+	return writer
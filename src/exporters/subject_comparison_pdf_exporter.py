@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import os
+from typing import List, Dict
+
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+from src.exporters.session_pdf_exporter import PAGE_SIZE, PAGE_RECT, JOINT_TITLES, get_limits
+from src.reports.subject_history import SubjectComparisonReport
+
+SIDE_TITLES = {'L': "Evoluția unghiurilor membrului inferior stâng", 'R': "Evoluția unghiurilor membrului inferior drept"}
+PARAMETER_TITLES = {'speed': "Viteza (mm/s)", 'cadence': "Cadența (pași/min)", 'step_length': "Lungimea pasului (mm)",
+					'step_height': "Înălțimea pasului (mm)", 'step_duration': "Durata pasului (s)", 'bipodal_1': "Bipodal 1 (%)",
+					'monopodal': "Monopodal (%)", 'bipodal_2': "Bipodal 2 (%)", 'balance': "Balans (%)", 'gait_profile_score': "GPS (grade)"}
+# Parameters drawn against the session dates on the trends page
+TREND_PARAMETERS = ('speed', 'cadence', 'step_length', 'monopodal', 'balance', 'gait_profile_score')
+
+
+def get_session_names(report: SubjectComparisonReport) -> List[str]:
+	return [f'{session} {label}'.strip() for session, label in zip(report.sessions, report.labels)]
+
+
+def get_change_text(value: float, change: float, percent_change: float, is_baseline: bool) -> str:
+	if not np.isfinite(value):
+		return '-'
+	if is_baseline or not np.isfinite(change):
+		return f'{value:.2f}'
+	percent = f', {percent_change:+.1f}%' if np.isfinite(percent_change) else ''
+	return f'{value:.2f} ({change:+.2f}{percent})'
+
+
+def plot_curves_page(report: SubjectComparisonReport, side: str, reference_angles: Dict[str, List[float]] = None) -> Figure:
+	fig = Figure(figsize=PAGE_SIZE)
+	fig.suptitle(f'{report.subject_name} - {SIDE_TITLES[side]}', fontsize=14, fontweight='bold')
+	colors = colormaps['viridis'](np.linspace(0, 0.9, len(report.sessions)))
+	names = get_session_names(report)
+	for ax, joint in zip(fig.subplots(3, 1), JOINT_TITLES):
+		curves = report.mean_curves[side][joint]
+		for i, (curve, color, name) in enumerate(zip(curves, colors, names)):
+			is_baseline = report.sessions[i] == report.baseline
+			difference = '' if is_baseline else f' (RMS {report.curve_differences[side][joint][i]:.1f}°)'
+			ax.plot(curve, color=color, linewidth=2.5 if is_baseline else 1.5, linestyle='--' if is_baseline else 'solid', label=name + difference)
+		if reference_angles:
+			ax.plot(reference_angles[joint], color='orange', linestyle=':', label="Etalon")
+		ax.set_title(JOINT_TITLES[joint])
+		ax.set_xlabel("Ciclul de mers (procente)")
+		ax.set_ylabel("Unghi (grade)")
+		ax.set_xlim(0, curves.shape[1] - 1)
+		ax.set_ylim(*get_limits(curves, *([reference_angles[joint]] if reference_angles else [])))
+		ax.legend(fontsize=7)
+	fig.tight_layout(rect=PAGE_RECT)
+	return fig
+
+
+def plot_parameters_page(report: SubjectComparisonReport) -> Figure:
+	fig = Figure(figsize=PAGE_SIZE)
+	fig.suptitle(f'{report.subject_name} - Parametrii pasului față de {report.baseline}', fontsize=14, fontweight='bold')
+	names = get_session_names(report)
+	baseline_index = report.sessions.index(report.baseline)
+	for ax, (side, title) in zip(fig.subplots(2, 1), (('L', "Piciorul stâng"), ('R', "Piciorul drept"))):
+		ax.set_title(title)
+		ax.axis('off')
+		cells = [[get_change_text(report.parameters[side][name][i], report.changes[side][name][i], report.percent_changes[side][name][i], i == baseline_index)
+				  for i in range(len(report.sessions))] for name in PARAMETER_TITLES]
+		table = ax.table(cellText=cells, rowLabels=list(PARAMETER_TITLES.values()), colLabels=names, loc='center', cellLoc='center')
+		table.auto_set_font_size(False)
+		table.set_fontsize(7)
+		table.scale(1, 1.4)
+	fig.tight_layout(rect=PAGE_RECT)
+	return fig
+
+
+def plot_trends_page(report: SubjectComparisonReport) -> Figure:
+	fig = Figure(figsize=PAGE_SIZE)
+	fig.suptitle(f'{report.subject_name} - Evoluția parametrilor', fontsize=14, fontweight='bold')
+	positions = np.arange(len(report.sessions))
+	for ax, name in zip(fig.subplots(3, 2).ravel(), TREND_PARAMETERS):
+		for side, label, color in (('L', "Stâng", 'tab:red'), ('R', "Drept", 'tab:green')):
+			ax.plot(positions, report.parameters[side][name], marker='o', color=color, label=label)
+		ax.set_title(PARAMETER_TITLES[name])
+		ax.set_xticks(positions, report.sessions, rotation=30, fontsize=7)
+		ax.legend(fontsize=7)
+	fig.tight_layout(rect=PAGE_RECT)
+	return fig
+
+
+def export(report: SubjectComparisonReport, report_name: str, output_directory: str, reference_angles: Dict[str, List[float]] = None) -> None:
+	"""Overlaid mean curves of every session, then the parameters with their change from the baseline and their trends."""
+	if not os.path.exists(output_directory):
+		os.makedirs(output_directory)
+
+	with PdfPages(os.path.join(output_directory, f"{report_name}.pdf"), metadata={'Title': report_name}) as pdf:
+		for side in ('L', 'R'):
+			pdf.savefig(plot_curves_page(report, side, reference_angles))
+		pdf.savefig(plot_parameters_page(report))
+		pdf.savefig(plot_trends_page(report))
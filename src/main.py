@@ -5,6 +5,7 @@ Created on November 2024
 @author: Ghimciuc Ioan
 """
 
+import logging
 import os
 import sys
 
@@ -13,18 +14,23 @@ sys.path.append(project_path)
 
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from src.reports.motion_report import MotionReport
+from src.report_pipeline import generate_report, generate_session_reports
+from src.report_service import is_service_running, submit_job
 from src.utils.vicon_nexus import ViconNexusAPI
-from src.exporters import motion_report_pdf_exporter, motion_report_xlsx_exporter
+
+logger = logging.getLogger(__name__)
+
+# How long the GUI waits for a report sent to the report service
+SERVICE_WAIT_SECONDS = 600
 
 
 class ReportGeneratorApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Gait Report Generator - by Ghimciuc Ioan")
-        self.root.geometry("700x200")
-        self.root.minsize(500, 200)
-        self.root.maxsize(900, 200)
+        self.root.geometry("700x295")
+        self.root.minsize(500, 295)
+        self.root.maxsize(900, 295)
 
         self.subject_names = []
         self.vicon_available = False
@@ -72,9 +78,24 @@ class ReportGeneratorApp:
         tk.Label(root, text="Exportă și datele dispozitivelor:").grid(row=4, column=0, padx=5, pady=5, sticky="e")
         tk.Checkbutton(root, variable=self.export_device_data).grid(row=4, column=1, padx=5, pady=5, sticky="w")
 
+        # Checkbox for exporting the full resolution HDF5 file
+        self.export_hdf5 = tk.BooleanVar(value=False)
+        tk.Label(root, text="Exportă și fișierul HDF5:").grid(row=5, column=0, padx=5, pady=5, sticky="e")
+        tk.Checkbutton(root, variable=self.export_hdf5).grid(row=5, column=1, padx=5, pady=5, sticky="w")
+
+        # Checkbox for exporting the interactive HTML report
+        self.export_html = tk.BooleanVar(value=False)
+        tk.Label(root, text="Exportă și raportul HTML interactiv:").grid(row=6, column=0, padx=5, pady=5, sticky="e")
+        tk.Checkbutton(root, variable=self.export_html).grid(row=6, column=1, padx=5, pady=5, sticky="w")
+
+        # Checkbox for generating the reports of all subjects of the trial at once
+        self.all_subjects = tk.BooleanVar(value=False)
+        tk.Label(root, text="Rapoarte pentru toți subiecții:").grid(row=7, column=0, padx=5, pady=5, sticky="e")
+        tk.Checkbutton(root, variable=self.all_subjects).grid(row=7, column=1, padx=5, pady=5, sticky="w")
+
         # Generate Report Button
         self.generate_button = tk.Button(root, text="Generează raportul", command=self.generate_report)
-        self.generate_button.grid(row=5, column=0, columnspan=3, pady=10, padx=10, sticky="ew")
+        self.generate_button.grid(row=8, column=0, columnspan=3, pady=10, padx=10, sticky="ew")
 
         # Disable button if Vicon is not available
         if not self.vicon_available:
@@ -89,7 +110,7 @@ class ReportGeneratorApp:
         self.report_name_entry.insert(0, self.selected_subject.get())
 
     def browse_reference_file(self):
-        file_path = filedialog.askopenfilename(title="Select Reference Angles File", filetypes=[("Excel Files", "*.xlsx")])
+        file_path = filedialog.askopenfilename(title="Select Reference Angles File", filetypes=[("Excel Files", "*.xlsx"), ("Normative Database", "*.db *.sqlite *.sqlite3")])
         if file_path:
             self.reference_file_path.delete(0, tk.END)
             self.reference_file_path.insert(0, file_path)
@@ -106,21 +127,58 @@ class ReportGeneratorApp:
         output_directory = self.output_directory.get()
         report_name = self.report_name_entry.get()
         include_device_data = self.export_device_data.get()
+        include_hdf5 = self.export_hdf5.get()
+        include_html = self.export_html.get()
 
         if not subject_name or not reference_file_path or not output_directory or not report_name:
             messagebox.showwarning("Missing Information", "Please fill out all fields.")
             return
 
+        if self.all_subjects.get():
+            self.generate_session_reports(reference_file_path, output_directory, include_device_data, include_hdf5, include_html)
+            return
+
         try:
-            report = MotionReport(self.vicon, subject_name, reference_file_path)
-            motion_report_pdf_exporter.export(report, report_name, output_directory, include_device_data)
-            motion_report_xlsx_exporter.export(report, report_name, output_directory)
-            messagebox.showinfo("Success", f"Report '{report_name}' generated successfully!")
+            if is_service_running():
+                # A running report service has the libraries and the reference already loaded, so it is used instead
+                job = submit_job({'subject_name': subject_name, 'reference_angles_file_path': reference_file_path, 'report_name': report_name,
+                                  'output_directory': output_directory, 'export_channels': include_device_data, 'export_hdf5': include_hdf5,
+                                  'export_html': include_html}, wait=SERVICE_WAIT_SECONDS)
+                if job['status'] != 'done':
+                    raise RuntimeError(job['error'] or f"The report service did not finish the report in {SERVICE_WAIT_SECONDS} s.")
+                duration, warnings = job['run_seconds'], job['warnings']
+            else:
+                report, scheduler_report = generate_report(self.vicon, subject_name, reference_file_path, report_name, output_directory,
+                                                           export_channels=include_device_data, export_hdf5=include_hdf5, export_html=include_html)
+                logger.info("Report '%s' timings:\n%s", report_name, scheduler_report)
+                duration, warnings = scheduler_report.total_duration, [str(warning) for warning in report.trial_quality_report.warnings]
+            message = f"Report '{report_name}' generated successfully in {duration:.1f} s!"
+            if warnings:
+                message += "\n\nQuality warnings:\n" + "\n".join(warnings[:5])
+            messagebox.showinfo("Success", message)
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
+    def generate_session_reports(self, reference_file_path, output_directory, include_device_data, include_hdf5, include_html):
+        # Each report is named after its subject
+        try:
+            reports, errors, scheduler_report = generate_session_reports(self.vicon, self.subject_names, reference_file_path, output_directory,
+                                                                         export_channels=include_device_data, export_hdf5=include_hdf5, export_html=include_html)
+            logger.info("Session reports timings:\n%s", scheduler_report)
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        message = f"{len(reports)} of {len(self.subject_names)} reports generated in {scheduler_report.total_duration:.1f} s."
+        if errors:
+            message += "\n\n" + "\n".join(f"{subject_name}: {error}" for subject_name, error in errors.items())
+            messagebox.showwarning("Some reports failed", message)
+        else:
+            messagebox.showinfo("Success", message)
+
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     root = tk.Tk()
     app = ReportGeneratorApp(root)
     root.mainloop()
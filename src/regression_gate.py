@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import os
+import sys
+
+project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_path not in sys.path:
+	sys.path.append(project_path)
+
+import argparse
+import fnmatch
+import importlib
+import json
+import platform
+import time
+import tracemalloc
+from typing import List, Dict, Tuple, Callable, Any
+
+import numpy as np
+
+from src.reports.motion_report import MotionReport
+from src.utils.c3d import C3DFile
+from src.utils.synthetic_trial import SyntheticTrial
+
+REFERENCE_ANGLES_FILE_PATH = os.path.join(project_path, 'exports', 'Unghiurile_Perry.xlsx')
+SNAPSHOT_FILE = 'snapshot.npz'
+MANIFEST_FILE = 'manifest.json'
+DEFAULT_ENGINE = 'src.regression_gate:compute_outputs'
+
+Engine = Callable[[Any, str], Dict[str, np.ndarray]]
+
+
+def compute_outputs(vicon, subject_name: str) -> Dict[str, np.ndarray]:
+	"""The clinical numbers of a trial as computed by the current implementation, as named float64 arrays."""
+	report = MotionReport(vicon, subject_name, REFERENCE_ANGLES_FILE_PATH)
+	outputs: Dict[str, np.ndarray] = {}
+	for side, side_name in (('L', 'left'), ('R', 'right')):
+		for joint in ('hip', 'knee', 'foot'):
+			outputs[f'{side} {joint} cycle angles'] = np.asarray(getattr(report.gait_angles_report, f'{side_name}_{joint}_angles'), dtype=np.float64)
+			outputs[f'{side} {joint} all frames angles'] = np.asarray(report.get_all_frames_angles(side)[joint], dtype=np.float64)
+		outputs[f'{side} step parameters'] = np.array([getattr(report.gait_step_report, f'{side_name}_step_{name}')
+													   for name in ('speed', 'height', 'length', 'cadence', 'frames_duration')], dtype=np.float64)
+		durations = getattr(report.gait_cycle_report, f'{side_name}_phases_percentage_duration')
+		outputs[f'{side} cycle phases'] = np.array([durations[phase] for phase in ('Bipodal 1', 'Monopodal', 'Bipodal 2', 'Balance')], dtype=np.float64)
+	return outputs
+
+
+def load_engine(name: str) -> Engine:
+	"""Engine given as "package.module:function", with the same signature as compute_outputs."""
+	module_name, function_name = name.split(':')
+	return getattr(importlib.import_module(module_name), function_name)
+
+
+def make_corpus(c3d_paths: List[str], synthetic_count: int) -> List[Dict[str, Any]]:
+	corpus = [{'type': 'synthetic', 'seed': seed} for seed in range(synthetic_count)]
+	corpus.extend({'type': 'c3d', 'path': os.path.abspath(path)} for path in c3d_paths)
+	return corpus
+
+
+def open_trial(trial: Dict[str, Any]) -> Tuple[Any, str]:
+	vicon = SyntheticTrial(seed=trial['seed']) if trial['type'] == 'synthetic' else C3DFile(trial['path'])
+	return vicon, vicon.GetSubjectNames()[0]
+
+
+def run_engine(engine: Engine, trial: Dict[str, Any], repeats: int) -> Tuple[Dict[str, np.ndarray], float, int]:
+	"""Outputs, best time of repeats runs and peak traced memory of the engine on a trial. Opening the trial is not measured."""
+	vicon, subject_name = open_trial(trial)
+	tracemalloc.start()
+	try:
+		outputs = engine(vicon, subject_name)
+		peak_bytes = tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+	# tracemalloc slows the allocations down, so the time is measured on separate runs
+	seconds = np.inf
+	for _ in range(repeats):
+		vicon, subject_name = open_trial(trial)
+		start = time.perf_counter()
+		engine(vicon, subject_name)
+		seconds = min(seconds, time.perf_counter() - start)
+	return outputs, seconds, peak_bytes
+
+
+def snapshot(corpus: List[Dict[str, Any]], directory: str, engine_name: str = DEFAULT_ENGINE, repeats: int = 3) -> None:
+	"""Store the outputs, times and memory of the engine on the corpus as the baseline of later checks."""
+	engine = load_engine(engine_name)
+	arrays: Dict[str, np.ndarray] = {}
+	trials = []
+	for i, trial in enumerate(corpus):
+		outputs, seconds, peak_bytes = run_engine(engine, trial, repeats)
+		arrays.update({f'{i}/{name}': values for name, values in outputs.items()})
+		trials.append(dict(trial, seconds=seconds, peak_bytes=peak_bytes))
+
+	if not os.path.exists(directory):
+		os.makedirs(directory)
+	np.savez_compressed(os.path.join(directory, SNAPSHOT_FILE), **arrays)
+	with open(os.path.join(directory, MANIFEST_FILE), 'w') as file:
+		json.dump({'engine': engine_name, 'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+				   'numpy': np.__version__, 'machine': platform.node(), 'trials': trials}, file, indent=2)
+
+
+class RegressionReport:
+	def __init__(self, engine_name: str):
+		self.engine_name: str = engine_name
+		# Largest absolute difference of every output over all trials
+		self.max_deviations: Dict[str, float] = {}
+		self.failures: List[str] = []
+		self.seconds: float = 0
+		self.baseline_seconds: float = 0
+		self.peak_bytes: int = 0
+		self.baseline_peak_bytes: int = 0
+
+	@property
+	def passed(self) -> bool:
+		return not self.failures
+
+	def __str__(self) -> str:
+		lines = [f'Engine: {self.engine_name}']
+		lines.extend(f'{name}: max deviation {deviation:.3g}' for name, deviation in sorted(self.max_deviations.items()))
+		lines.append(f'Time: {self.seconds:.4f} s (baseline {self.baseline_seconds:.4f} s)')
+		lines.append(f'Peak memory: {self.peak_bytes / 2 ** 20:.2f} MB (baseline {self.baseline_peak_bytes / 2 ** 20:.2f} MB)')
+		lines.extend(f'FAILED: {failure}' for failure in self.failures)
+		lines.append('PASSED' if self.passed else 'REJECTED')
+		return '\n'.join(lines)
+
+
+def get_tolerance(name: str, atol: float, tolerances: Dict[str, float]) -> float:
+	"""Tolerance of an output: the first matching pattern of tolerances (e.g. "* angles"), otherwise atol."""
+	return next((tolerance for pattern, tolerance in tolerances.items() if fnmatch.fnmatch(name, pattern)), atol)
+
+
+def check(directory: str, engine_name: str = DEFAULT_ENGINE, atol: float = 1e-9, tolerances: Dict[str, float] = None,
+		  time_tolerance: float = 0.1, memory_tolerance: float = 0.2, repeats: int = 3) -> RegressionReport:
+	"""
+	Run the engine on the corpus of a snapshot and compare it with the snapshot. The engine is rejected if an output
+	differs by more than its tolerance, or if the whole corpus takes more than time_tolerance (relative) longer,
+	or the peak memory grows by more than memory_tolerance (relative).
+	"""
+	tolerances = tolerances or {}
+	with open(os.path.join(directory, MANIFEST_FILE)) as file:
+		manifest = json.load(file)
+	engine = load_engine(engine_name)
+	report = RegressionReport(engine_name)
+
+	with np.load(os.path.join(directory, SNAPSHOT_FILE)) as snapshot_arrays:
+		baseline = {name: snapshot_arrays[name] for name in snapshot_arrays.files}
+
+	for i, trial in enumerate(manifest['trials']):
+		label = f'trial {i} ({trial.get("path", trial.get("seed"))})'
+		try:
+			outputs, seconds, peak_bytes = run_engine(engine, trial, repeats)
+		except Exception as e:
+			report.failures.append(f'{label}: {type(e).__name__}: {e}')
+			continue
+
+		report.seconds += seconds
+		report.baseline_seconds += trial['seconds']
+		report.peak_bytes = max(report.peak_bytes, peak_bytes)
+		report.baseline_peak_bytes = max(report.baseline_peak_bytes, trial['peak_bytes'])
+
+		expected_names = {name.split('/', 1)[1] for name in baseline if name.startswith(f'{i}/')}
+		for name in sorted(expected_names - set(outputs)):
+			report.failures.append(f'{label}: output "{name}" is missing')
+		for name in sorted(expected_names & set(outputs)):
+			expected = baseline[f'{i}/{name}']
+			values = np.asarray(outputs[name], dtype=np.float64)
+			if values.shape != expected.shape:
+				report.failures.append(f'{label}: "{name}" has shape {values.shape} instead of {expected.shape}')
+				continue
+
+			differences = np.abs(values - expected)
+			# NaN is equal to NaN, but not to a number
+			differences[np.isnan(values) & np.isnan(expected)] = 0
+			differences[np.isnan(values) != np.isnan(expected)] = np.inf
+			deviation = float(differences.max()) if differences.size else 0.0
+			report.max_deviations[name] = max(report.max_deviations.get(name, 0.0), deviation)
+			tolerance = get_tolerance(name, atol, tolerances)
+			if deviation > tolerance:
+				report.failures.append(f'{label}: "{name}" differs by {deviation:.3g} (tolerance {tolerance:.3g})')
+
+	if report.seconds > report.baseline_seconds * (1 + time_tolerance):
+		report.failures.append(f'the corpus took {report.seconds:.4f} s, more than {1 + time_tolerance:.2f} x {report.baseline_seconds:.4f} s')
+	if report.peak_bytes > report.baseline_peak_bytes * (1 + memory_tolerance):
+		report.failures.append(f'the peak memory is {report.peak_bytes / 2 ** 20:.2f} MB, more than '
+							   f'{1 + memory_tolerance:.2f} x {report.baseline_peak_bytes / 2 ** 20:.2f} MB')
+	return report
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Equivalence and performance gate of the report computations. Runs offline, without Nexus.')
+	commands = parser.add_subparsers(dest='command', required=True)
+	snapshot_parser = commands.add_parser('snapshot', help='Record the baseline outputs, time and memory.')
+	snapshot_parser.add_argument('directory')
+	snapshot_parser.add_argument('--c3d', nargs='*', default=[], help='Recorded trials to add to the corpus.')
+	snapshot_parser.add_argument('--synthetic', type=int, default=5, help='Number of synthetic trials in the corpus.')
+	snapshot_parser.add_argument('--engine', default=DEFAULT_ENGINE)
+	snapshot_parser.add_argument('--repeats', type=int, default=3)
+	check_parser = commands.add_parser('check', help='Compare an engine with the baseline.')
+	check_parser.add_argument('directory')
+	check_parser.add_argument('--engine', default=DEFAULT_ENGINE)
+	check_parser.add_argument('--atol', type=float, default=1e-9)
+	check_parser.add_argument('--tolerance', action='append', default=[], help='Tolerance of the matching outputs, e.g. "*angles=1e-6".')
+	check_parser.add_argument('--time-tolerance', type=float, default=0.1)
+	check_parser.add_argument('--memory-tolerance', type=float, default=0.2)
+	check_parser.add_argument('--repeats', type=int, default=3)
+	arguments = parser.parse_args()
+
+	if arguments.command == 'snapshot':
+		snapshot(make_corpus(arguments.c3d, arguments.synthetic), arguments.directory, arguments.engine, arguments.repeats)
+		print(f'Snapshot saved to {arguments.directory}')
+	else:
+		pattern_tolerances = {pattern: float(value) for pattern, value in (tolerance.rsplit('=', 1) for tolerance in arguments.tolerance)}
+		regression_report = check(arguments.directory, arguments.engine, arguments.atol, pattern_tolerances,
+								  arguments.time_tolerance, arguments.memory_tolerance, arguments.repeats)
+		print(regression_report)
+		sys.exit(0 if regression_report.passed else 1)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import date
+from functools import partial
+from typing import List, Dict, Tuple, Callable, Any, Optional, Union
+
+import numpy as np
+
+from src.exporters import motion_report_pdf_exporter, motion_report_xlsx_exporter, motion_report_hdf5_exporter, motion_report_html_exporter
+from src.reports.motion_report import MotionReport
+from src.reports.subject_history import SubjectHistoryDatabase
+from src.utils.shared_trial import SharedTrialMemory, enable_shared_arrays
+from src.utils.task_scheduler import TaskScheduler, SchedulerReport
+from src.utils.vicon_nexus import ViconNexusAPI
+
+# Every Nexus call goes through the same connection, so the fetch tasks share this lock
+NEXUS_LOCK = 'nexus'
+# Tasks shared by the reports of all the subjects of a capture
+SESSION_TRIAL_INFO = 'trial_info'
+SESSION_DEVICES = 'devices'
+
+
+def add_report_tasks(scheduler: TaskScheduler, report: MotionReport, report_name: str, output_directory: str,
+					 export_channels: bool = False, export_hdf5: bool = False, prefix: str = '', render_executor: Executor = None,
+					 lock: Optional[str] = NEXUS_LOCK, shared: bool = False, export_html: bool = False,
+					 shared_memories: List[SharedTrialMemory] = None, history_path: str = None, session_date: Union[str, date] = None,
+					 session_label: str = '') -> None:
+	"""
+	With shared=True the trial info and the devices are not fetched for this report: its tasks depend on the session
+	tasks added by add_session_tasks instead. With a shared_memories list, the channels are moved to shared memory
+	before their charts are rendered, and the blocks are added to the list so the caller can free them after the run.
+	With a history_path the trial is also stored, as report_name, in the subject history database at that path.
+	"""
+	rendered: Dict[str, bytes] = {}
+
+	def export_pdf(*_) -> None:
+		report.figure_cache = rendered
+		motion_report_pdf_exporter.export(report, report_name, output_directory, export_channels)
+
+	def add_to_history(*_) -> None:
+		# Every task opens its own connection, so the reports of a session are stored concurrently by SQLite
+		database = SubjectHistoryDatabase(history_path)
+		try:
+			database.add_report(report, session_date, report_name, session_label)
+		finally:
+			database.close()
+
+	trial_info = SESSION_TRIAL_INFO if shared else f'{prefix}trial_info'
+	devices = SESSION_DEVICES if shared else f'{prefix}devices'
+	if not shared:
+		scheduler.add_task(trial_info, report.fetch_trial_info, lock=lock)
+	scheduler.add_task(f'{prefix}events', lambda _: report.fetch_events(), [trial_info], lock=lock)
+	scheduler.add_task(f'{prefix}markers', lambda _: report.fetch_markers(), [trial_info], lock=lock)
+	scheduler.add_task(f'{prefix}quality', lambda *_: report.check_quality(), [f'{prefix}events', f'{prefix}markers'])
+	if not shared:
+		# The devices are the slowest fetch, so they wait for the quality check to reject a bad trial early
+		scheduler.add_task(devices, lambda *_: report.fetch_devices(), [trial_info, f'{prefix}quality'], lock=lock)
+	scheduler.add_task(f'{prefix}reference_angles', report.load_reference_angles)
+	scheduler.add_task(f'{prefix}reports', lambda *_: report.compute(), [f'{prefix}quality'])
+	scheduler.add_task(f'{prefix}gait_indices', lambda *_: report.get_gait_index_report(), [f'{prefix}reports', f'{prefix}reference_angles'])
+	scheduler.add_task(f'{prefix}emg_spectral', lambda *_: report.get_emg_spectral_report(), [f'{prefix}reports', devices])
+	channels_dependencies = [f'{prefix}reports', devices]
+	if shared_memories is not None and export_channels and not shared:
+		# The render processes then receive handles to the samples instead of copies of the whole channels
+		scheduler.add_task(f'{prefix}shared_devices', lambda *_: shared_memories.append(SharedTrialMemory(devices=report.devices)), [devices])
+		channels_dependencies.append(f'{prefix}shared_devices')
+
+	charts = []
+	for side in ('L', 'R'):
+		scheduler.add_task(f'{prefix}{side} angles chart', lambda *_, side=side: motion_report_pdf_exporter.render_leg_angles(report, rendered, side, render_executor),
+						   [f'{prefix}reports', f'{prefix}reference_angles'])
+		charts.append(f'{prefix}{side} angles chart')
+		if export_channels:
+			scheduler.add_task(f'{prefix}{side} channels charts', lambda *_, side=side: motion_report_pdf_exporter.render_leg_channels(report, rendered, side, render_executor),
+							   channels_dependencies)
+			charts.append(f'{prefix}{side} channels charts')
+
+	scheduler.add_task(f'{prefix}pdf', export_pdf, charts)
+	scheduler.add_task(f'{prefix}xlsx', lambda *_: motion_report_xlsx_exporter.export(report, report_name, output_directory),
+					   [f'{prefix}reports', f'{prefix}reference_angles', f'{prefix}gait_indices', f'{prefix}emg_spectral'])
+	if export_hdf5:
+		scheduler.add_task(f'{prefix}hdf5', lambda *_: motion_report_hdf5_exporter.export(report, report_name, output_directory),
+						   [f'{prefix}reports', f'{prefix}reference_angles', f'{prefix}gait_indices', f'{prefix}emg_spectral'])
+	if export_html:
+		# Needs no chart, so it is written while the PDF charts are still being rendered
+		scheduler.add_task(f'{prefix}html', lambda *_: motion_report_html_exporter.export(report, report_name, output_directory, export_channels),
+						   [f'{prefix}reports', f'{prefix}reference_angles'] + ([devices] if export_channels else []))
+	if history_path:
+		scheduler.add_task(f'{prefix}history', add_to_history, [f'{prefix}reports', f'{prefix}gait_indices'])
+
+
+def add_session_tasks(scheduler: TaskScheduler, vicon: ViconNexusAPI, reports: List[MotionReport], lock: Optional[str] = NEXUS_LOCK,
+					  shared_memories: List[SharedTrialMemory] = None) -> None:
+	"""Fetch the trial info and the devices of a capture once, for the reports of all its subjects."""
+	def fetch_trial_info() -> None:
+		subject_names = vicon.GetSubjectNames()
+		missing = [report.subject_name for report in reports if report.subject_name not in subject_names]
+		if missing:
+			raise ValueError(f'Subject names {", ".join(missing)} not in Vicon Nexus')
+		frame_rate, (start_frame, end_frame) = vicon.GetFrameRate(), vicon.GetTrialRegionOfInterest()
+		for report in reports:
+			report.set_trial_info(frame_rate, start_frame, end_frame)
+
+	def fetch_devices(_) -> None:
+		devices = vicon.GetDevices(reports[0].dtype)
+		if shared_memories is not None:
+			shared_memories.append(SharedTrialMemory(devices=devices))
+		for report in reports:
+			report.set_devices(devices)
+
+	scheduler.add_task(SESSION_TRIAL_INFO, fetch_trial_info, lock=lock)
+	scheduler.add_task(SESSION_DEVICES, fetch_devices, [SESSION_TRIAL_INFO], lock=lock)
+
+
+def _run_unless_failed(function: Callable[..., Any], errors: Dict[str, Exception], subject_name: str, *arguments) -> Any:
+	if subject_name in errors:
+		return None
+	try:
+		return function(*arguments)
+	except Exception as e:
+		errors.setdefault(subject_name, e)
+
+
+def isolate_failures(scheduler: TaskScheduler, prefix: str, errors: Dict[str, Exception], subject_name: str) -> None:
+	"""Make the tasks of a subject record their first error in errors and skip the rest, so that the other subjects still finish."""
+	for task in scheduler.tasks.values():
+		if task.name.startswith(prefix):
+			task.function = partial(_run_unless_failed, task.function, errors, subject_name)
+
+
+def get_fetch_lock(vicon) -> Optional[str]:
+	# A C3D file is read from memory, so only Nexus needs its calls one at a time
+	return NEXUS_LOCK if isinstance(vicon, ViconNexusAPI) else None
+
+
+def generate_report(vicon: ViconNexusAPI, subject_name: str, reference_angles_file_path: str, report_name: str, output_directory: str,
+					export_channels: bool = False, export_hdf5: bool = False, reference_query: Dict[str, Any] = None,
+					max_workers: int = 4, render_processes: int = 0, render_executor: Executor = None, dtype: np.dtype = np.float64,
+					export_html: bool = False, history_path: str = None, session_date: Union[str, date] = None,
+					session_label: str = '') -> Tuple[MotionReport, SchedulerReport]:
+	"""
+	Fetch, compute and export a report with independent steps running concurrently. Returns the report and the timings of the run.
+	Charts are rendered by the worker threads, or by a pool of render_processes processes when it is greater than 0.
+	A render_executor that outlives the report (e.g. the pool of the report service) can be given instead.
+	With dtype=np.float32 the trial data and the computations on it use half the memory (see MotionReport.check_precision).
+	With export_html=True an interactive HTML report of the whole trial is written next to the PDF. With a history_path
+	the trial is added to the subject history database (see SubjectHistoryDatabase) on session_date, today by default.
+	"""
+	report = MotionReport(vicon, subject_name, reference_angles_file_path, reference_query, make=False, dtype=dtype)
+	scheduler = TaskScheduler(max_workers=max_workers)
+	if render_executor is None and render_processes > 0:
+		# Before the workers start, see enable_shared_arrays
+		enable_shared_arrays()
+	own_render_executor = ProcessPoolExecutor(max_workers=render_processes) if render_executor is None and render_processes > 0 else None
+	render_executor = render_executor if render_executor is not None else own_render_executor
+	shared_memories = [] if isinstance(render_executor, ProcessPoolExecutor) else None
+	try:
+		add_report_tasks(scheduler, report, report_name, output_directory, export_channels, export_hdf5, render_executor=render_executor,
+						 lock=get_fetch_lock(vicon), export_html=export_html, shared_memories=shared_memories, history_path=history_path,
+						 session_date=session_date, session_label=session_label)
+		scheduler.run()
+	finally:
+		if own_render_executor is not None:
+			own_render_executor.shutdown()
+		for shared_memory in shared_memories or []:
+			shared_memory.close()
+	return report, scheduler.report
+
+
+def generate_session_reports(vicon: ViconNexusAPI, subject_names: List[str], reference_angles_file_path: str, output_directory: str,
+							 report_names: Dict[str, str] = None, export_channels: bool = False, export_hdf5: bool = False,
+							 reference_query: Dict[str, Any] = None, max_workers: int = 8, render_processes: int = 0, render_executor: Executor = None,
+							 dtype: np.dtype = np.float64, export_html: bool = False, history_path: str = None, session_date: Union[str, date] = None,
+							 session_label: str = '') -> Tuple[Dict[str, MotionReport], Dict[str, Exception], SchedulerReport]:
+	"""
+	Reports of all the subjects of a capture in one run: the trial info and the devices are fetched once, and the
+	markers, events, computations and exports of the subjects run concurrently. The reports are named after the
+	subjects unless report_names gives other names. A subject whose report fails does not stop the others; returns
+	the reports, the errors by subject and the timings of the run.
+	"""
+	report_names = report_names or {}
+	reports = {subject_name: MotionReport(vicon, subject_name, reference_angles_file_path, reference_query, make=False, dtype=dtype)
+			   for subject_name in subject_names}
+	errors: Dict[str, Exception] = {}
+	lock = get_fetch_lock(vicon)
+	scheduler = TaskScheduler(max_workers=max_workers)
+	if render_executor is None and render_processes > 0:
+		# Before the workers start, see enable_shared_arrays
+		enable_shared_arrays()
+	own_render_executor = ProcessPoolExecutor(max_workers=render_processes) if render_executor is None and render_processes > 0 else None
+	render_executor = render_executor if render_executor is not None else own_render_executor
+	shared_memories = [] if isinstance(render_executor, ProcessPoolExecutor) and export_channels else None
+	try:
+		add_session_tasks(scheduler, vicon, list(reports.values()), lock, shared_memories)
+		for subject_name, report in reports.items():
+			prefix = f'{subject_name}: '
+			add_report_tasks(scheduler, report, report_names.get(subject_name, subject_name), output_directory, export_channels, export_hdf5, prefix,
+							 render_executor, lock, shared=True, export_html=export_html, history_path=history_path, session_date=session_date,
+							 session_label=session_label)
+			isolate_failures(scheduler, prefix, errors, subject_name)
+		scheduler.run()
+	finally:
+		if own_render_executor is not None:
+			own_render_executor.shutdown()
+		for shared_memory in shared_memories or []:
+			shared_memory.close()
+	return {subject_name: report for subject_name, report in reports.items() if subject_name not in errors}, errors, scheduler.report
+
+
+if __name__ == '__main__':
+	vicon: ViconNexusAPI = ViconNexusAPI()
+	motion_report, scheduler_report = generate_report(vicon, vicon.GetSubjectNames()[0], '../exports/Unghiurile_Perry.xlsx',
+													  'Report exemple', '../exports/', export_channels=True)
+	print(scheduler_report)
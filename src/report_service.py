@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import os
+import sys
+
+project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_path not in sys.path:
+	sys.path.append(project_path)
+
+import argparse
+import collections
+import hmac
+import json
+import math
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List, Dict, Any, Optional, BinaryIO
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+from matplotlib.figure import Figure
+
+from src.exporters.motion_report_pdf_exporter import render_png
+from src.report_pipeline import generate_report
+from src.reports.motion_report import load_reference
+from src.utils.c3d import C3DFile
+from src.utils.shared_trial import enable_shared_arrays
+from src.utils.vicon_nexus import ViconNexusAPI
+
+HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+REQUIRED_PARAMETERS = ('subject_name', 'reference_angles_file_path', 'report_name', 'output_directory')
+PRECISIONS = ('float64', 'float32')
+# Every request carries the token the running service wrote for its port, readable only by the user who started it
+TOKEN_HEADER = 'X-Report-Token'
+TOKEN_DIRECTORY = os.path.join(os.path.expanduser('~'), '.vicon_lower_limb_toolkit')
+REQUEST_TIMEOUT_SECONDS = 10
+# Finished jobs kept for GET /jobs; older ones are dropped and only remain in the counts of GET /status
+MAX_FINISHED_JOBS = 100
+
+
+def _draw_warm_up_figure(output: BinaryIO) -> None:
+	figure = Figure(figsize=(2, 1))
+	axes = figure.subplots()
+	axes.plot([0, 1], [0, 1], label='Etalon')
+	axes.set_title('Warm up')
+	axes.legend()
+	figure.savefig(output, format='png')
+
+
+def warm_up() -> None:
+	"""Load the fonts and the Agg backend, so that the first report does not pay for them."""
+	render_png(_draw_warm_up_figure)
+
+
+class ReportJob:
+	def __init__(self, parameters: Dict[str, Any]):
+		self.id: str = uuid.uuid4().hex[:12]
+		self.parameters: Dict[str, Any] = parameters
+		self.status: str = 'queued'
+		self.submitted: float = time.time()
+		self.started: Optional[float] = None
+		self.finished: Optional[float] = None
+		self.error: Optional[str] = None
+		self.outputs: List[str] = []
+		self.warnings: List[str] = []
+		self.timings: Dict[str, float] = {}
+		self.critical_path: List[str] = []
+		self.done = threading.Event()
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {'id': self.id, 'status': self.status, 'parameters': self.parameters, 'error': self.error, 'outputs': self.outputs,
+				'warnings': self.warnings,
+				'queued_seconds': (self.started or time.time()) - self.submitted,
+				'run_seconds': (self.finished or time.time()) - self.started if self.started else None,
+				'task_seconds': self.timings, 'critical_path': self.critical_path}
+
+
+class ReportService:
+	"""
+	Keeps the imports, the fonts and the reference data loaded and runs report jobs from a queue, at most
+	max_concurrent_jobs at a time. Jobs with a c3d_path read the file; the other ones use the trial open in Nexus,
+	one at a time, since Nexus has a single open trial. Only the last max_finished_jobs finished jobs are kept.
+	"""
+
+	def __init__(self, max_concurrent_jobs: int = 2, max_workers: int = 4, render_processes: int = 0, vicon: ViconNexusAPI = None,
+				 max_finished_jobs: int = MAX_FINISHED_JOBS):
+		self.max_concurrent_jobs = max_concurrent_jobs
+		self.max_workers = max_workers
+		self.render_processes = render_processes
+		self.max_finished_jobs = max_finished_jobs
+		# Queued and running jobs, and the last finished ones
+		self.jobs: Dict[str, ReportJob] = {}
+		self.counts: Dict[str, int] = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0}
+		self._finished_job_ids: collections.deque = collections.deque()
+		self._jobs_lock = threading.Lock()
+		self.queue: queue.Queue = queue.Queue()
+		self.render_executor: ProcessPoolExecutor = None
+		self._vicon = vicon
+		self._nexus_lock = threading.Lock()
+		self._threads: List[threading.Thread] = []
+
+	def start(self, reference_files: List[str] = ()) -> None:
+		warm_up()
+		for reference_file in reference_files:
+			load_reference(reference_file, {})
+		if self.render_processes > 0:
+			enable_shared_arrays()
+			self.render_executor = ProcessPoolExecutor(max_workers=self.render_processes)
+			for future in [self.render_executor.submit(warm_up) for _ in range(self.render_processes)]:
+				future.result()
+
+		for i in range(self.max_concurrent_jobs):
+			thread = threading.Thread(target=self._work, name=f'report-job-{i}', daemon=True)
+			thread.start()
+			self._threads.append(thread)
+
+	def stop(self) -> None:
+		for _ in self._threads:
+			self.queue.put(None)
+		for thread in self._threads:
+			thread.join()
+		self._threads = []
+		if self.render_executor is not None:
+			self.render_executor.shutdown()
+
+	def submit(self, parameters: Dict[str, Any]) -> ReportJob:
+		if not isinstance(parameters, dict):
+			raise ValueError('The job parameters must be a JSON object.')
+		missing = [name for name in REQUIRED_PARAMETERS if not parameters.get(name)]
+		if missing:
+			raise ValueError(f'The job is missing the parameters: {", ".join(missing)}.')
+		report_name = parameters['report_name']
+		if not isinstance(report_name, str) or '/' in report_name or '\\' in report_name or report_name in ('.', '..'):
+			raise ValueError('report_name must be a file name, without folders.')
+		if parameters.get('precision', 'float64') not in PRECISIONS:
+			raise ValueError(f'precision must be one of {", ".join(PRECISIONS)}.')
+
+		job = ReportJob(parameters)
+		with self._jobs_lock:
+			self.jobs[job.id] = job
+			self.counts['queued'] += 1
+		self.queue.put(job)
+		return job
+
+	def get_job(self, job_id: str) -> Optional[ReportJob]:
+		with self._jobs_lock:
+			return self.jobs.get(job_id)
+
+	def get_jobs(self) -> List[ReportJob]:
+		with self._jobs_lock:
+			return list(self.jobs.values())
+
+	def get_status(self) -> Dict[str, Any]:
+		with self._jobs_lock:
+			return {'max_concurrent_jobs': self.max_concurrent_jobs, **self.counts}
+
+	def _set_status(self, job: ReportJob, status: str) -> None:
+		with self._jobs_lock:
+			self.counts[job.status] -= 1
+			self.counts[status] += 1
+			job.status = status
+			if status in ('done', 'failed'):
+				self._finished_job_ids.append(job.id)
+				while len(self._finished_job_ids) > self.max_finished_jobs:
+					del self.jobs[self._finished_job_ids.popleft()]
+
+	def _work(self) -> None:
+		while True:
+			job = self.queue.get()
+			if job is None:
+				return
+			try:
+				self._run(job)
+			finally:
+				job.done.set()
+
+	def _run(self, job: ReportJob) -> None:
+		job.started = time.time()
+		self._set_status(job, 'running')
+		parameters = job.parameters
+		try:
+			if parameters.get('c3d_path'):
+				self._generate(job, C3DFile(parameters['c3d_path']))
+			else:
+				with self._nexus_lock:
+					self._generate(job, self._get_vicon())
+			status = 'done'
+		except Exception as e:
+			status = 'failed'
+			job.error = str(e)
+		job.finished = time.time()
+		self._set_status(job, status)
+
+	def _generate(self, job: ReportJob, vicon) -> None:
+		parameters = job.parameters
+		report, scheduler_report = generate_report(vicon, parameters['subject_name'], parameters['reference_angles_file_path'], parameters['report_name'],
+												   parameters['output_directory'], export_channels=bool(parameters.get('export_channels')),
+												   export_hdf5=bool(parameters.get('export_hdf5')), reference_query=parameters.get('reference_query'),
+												   max_workers=self.max_workers, render_executor=self.render_executor, dtype=np.dtype(parameters.get('precision', 'float64')),
+												   export_html=bool(parameters.get('export_html')), history_path=parameters.get('history_path'),
+												   session_date=parameters.get('session_date'), session_label=parameters.get('session_label', ''))
+		job.warnings = [str(warning) for warning in report.trial_quality_report.warnings]
+		job.timings = {name: timing.duration for name, timing in scheduler_report.timings.items()}
+		job.critical_path = scheduler_report.critical_path
+		extensions = ('.pdf', '.xlsx') + (('.h5',) if parameters.get('export_hdf5') else ()) + (('.html',) if parameters.get('export_html') else ())
+		job.outputs = [os.path.abspath(os.path.join(parameters['output_directory'], parameters['report_name'] + extension)) for extension in extensions]
+
+	def _get_vicon(self):
+		if self._vicon is None:
+			self._vicon = ViconNexusAPI()
+		return self._vicon
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+	"""
+	POST /jobs with the report parameters as JSON queues a job. GET /jobs lists the queued, running and last finished
+	jobs, GET /jobs/<id> returns one, waiting up to ?wait=<seconds> for it to finish, and GET /status returns the
+	queue state. Requests need the token of the server in the X-Report-Token header; requests from web pages (with a
+	foreign Origin) are refused.
+	"""
+
+	def do_GET(self) -> None:
+		if not self._is_authorized():
+			return
+		service: ReportService = self.server.service
+		url = urlparse(self.path)
+		parts = [part for part in url.path.split('/') if part]
+		job = service.get_job(parts[1]) if len(parts) == 2 and parts[0] == 'jobs' else None
+		if parts == ['status']:
+			self._send(200, service.get_status())
+		elif parts == ['jobs']:
+			self._send(200, [job.to_dict() for job in service.get_jobs()])
+		elif job is not None:
+			try:
+				wait = float(parse_qs(url.query).get('wait', ['0'])[0])
+			except ValueError:
+				wait = math.nan
+			if not math.isfinite(wait):
+				self._send(400, {'error': 'wait must be a number of seconds.'})
+				return
+			if wait > 0:
+				job.done.wait(wait)
+			self._send(200, job.to_dict())
+		else:
+			self._send(404, {'error': 'Not found'})
+
+	def do_POST(self) -> None:
+		if not self._is_authorized():
+			return
+		if urlparse(self.path).path.rstrip('/') != '/jobs':
+			self._send(404, {'error': 'Not found'})
+			return
+		if self.headers.get_content_type() != 'application/json':
+			self._send(415, {'error': 'The job parameters must be sent as application/json.'})
+			return
+		try:
+			parameters = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+			job = self.server.service.submit(parameters)
+		except ValueError as e:
+			self._send(400, {'error': str(e)})
+			return
+		self._send(202, job.to_dict())
+
+	def _is_authorized(self) -> bool:
+		# Browsers add an Origin header, so a web page can not send jobs even to a service it can reach
+		origin = self.headers.get('Origin')
+		if origin is not None and origin not in self.server.origins:
+			self._send(403, {'error': 'Requests from other origins are not accepted.'})
+			return False
+		if not hmac.compare_digest(self.headers.get(TOKEN_HEADER, '').encode(), self.server.token.encode()):
+			self._send(401, {'error': f'Missing or wrong {TOKEN_HEADER} header.'})
+			return False
+		return True
+
+	def _send(self, code: int, content: Any) -> None:
+		body = json.dumps(content).encode()
+		self.send_response(code)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format: str, *args) -> None:
+		pass
+
+
+def get_token_path(port: int) -> str:
+	return os.path.join(TOKEN_DIRECTORY, f'report_service_{port}.token')
+
+
+def read_token(port: int = DEFAULT_PORT) -> str:
+	try:
+		with open(get_token_path(port)) as file:
+			return file.read().strip()
+	except FileNotFoundError:
+		raise ConnectionError(f'No report service token in "{get_token_path(port)}". Is the service running on port {port}?') from None
+
+
+class ReportServer(ThreadingHTTPServer):
+	"""
+	HTTP server of a service, on localhost only. It writes a new token to get_token_path(port), readable only by the
+	user who started it, and removes it when closed.
+	"""
+
+	def __init__(self, service: ReportService, port: int = DEFAULT_PORT):
+		super().__init__((HOST, port), ReportRequestHandler)
+		self.service = service
+		self.port: int = self.server_address[1]
+		self.origins = {f'http://{HOST}:{self.port}', f'http://localhost:{self.port}'}
+		self.token: str = secrets.token_urlsafe(32)
+		self.token_path: str = get_token_path(self.port)
+		os.makedirs(TOKEN_DIRECTORY, mode=0o700, exist_ok=True)
+		with os.fdopen(os.open(self.token_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as file:
+			file.write(self.token)
+
+	def server_close(self) -> None:
+		super().server_close()
+		try:
+			with open(self.token_path) as file:
+				is_own_token = file.read().strip() == self.token
+			if is_own_token:
+				os.remove(self.token_path)
+		except FileNotFoundError:
+			pass
+
+
+def serve(service: ReportService, port: int = DEFAULT_PORT) -> ReportServer:
+	"""Start the HTTP server of the service on localhost. Call serve_forever() on the returned server."""
+	return ReportServer(service, port)
+
+
+def _request(url: str, port: int, timeout: float, parameters: Dict[str, Any] = None) -> Dict[str, Any]:
+	headers = {TOKEN_HEADER: read_token(port)}
+	if parameters is not None:
+		headers['Content-Type'] = 'application/json'
+	request = urllib.request.Request(url, data=json.dumps(parameters).encode() if parameters is not None else None, headers=headers)
+	with urllib.request.urlopen(request, timeout=timeout) as response:
+		return json.loads(response.read())
+
+
+def submit_job(parameters: Dict[str, Any], port: int = DEFAULT_PORT, wait: float = 0) -> Dict[str, Any]:
+	"""Send a job to a running service. With wait > 0, returns the job when it is done or after wait seconds."""
+	job = _request(f'http://{HOST}:{port}/jobs', port, REQUEST_TIMEOUT_SECONDS, parameters)
+	if wait > 0:
+		return get_job(job['id'], port, wait)
+	return job
+
+
+def get_job(job_id: str, port: int = DEFAULT_PORT, wait: float = 0) -> Dict[str, Any]:
+	return _request(f'http://{HOST}:{port}/jobs/{job_id}?wait={wait}', port, wait + REQUEST_TIMEOUT_SECONDS)
+
+
+def is_service_running(port: int = DEFAULT_PORT, timeout: float = 0.5) -> bool:
+	try:
+		_request(f'http://{HOST}:{port}/status', port, timeout)
+		return True
+	except OSError:
+		return False
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Local report generation service.')
+	commands = parser.add_subparsers(dest='command', required=True)
+	serve_parser = commands.add_parser('serve', help='Start the service.')
+	serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+	serve_parser.add_argument('--jobs', type=int, default=2, help='Reports generated at the same time.')
+	serve_parser.add_argument('--workers', type=int, default=4, help='Worker threads of each report.')
+	serve_parser.add_argument('--render-processes', type=int, default=0, help='Processes that render the charts, shared by all reports.')
+	serve_parser.add_argument('--reference', action='append', default=[], help='Reference file to load at startup.')
+	submit_parser = commands.add_parser('submit', help='Send a report job to a running service.')
+	submit_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+	submit_parser.add_argument('--subject', required=True)
+	submit_parser.add_argument('--reference', required=True)
+	submit_parser.add_argument('--name', required=True)
+	submit_parser.add_argument('--output', required=True)
+	submit_parser.add_argument('--c3d', help='Read the trial from a C3D file instead of Nexus.')
+	submit_parser.add_argument('--channels', action='store_true')
+	submit_parser.add_argument('--hdf5', action='store_true')
+	submit_parser.add_argument('--html', action='store_true', help='Also write the interactive HTML report.')
+	submit_parser.add_argument('--history', help='Also store the trial in this subject history database.')
+	submit_parser.add_argument('--date', help='Session date of the trial in the history (YYYY-MM-DD), today by default.')
+	submit_parser.add_argument('--label', default='', help='Label of the session in the history, e.g. "Pre-op".')
+	submit_parser.add_argument('--precision', choices=PRECISIONS, default='float64')
+	submit_parser.add_argument('--wait', type=float, default=600)
+	arguments = parser.parse_args()
+
+	if arguments.command == 'serve':
+		report_service = ReportService(arguments.jobs, arguments.workers, arguments.render_processes)
+		report_service.start(arguments.reference)
+		http_server = serve(report_service, arguments.port)
+		print(f'Report service listening on http://{HOST}:{arguments.port}')
+		try:
+			http_server.serve_forever()
+		except KeyboardInterrupt:
+			pass
+		finally:
+			http_server.server_close()
+			report_service.stop()
+	else:
+		print(json.dumps(submit_job({'subject_name': arguments.subject, 'reference_angles_file_path': arguments.reference,
+									 'report_name': arguments.name, 'output_directory': arguments.output, 'c3d_path': arguments.c3d,
+									 'export_channels': arguments.channels, 'export_hdf5': arguments.hdf5,
+									 'export_html': arguments.html, 'precision': arguments.precision, 'history_path': arguments.history,
+									 'session_date': arguments.date, 'session_label': arguments.label}, arguments.port, arguments.wait), indent=2))
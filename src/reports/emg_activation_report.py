@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+from src.utils.body import Leg
+from src.utils.vicon_nexus import Channel
+
+ENVELOPE_WINDOW_SECONDS = 0.05
+BASELINE_WINDOW_SECONDS = 0.1
+# Fraction of the baseline windows, the quietest ones, taken together as the rest period of a channel
+QUIET_WINDOWS_FRACTION = 0.1
+THRESHOLD_DEVIATIONS = 3
+MIN_ACTIVE_SECONDS = 0.03
+MIN_INACTIVE_SECONDS = 0.03
+
+ACTIVATION_DTYPE = np.dtype([('channel', 'i4'), ('side', 'U1'), ('cycle', 'i4'), ('onset', 'f8'), ('offset', 'f8')])
+
+
+def get_rectified(data: np.ndarray) -> np.ndarray:
+	"""Rectified, zero-mean signals. data has one channel per row."""
+	return np.abs(data - data.mean(axis=1, keepdims=True))
+
+
+def get_envelopes(rectified: np.ndarray, window: int) -> np.ndarray:
+	"""Moving average of the rectified signals."""
+	cumulative = np.zeros((rectified.shape[0], rectified.shape[1] + 1))
+	# The sums are kept in float64 even for float32 signals, since they grow with the length of the recording
+	np.cumsum(rectified, axis=1, dtype=np.float64, out=cumulative[:, 1:])
+	half = window // 2
+	ends = np.minimum(np.arange(rectified.shape[1]) + window - half, rectified.shape[1])
+	starts = np.maximum(np.arange(rectified.shape[1]) - half, 0)
+	return (cumulative[:, ends] - cumulative[:, starts]) / (ends - starts)
+
+
+def get_thresholds(rectified: np.ndarray, window: int, deviations: float, quiet_fraction: float = QUIET_WINDOWS_FRACTION) -> np.ndarray:
+	"""
+	Threshold of each channel from the mean and SD of the rectified signal over its quietest windows, taken as the
+	rest period. The noise is measured before smoothing and over several windows, so the threshold is not set by the
+	single lowest stretch of the envelope, which would sit barely above its floor.
+	"""
+	window = max(1, min(window, rectified.shape[1]))
+	segments_count = rectified.shape[1] // window
+	segments = rectified[:, :segments_count * window].reshape(rectified.shape[0], segments_count, window)
+	quiet_count = max(1, int(round(segments_count * quiet_fraction)))
+	quietest = np.argsort(segments.mean(axis=2), axis=1)[:, :quiet_count]
+	baseline = np.take_along_axis(segments, quietest[:, :, np.newaxis], axis=1).reshape(rectified.shape[0], -1)
+	return baseline.mean(axis=1) + deviations * baseline.std(axis=1)
+
+
+def get_activation_intervals(active: np.ndarray, min_active: int, min_inactive: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+	"""Runs of activity of all channels at once, as (channel, start, end) arrays, end exclusive."""
+	padded = np.zeros((active.shape[0], active.shape[1] + 2), dtype=np.int8)
+	padded[:, 1:-1] = active
+	changes = np.diff(padded, axis=1)
+	channels, starts = np.nonzero(changes == 1)
+	_, ends = np.nonzero(changes == -1)
+
+	# Short pauses inside a burst are filled by merging a run with the previous one of the same channel
+	if len(starts) > 1:
+		is_short_gap = (channels[1:] == channels[:-1]) & (starts[1:] - ends[:-1] < min_inactive)
+		keep_start = np.concatenate(([True], ~is_short_gap))
+		keep_end = np.concatenate((~is_short_gap, [True]))
+		channels, starts, ends = channels[keep_start], starts[keep_start], ends[keep_end]
+
+	is_long = ends - starts >= min_active
+	return channels[is_long], starts[is_long], ends[is_long]
+
+
+def group_channels(channels: List[Channel]) -> Dict[Tuple[float, int], List[int]]:
+	"""Indices of the channels recorded at the same rate and length, which can be processed together as one 2-D array."""
+	groups: Dict[Tuple[float, int], List[int]] = {}
+	for i, channel in enumerate(channels):
+		groups.setdefault((channel.rate, len(channel.data)), []).append(i)
+	return groups
+
+
+def get_cycles(leg: Leg) -> np.ndarray:
+	frames = np.asarray(leg.strike_event.frames)
+	return np.column_stack((frames[:-1], frames[1:]))
+
+
+def get_cycle_activations(channels: np.ndarray, starts: np.ndarray, ends: np.ndarray, cycles: np.ndarray, side: str) -> np.ndarray:
+	"""Clip every run to every cycle it overlaps and express it as % of the cycle."""
+	cycle_starts = cycles[:, 0][np.newaxis, :]
+	cycle_ends = cycles[:, 1][np.newaxis, :]
+	overlap = (starts[:, np.newaxis] < cycle_ends) & (ends[:, np.newaxis] > cycle_starts)
+	run_indices, cycle_indices = np.nonzero(overlap)
+
+	cycle_start = cycles[cycle_indices, 0]
+	cycle_length = cycles[cycle_indices, 1] - cycle_start
+	activations = np.empty(len(run_indices), dtype=ACTIVATION_DTYPE)
+	activations['channel'] = channels[run_indices]
+	activations['side'] = side
+	activations['cycle'] = cycle_indices
+	activations['onset'] = (np.maximum(starts[run_indices], cycle_start) - cycle_start) * 100 / cycle_length
+	activations['offset'] = (np.minimum(ends[run_indices], cycles[cycle_indices, 1]) - cycle_start) * 100 / cycle_length
+	return activations
+
+
+class EmgActivationReport:
+	def __init__(self, channels: List[Channel], left_leg: Leg, right_leg: Leg, frame_rate: float):
+		self.channel_names: List[str] = [channel.name for channel in channels]
+		self.left_cycles_count: int = 0
+		self.right_cycles_count: int = 0
+		# One row per activation burst per cycle: channel index, side ('L'/'R'), cycle index, onset and offset in % of the cycle
+		self.activations: np.ndarray = np.empty(0, dtype=ACTIVATION_DTYPE)
+		self._make(channels, left_leg, right_leg, frame_rate)
+
+	def _make(self, channels: List[Channel], left_leg: Leg, right_leg: Leg, frame_rate: float):
+		left_cycles = get_cycles(left_leg)
+		right_cycles = get_cycles(right_leg)
+		self.left_cycles_count = len(left_cycles)
+		self.right_cycles_count = len(right_cycles)
+
+		activations = []
+		for (rate, length), indices in group_channels(channels).items():
+			if length == 0:
+				continue
+			# float32 channels stay float32, anything else (e.g. the lists of Nexus) is processed as float64
+			dtype = np.result_type(np.float32, *(np.asarray(channels[i].data[:1]).dtype for i in indices))
+			data = np.asarray([np.asarray(channels[i].data, dtype=dtype) for i in indices])
+			rectified = get_rectified(data)
+			envelopes = get_envelopes(rectified, max(1, int(ENVELOPE_WINDOW_SECONDS * rate)))
+			thresholds = get_thresholds(rectified, int(BASELINE_WINDOW_SECONDS * rate), THRESHOLD_DEVIATIONS)
+			rows, starts, ends = get_activation_intervals(envelopes > thresholds[:, np.newaxis],
+														  max(1, int(MIN_ACTIVE_SECONDS * rate)), max(1, int(MIN_INACTIVE_SECONDS * rate)))
+			channel_indices = np.asarray(indices)[rows]
+
+			# Cycles are in camera frames, the runs in samples of the channel
+			for side, cycles in (('L', left_cycles), ('R', right_cycles)):
+				if len(cycles):
+					activations.append(get_cycle_activations(channel_indices, starts, ends, (cycles * rate / frame_rate).astype(np.int64), side))
+
+		if activations:
+			self.activations = np.concatenate(activations)
+			self.activations.sort(order=['side', 'channel', 'cycle', 'onset'])
+
+	def get_intervals(self, channel: int, side: str, cycle: int = 0) -> List[Tuple[float, float]]:
+		selected = self.activations[(self.activations['channel'] == channel) &
+									(self.activations['side'] == side.upper()[0]) & (self.activations['cycle'] == cycle)]
+		return list(zip(selected['onset'].tolist(), selected['offset'].tolist()))
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+from typing import List, Dict, Tuple, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.reports.emg_activation_report import group_channels, get_cycles
+from src.utils.body import Leg
+from src.utils.vicon_nexus import Channel
+
+SEGMENT_SECONDS = 0.25
+SEGMENT_OVERLAP = 0.5
+MIN_FREQUENCY = 20
+MAX_FREQUENCY = 450
+# Upper bound of the temporary arrays of one block of segments; a long recording is processed block by block
+MAX_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def get_segment_length(rate: float) -> int:
+	"""Power of two closest to SEGMENT_SECONDS of samples."""
+	return int(2 ** round(np.log2(max(rate * SEGMENT_SECONDS, 2))))
+
+
+def get_periodograms(data: np.ndarray, segment_length: int, step: int, window: np.ndarray) -> np.ndarray:
+	"""Unscaled one-sided power spectra of the overlapping segments of every channel, as channels x segments x frequencies."""
+	segments = sliding_window_view(data, segment_length, axis=1)[:, ::step]
+	spectra = np.fft.rfft((segments - segments.mean(axis=2, keepdims=True)) * window, axis=2)
+	return spectra.real ** 2 + spectra.imag ** 2
+
+
+def get_median_frequencies(spectra: np.ndarray, frequencies: np.ndarray) -> np.ndarray:
+	"""Frequency that splits the power of each spectrum (last axis) in two halves. NaN where there is no power."""
+	cumulative = np.cumsum(spectra, axis=-1)
+	total = cumulative[..., -1]
+	indices = np.minimum(np.sum(cumulative < total[..., np.newaxis] / 2, axis=-1), len(frequencies) - 1)
+	return np.where(total > 0, frequencies[indices], np.nan)
+
+
+def get_mean_frequencies(spectra: np.ndarray, frequencies: np.ndarray) -> np.ndarray:
+	total = spectra.sum(axis=-1)
+	with np.errstate(divide='ignore', invalid='ignore'):
+		return np.where(total > 0, (spectra * frequencies).sum(axis=-1) / total, np.nan)
+
+
+def get_slopes(times: np.ndarray, values: np.ndarray) -> np.ndarray:
+	"""Least squares slope of every row of values over times, ignoring NaN values."""
+	valid = ~np.isnan(values)
+	counts = valid.sum(axis=1)
+	with np.errstate(divide='ignore', invalid='ignore'):
+		mean_times = np.where(valid, times, 0).sum(axis=1) / counts
+		mean_values = np.where(valid, values, 0).sum(axis=1) / counts
+		centered_times = np.where(valid, times - mean_times[:, np.newaxis], 0)
+		covariance = (centered_times * np.where(valid, values - mean_values[:, np.newaxis], 0)).sum(axis=1)
+		variance = (centered_times ** 2).sum(axis=1)
+		return np.where((counts > 1) & (variance > 0), covariance / variance, np.nan)
+
+
+def get_cycle_spectra(channels_data: List[Sequence[float]], length: int, rate: float, cycles: Dict[str, np.ndarray]) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+	"""
+	Welch spectra of every channel in every gait cycle: the sum of the spectra of the segments centered inside the cycle.
+	cycles are in samples of the channels. Returns the spectra of each side, as channels x cycles x frequencies,
+	and the frequencies, both limited to the MIN_FREQUENCY - MAX_FREQUENCY band.
+	"""
+	segment_length = get_segment_length(rate)
+	step = segment_length - int(segment_length * SEGMENT_OVERLAP)
+	frequencies = np.fft.rfftfreq(segment_length, 1 / rate)
+	band = (frequencies >= MIN_FREQUENCY) & (frequencies <= MAX_FREQUENCY)
+	sums = {side: np.zeros((len(channels_data), len(side_cycles), np.count_nonzero(band))) for side, side_cycles in cycles.items()}
+	if length < segment_length:
+		return sums, frequencies[band]
+
+	window = np.hanning(segment_length).astype(np.float32)
+	segments_count = (length - segment_length) // step + 1
+	centers = np.arange(segments_count) * step + segment_length // 2
+	# The block data, the windowed segments and their complex spectra are the largest temporary arrays
+	block_segments = max(1, MAX_BLOCK_BYTES // (len(channels_data) * segment_length * 32))
+
+	for first in range(0, segments_count, block_segments):
+		last = min(first + block_segments, segments_count)
+		block = np.asarray([np.asarray(data[first * step:(last - 1) * step + segment_length], dtype=np.float32) for data in channels_data])
+		spectra = get_periodograms(block, segment_length, step, window)[:, :, band]
+		block_centers = centers[first:last]
+
+		for side, side_cycles in cycles.items():
+			if not len(side_cycles):
+				continue
+			indices = np.searchsorted(side_cycles[:, 0], block_centers, side='right') - 1
+			inside = (indices >= 0) & (block_centers < side_cycles[np.maximum(indices, 0), 1])
+			if not inside.any():
+				continue
+			# The segments are in time order, so the segments of a cycle are one run
+			cycle_indices = indices[inside]
+			run_starts = np.flatnonzero(np.diff(cycle_indices, prepend=-1))
+			sums[side][:, cycle_indices[run_starts]] += np.add.reduceat(spectra[:, inside], run_starts, axis=1)
+
+	return sums, frequencies[band]
+
+
+class EmgSpectralReport:
+	def __init__(self, channels: List[Channel], left_leg: Leg, right_leg: Leg, frame_rate: float):
+		self.channel_names: List[str] = [channel.name for channel in channels]
+		# Start of every gait cycle of each side ('L'/'R'), in seconds from the start of the trial
+		self.cycle_times: Dict[str, np.ndarray] = {}
+		# One row per channel and one column per gait cycle, in Hz
+		self.median_frequencies: Dict[str, np.ndarray] = {}
+		self.mean_frequencies: Dict[str, np.ndarray] = {}
+		# Trend of the median frequency of each channel over the trial, in Hz/min; a negative slope is a sign of fatigue
+		self.median_frequency_slopes: Dict[str, np.ndarray] = {}
+		self._make(channels, left_leg, right_leg, frame_rate)
+
+	def _make(self, channels: List[Channel], left_leg: Leg, right_leg: Leg, frame_rate: float):
+		cycles = {'L': get_cycles(left_leg), 'R': get_cycles(right_leg)}
+		for side, side_cycles in cycles.items():
+			self.cycle_times[side] = side_cycles[:, 0] / frame_rate
+			self.median_frequencies[side] = np.full((len(channels), len(side_cycles)), np.nan)
+			self.mean_frequencies[side] = np.full((len(channels), len(side_cycles)), np.nan)
+
+		for (rate, length), indices in group_channels(channels).items():
+			# Cycles are in camera frames, the segments in samples of the channel
+			channel_cycles = {side: (side_cycles * rate / frame_rate).astype(np.int64) for side, side_cycles in cycles.items()}
+			spectra, frequencies = get_cycle_spectra([channels[i].data for i in indices], length, rate, channel_cycles)
+			for side, side_spectra in spectra.items():
+				self.median_frequencies[side][indices] = get_median_frequencies(side_spectra, frequencies)
+				self.mean_frequencies[side][indices] = get_mean_frequencies(side_spectra, frequencies)
+
+		for side, times in self.cycle_times.items():
+			self.median_frequency_slopes[side] = get_slopes(times / 60, self.median_frequencies[side])
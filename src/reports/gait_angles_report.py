@@ -7,18 +7,22 @@ Created on November 2024
 import math
 
 import numpy as np
-from typing import List
+from typing import List, Dict, Tuple, Iterator
 
 from src.utils.body import Leg
+from src.utils.vicon_nexus import Event
 from src.utils.vector_operations import calculate_angles, radians_to_degrees, cross_product_vectors, unit_vectors
 
+# Frames per window of the whole trial angles; bounds the memory of the intermediate arrays (about 1 MB per array)
+ALL_FRAMES_CHUNK = 32768
+
 
 def get_hip_angles(leg: Leg) -> np.ndarray:
 	asi_marker_trajectory = leg.get_marker('ASI').trajectory[leg.strike_event.frames[0]:leg.strike_event.frames[1]]
 	psi_marker_trajectory = leg.get_marker('PSI').trajectory[leg.strike_event.frames[0]:leg.strike_event.frames[1]]
 	knee_marker_trajectory = leg.get_marker('KNE').trajectory[leg.strike_event.frames[0]:leg.strike_event.frames[1]]
 	middle_point_trajectory = (asi_marker_trajectory + psi_marker_trajectory) / 2
-	horizontal_normal = np.repeat([[0, 0, 1]], middle_point_trajectory.shape[0], axis=0)
+	horizontal_normal = np.repeat(np.array([[0, 0, 1]], dtype=middle_point_trajectory.dtype), middle_point_trajectory.shape[0], axis=0)
 
 	# Find the scheme of the calculation formula in the src/reports folder in png format
 	angles_b = get_angles(knee_marker_trajectory, middle_point_trajectory, asi_marker_trajectory)
@@ -71,6 +75,38 @@ def resample_angles(angles: np.ndarray, target_length: int = 100) -> np.ndarray:
 	return resampled_angles
 
 
+def get_window_angles(leg: Leg, start_frame: int, end_frame: int) -> Dict[str, np.ndarray]:
+	# The strike event is replaced so that the angles cover the window instead of a single gait cycle
+	strike_event = Event(leg.strike_event.context, leg.strike_event.name, [start_frame, end_frame], [])
+	window_leg = Leg(leg.side, leg.markers, strike_event, leg.off_event)
+	return {"hip": get_hip_angles(window_leg),
+			"knee": get_knee_angles(window_leg),
+			"foot": get_foot_angles(window_leg)}
+
+
+def get_all_frames_count(leg: Leg) -> int:
+	# The last frame is left out, like the strike frame that ends a gait cycle
+	return max(len(leg.get_marker('ASI').trajectory) - 1, 0)
+
+
+def iterate_all_frames_angles(leg: Leg, chunk_frames: int = ALL_FRAMES_CHUNK) -> Iterator[Tuple[int, Dict[str, np.ndarray]]]:
+	"""Angles of the whole trial, chunk_frames frames at a time: (index of the first frame, angles by joint)."""
+	frames_count = get_all_frames_count(leg)
+	for start_frame in range(0, frames_count, chunk_frames):
+		yield start_frame, get_window_angles(leg, start_frame, min(start_frame + chunk_frames, frames_count))
+
+
+def get_all_frames_angles(leg: Leg, chunk_frames: int = ALL_FRAMES_CHUNK) -> Dict[str, np.ndarray]:
+	# Computed window by window, so the temporary arrays of the computation do not grow with the length of the recording
+	frames_count = get_all_frames_count(leg)
+	dtype = leg.get_marker('ASI').trajectory.dtype
+	angles = {joint: np.empty(frames_count, dtype=dtype) for joint in ("hip", "knee", "foot")}
+	for start_frame, window_angles in iterate_all_frames_angles(leg, chunk_frames):
+		for joint, values in window_angles.items():
+			angles[joint][start_frame:start_frame + len(values)] = values
+	return angles
+
+
 class GaitAnglesReport:
 	def __init__(self, left_leg: Leg, right_leg: Leg):
 		self.left_hip_angles: List[float] = []
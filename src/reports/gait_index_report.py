@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import io
+from typing import List, Dict, Tuple, Optional, Iterator
+
+import numpy as np
+
+from src.reports.gait_angles_report import ALL_FRAMES_CHUNK, resample_angles, get_window_angles
+from src.utils.body import Leg
+
+JOINTS = ('hip', 'knee', 'foot')
+CYCLE_POINTS = 100
+# Principal components kept for the GDI, as in Schwartz & Rozumalski (2008)
+VARIANCE_EXPLAINED = 0.98
+
+
+def get_cycle_curves(all_frames_angles: Dict[str, np.ndarray], strike_frames: List[int]) -> Dict[str, np.ndarray]:
+	"""Angles of every gait cycle between consecutive strikes, resampled to CYCLE_POINTS, as cycles x CYCLE_POINTS per joint."""
+	frames = np.asarray(strike_frames, dtype=np.float64)
+	starts, lengths = frames[:-1], np.diff(frames)
+	# Same points as resample_angles on the frames of each cycle, interpolated for all cycles at once
+	positions = starts[:, np.newaxis] + np.linspace(0, 1, CYCLE_POINTS) * (lengths[:, np.newaxis] - 1)
+	return {joint: np.interp(positions, np.arange(len(angles)), angles) for joint, angles in all_frames_angles.items()}
+
+
+def iterate_cycle_curves(leg: Leg, chunk_frames: int = ALL_FRAMES_CHUNK) -> Iterator[Dict[str, np.ndarray]]:
+	"""
+	Curves of the gait cycles of a leg (see get_cycle_curves), for groups of consecutive cycles spanning at most
+	chunk_frames frames. The angles are only computed between the strikes, one group at a time.
+	"""
+	frames = list(leg.strike_event.frames)
+	first = 0
+	while first < len(frames) - 1:
+		last = first + 1
+		while last + 1 < len(frames) and frames[last + 1] - frames[first] <= chunk_frames:
+			last += 1
+		window_angles = get_window_angles(leg, frames[first], frames[last])
+		yield get_cycle_curves(window_angles, [frame - frames[first] for frame in frames[first:last + 1]])
+		first = last
+
+
+def get_features(curves: Dict[str, np.ndarray]) -> np.ndarray:
+	"""One row per cycle with the curves of all joints one after another."""
+	return np.hstack([np.atleast_2d(curves[joint]) for joint in JOINTS])
+
+
+class GaitIndexBasis:
+	"""
+	Normative data needed to score gait cycles: the mean curves for the GVS/GPS and, when the normative set has
+	individual cycles, the principal components and the normative distance statistics for the GDI.
+	"""
+
+	def __init__(self, mean_curves: Dict[str, np.ndarray], components: Optional[np.ndarray] = None, mean_features: Optional[np.ndarray] = None,
+				 log_distance_mean: float = np.nan, log_distance_deviation: float = np.nan, cycles_count: int = 0):
+		self.mean_curves: Dict[str, np.ndarray] = {joint: np.asarray(curve, dtype=np.float64) for joint, curve in mean_curves.items()}
+		self.components: Optional[np.ndarray] = components
+		self.mean_features: Optional[np.ndarray] = mean_features
+		self.log_distance_mean: float = log_distance_mean
+		self.log_distance_deviation: float = log_distance_deviation
+		self.cycles_count: int = cycles_count
+
+	@property
+	def has_gdi(self) -> bool:
+		return self.components is not None
+
+	def get_gait_variable_scores(self, curves: Dict[str, np.ndarray]) -> np.ndarray:
+		"""RMS difference from the normative mean of every joint, as cycles x joints."""
+		deviations = get_features(curves) - get_features(self.mean_curves)
+		return np.sqrt(np.mean(deviations.reshape(len(deviations), len(JOINTS), -1) ** 2, axis=2))
+
+	def get_gait_deviation_indices(self, curves: Dict[str, np.ndarray]) -> np.ndarray:
+		if not self.has_gdi:
+			return np.full(len(np.atleast_2d(curves[JOINTS[0]])), np.nan)
+		distances = np.linalg.norm(get_features(curves) @ self.components.T - self.mean_features, axis=1)
+		return 100 - 10 * (np.log(distances) - self.log_distance_mean) / self.log_distance_deviation
+
+	def score(self, curves: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+		"""GVS (cycles x joints), GPS and GDI of any number of cycles, with a few matrix operations."""
+		gait_variable_scores = self.get_gait_variable_scores(curves)
+		gait_profile_scores = np.sqrt(np.mean(gait_variable_scores ** 2, axis=1))
+		return gait_variable_scores, gait_profile_scores, self.get_gait_deviation_indices(curves)
+
+	def to_bytes(self) -> bytes:
+		buffer = io.BytesIO()
+		arrays = {f'mean_{joint}': self.mean_curves[joint] for joint in JOINTS}
+		if self.has_gdi:
+			arrays.update(components=self.components, mean_features=self.mean_features)
+		np.savez(buffer, statistics=np.array([self.log_distance_mean, self.log_distance_deviation, self.cycles_count]), **arrays)
+		return buffer.getvalue()
+
+	@staticmethod
+	def from_bytes(data: bytes) -> 'GaitIndexBasis':
+		with np.load(io.BytesIO(data)) as arrays:
+			log_distance_mean, log_distance_deviation, cycles_count = arrays['statistics'].tolist()
+			return GaitIndexBasis({joint: arrays[f'mean_{joint}'] for joint in JOINTS},
+								  arrays['components'] if 'components' in arrays else None,
+								  arrays['mean_features'] if 'mean_features' in arrays else None,
+								  log_distance_mean, log_distance_deviation, int(cycles_count))
+
+
+def make_gait_index_basis(curves: Dict[str, np.ndarray]) -> GaitIndexBasis:
+	"""Basis from the cycles of a normative set, as cycles x CYCLE_POINTS per joint."""
+	features = get_features(curves)
+	mean_curves = {joint: np.asarray(curves[joint]).mean(axis=0) for joint in JOINTS}
+	if len(features) < 3:
+		return GaitIndexBasis(mean_curves, cycles_count=len(features))
+
+	# The gait features are the projections on the first singular vectors of the (not centered) normative matrix
+	_, singular_values, vectors = np.linalg.svd(features, full_matrices=False)
+	explained = np.cumsum(singular_values ** 2) / np.sum(singular_values ** 2)
+	components = vectors[:np.searchsorted(explained, VARIANCE_EXPLAINED) + 1]
+	projections = features @ components.T
+	mean_features = projections.mean(axis=0)
+	log_distances = np.log(np.linalg.norm(projections - mean_features, axis=1))
+	return GaitIndexBasis(mean_curves, components, mean_features, float(log_distances.mean()), float(log_distances.std(ddof=1)), len(features))
+
+
+def make_reference_basis(reference_knee_angles: List[float], reference_foot_angles: List[float], reference_hip_angles: List[float]) -> GaitIndexBasis:
+	"""Basis from mean reference curves alone (e.g. the Perry workbook), which only allows the GVS and GPS."""
+	curves = {'hip': reference_hip_angles, 'knee': reference_knee_angles, 'foot': reference_foot_angles}
+	return GaitIndexBasis({joint: resample_angles(np.asarray(curve, dtype=np.float64), CYCLE_POINTS) for joint, curve in curves.items()})
+
+
+class GaitIndexReport:
+	def __init__(self, left_leg: Leg, right_leg: Leg, basis: GaitIndexBasis):
+		# Per side ('L'/'R'), one value per gait cycle; the GVS has one column per joint, in JOINTS order
+		self.gait_variable_scores: Dict[str, np.ndarray] = {}
+		self.gait_profile_scores: Dict[str, np.ndarray] = {}
+		self.gait_deviation_indices: Dict[str, np.ndarray] = {}
+		# GPS of all cycles of both sides together
+		self.overall_gait_profile_score: float = np.nan
+		self._make(left_leg, right_leg, basis)
+
+	def _make(self, left_leg: Leg, right_leg: Leg, basis: GaitIndexBasis):
+		for leg in (left_leg, right_leg):
+			# Scored group by group, so only the scores of the cycles are kept, whatever the length of the recording
+			scores = [basis.score(curves) for curves in iterate_cycle_curves(leg)]
+			if scores:
+				gait_variable_scores, gait_profile_scores, gait_deviation_indices = (np.concatenate(values) for values in zip(*scores))
+			else:
+				gait_variable_scores, gait_profile_scores, gait_deviation_indices = np.empty((0, len(JOINTS))), np.empty(0), np.empty(0)
+			self.gait_variable_scores[leg.side] = gait_variable_scores
+			self.gait_profile_scores[leg.side] = gait_profile_scores
+			self.gait_deviation_indices[leg.side] = gait_deviation_indices
+
+		all_scores = np.concatenate([self.gait_variable_scores['L'], self.gait_variable_scores['R']])
+		if len(all_scores):
+			self.overall_gait_profile_score = float(np.sqrt(np.mean(all_scores ** 2)))
@@ -5,15 +5,33 @@ Created on November 2024
 @author: Ghimciuc Ioan
 """
 
+import json
+import os
+import threading
 
+import numpy as np
 import openpyxl
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Any, Iterator
 
 from src.utils.body import Leg
-from src.reports.gait_angles_report import GaitAnglesReport
+from src.reports.emg_activation_report import EmgActivationReport
+from src.reports.emg_spectral_report import EmgSpectralReport
+from src.reports.gait_angles_report import GaitAnglesReport, ALL_FRAMES_CHUNK, get_all_frames_angles, iterate_all_frames_angles
 from src.reports.gait_cycle_report import GaitCycleReport
+from src.reports.gait_index_report import GaitIndexReport, GaitIndexBasis, make_reference_basis
 from src.reports.gait_step_report import GaitStepReport
-from src.utils.vicon_nexus import ViconNexusAPI, Marker, Event, Device
+from src.reports.precision_report import PrecisionReport, get_angle_set
+from src.reports.trial_quality_report import TrialQualityReport
+from src.reports.normative_database import NormativeDatabase, NORMATIVE_DATABASE_EXTENSIONS
+from src.utils.dependency_graph import DependencyGraph
+from src.utils.vicon_nexus import ViconNexusAPI, Marker, Event, Device, Channel
+
+# Precisions the trial data can be fetched and computed in; lower ones overflow (float16) or truncate (integers)
+COMPUTE_DTYPES = (np.dtype(np.float64), np.dtype(np.float32))
+
+# Reference data read by load_reference, shared by all reports of the process
+_reference_cache: Dict[Tuple[str, float, str], Tuple] = {}
+_reference_cache_lock = threading.Lock()
 
 
 def get_reference_angles(xlsx_file_path: str) -> Tuple[List[float], List[float], List[float]]:
@@ -32,6 +50,30 @@ def get_reference_angles(xlsx_file_path: str) -> Tuple[List[float], List[float],
 	return knee_angles, foot_angles, hip_angles
 
 
+def read_reference(reference_angles_file_path: str, reference_query: Dict[str, Any]) -> Tuple:
+	if reference_angles_file_path.lower().endswith(NORMATIVE_DATABASE_EXTENSIONS):
+		database = NormativeDatabase(reference_angles_file_path)
+		try:
+			return (*database.get_reference_angles(**reference_query), database.get_gait_index_basis(**reference_query))
+		finally:
+			database.close()
+
+	knee_angles, foot_angles, hip_angles = get_reference_angles(reference_angles_file_path)
+	return knee_angles, foot_angles, hip_angles, [], [], [], make_reference_basis(knee_angles, foot_angles, hip_angles)
+
+
+def load_reference(reference_angles_file_path: str, reference_query: Dict[str, Any]) -> Tuple:
+	"""
+	Reference angles, deviations and gait index basis of a reference file, read once per process and file version.
+	Returns knee, foot and hip angles, knee, foot and hip deviations (empty for a workbook) and the GaitIndexBasis.
+	"""
+	key = (os.path.abspath(reference_angles_file_path), os.path.getmtime(reference_angles_file_path), json.dumps(reference_query, sort_keys=True))
+	with _reference_cache_lock:
+		if key not in _reference_cache:
+			_reference_cache[key] = read_reference(reference_angles_file_path, reference_query)
+		return _reference_cache[key]
+
+
 def sort_by_side(markers: Dict[str, Marker]) -> Tuple[Dict[str, Marker], Dict[str, Marker]]:
 	left_markers, right_markers = {}, {}
 	for name, marker in markers.items():
@@ -43,11 +85,86 @@ def sort_by_side(markers: Dict[str, Marker]) -> Tuple[Dict[str, Marker], Dict[st
 	return left_markers, right_markers
 
 
+def get_channels(devices: Dict[str, Device]) -> List[Channel]:
+	channels: List[Channel] = []
+	for device in devices.values():
+		for output in device.outputs:
+			channels.extend(output.channels)
+	return channels
+
+
+def get_strike_events(events: Dict[str, Event]) -> Tuple[Event, Event]:
+	return events['Left Foot Strike'], events['Right Foot Strike']
+
+
+def get_events_fingerprint(events: Dict[str, Event]) -> Tuple:
+	return tuple((name, tuple(event.frames)) for name, event in events.items())
+
+
+def get_strike_events_fingerprint(strike_events: Tuple[Event, Event]) -> Tuple:
+	return tuple(tuple(event.frames) for event in strike_events)
+
+
+def make_legs(markers_by_side: Tuple[Dict[str, Marker], Dict[str, Marker]], events: Dict[str, Event]) -> Tuple[Leg, Leg]:
+	left_markers, right_markers = markers_by_side
+	return (Leg('L', left_markers, events['Left Foot Strike'], events['Left Foot Off']),
+			Leg('R', right_markers, events['Right Foot Strike'], events['Right Foot Off']))
+
+
+def make_strike_legs(markers_by_side: Tuple[Dict[str, Marker], Dict[str, Marker]], strike_events: Tuple[Event, Event]) -> Tuple[Leg, Leg]:
+	# The step and angles reports only use the strike events, so the off events are left out.
+	# This way a corrected Foot Off does not invalidate them.
+	left_markers, right_markers = markers_by_side
+	return Leg('L', left_markers, strike_events[0], None), Leg('R', right_markers, strike_events[1], None)
+
+
+def make_all_frames_legs(markers_by_side: Tuple[Dict[str, Marker], Dict[str, Marker]]) -> Tuple[Leg, Leg]:
+	left_markers, right_markers = markers_by_side
+	return Leg('L', left_markers, Event('Left', 'Foot Strike', [], []), None), Leg('R', right_markers, Event('Right', 'Foot Strike', [], []), None)
+
+
+def make_all_frames_angles(markers_by_side: Tuple[Dict[str, Marker], Dict[str, Marker]]) -> Dict[str, Dict[str, np.ndarray]]:
+	left_leg, right_leg = make_all_frames_legs(markers_by_side)
+	return {'L': get_all_frames_angles(left_leg), 'R': get_all_frames_angles(right_leg)}
+
+
+def make_report_graph() -> DependencyGraph:
+	graph = DependencyGraph()
+	graph.add_source('frame_rate', fingerprint=lambda frame_rate: frame_rate)
+	graph.add_source('start_frame', fingerprint=lambda start_frame: start_frame)
+	graph.add_source('events', fingerprint=get_events_fingerprint)
+	# Markers are only replaced when they are refetched, so the identity of the dictionary is enough
+	graph.add_source('markers', fingerprint=id)
+	graph.add_node('markers_by_side', sort_by_side, ['markers'])
+	graph.add_node('trial_quality_report', TrialQualityReport, ['markers', 'events', 'frame_rate', 'start_frame'])
+	graph.add_node('strike_events', get_strike_events, ['events'], fingerprint=get_strike_events_fingerprint)
+	graph.add_node('legs', make_legs, ['markers_by_side', 'events'])
+	graph.add_node('strike_legs', make_strike_legs, ['markers_by_side', 'strike_events'])
+	graph.add_node('gait_step_report', lambda legs, frame_rate: GaitStepReport(*legs, frame_rate), ['strike_legs', 'frame_rate'])
+	graph.add_node('gait_cycle_report', lambda legs: GaitCycleReport(*legs), ['legs'])
+	graph.add_node('gait_angles_report', lambda legs: GaitAnglesReport(*legs), ['strike_legs'])
+	graph.add_node('all_frames_angles', make_all_frames_angles, ['markers_by_side'])
+	graph.add_source('gait_index_basis', fingerprint=id)
+	graph.add_node('gait_index_report', lambda legs, basis: GaitIndexReport(*legs, basis), ['strike_legs', 'gait_index_basis'])
+	graph.add_source('devices', fingerprint=id)
+	graph.add_node('emg_activation_report', lambda devices, legs, frame_rate: EmgActivationReport(get_channels(devices), *legs, frame_rate),
+				   ['devices', 'strike_legs', 'frame_rate'])
+	graph.add_node('emg_spectral_report', lambda devices, legs, frame_rate: EmgSpectralReport(get_channels(devices), *legs, frame_rate),
+				   ['devices', 'strike_legs', 'frame_rate'])
+	return graph
+
+
 class MotionReport:
-	def __init__(self, vicon: ViconNexusAPI, subject_name: str, reference_angles_file_path: str):
+	def __init__(self, vicon: ViconNexusAPI, subject_name: str, reference_angles_file_path: str, reference_query: Dict[str, Any] = None, make: bool = True,
+				 dtype: np.dtype = np.float64):
 		self.vicon = vicon
 		self.subject_name = subject_name
 		self.reference_angles_file_path = reference_angles_file_path
+		self.reference_query = reference_query if reference_query is not None else {}
+		# Precision of the trajectories, the channels and every computation on them: np.float64 or np.float32
+		self.dtype = np.dtype(dtype)
+		if self.dtype not in COMPUTE_DTYPES:
+			raise ValueError(f'The report can only be computed in float64 or float32, not {self.dtype.name}.')
 		self.frame_rate: int = 0
 		self.start_frame: int = 0
 		self.end_frame: int = 0
@@ -57,29 +174,134 @@ class MotionReport:
 		self.reference_knee_angles: List[float] = []
 		self.reference_foot_angles: List[float] = []
 		self.reference_hip_angles: List[float] = []
+		self.reference_knee_deviation: List[float] = []
+		self.reference_foot_deviation: List[float] = []
+		self.reference_hip_deviation: List[float] = []
+		self.gait_index_basis: GaitIndexBasis = None
 		self.left_leg: Leg = None
 		self.right_leg: Leg = None
 		self.gait_step_report: GaitStepReport = None
 		self.gait_cycle_report: GaitCycleReport = None
 		self.gait_angles_report: GaitAnglesReport = None
-		self._make()
+		self.trial_quality_report: TrialQualityReport = None
+		self.graph: DependencyGraph = make_report_graph()
+		# Rendered figures of the last export, keyed by a hash of their content, reused by the exporters on the next export
+		self.figure_cache: Dict[str, bytes] = {}
+		# With make=False the caller runs the fetch steps and compute() itself, e.g. to schedule them concurrently
+		if make:
+			self._make()
 
 	def _make(self) -> None:
+		self.fetch_trial_info()
+		self.fetch_events()
+		self.fetch_markers()
+		self.check_quality()
+		self.fetch_devices()
+		self.load_reference_angles()
+		self.compute()
+
+	def fetch_trial_info(self) -> None:
 		self._check_if_subject_exists()
-		self.frame_rate = self.vicon.GetFrameRate()
-		self.start_frame, self.end_frame = self.vicon.GetTrialRegionOfInterest()
+		self.set_trial_info(self.vicon.GetFrameRate(), *self.vicon.GetTrialRegionOfInterest())
+
+	def set_trial_info(self, frame_rate: float, start_frame: int, end_frame: int) -> None:
+		"""Trial data shared by all subjects of a capture, fetched once for all of them (see report_pipeline.generate_session_reports)."""
+		self.frame_rate, self.start_frame, self.end_frame = frame_rate, start_frame, end_frame
+		self.graph.set('frame_rate', self.frame_rate)
+		self.graph.set('start_frame', self.start_frame)
+
+	def fetch_events(self) -> None:
 		self.events = self._get_events()
-		self.markers = self.vicon.GetMarkers(self.subject_name)
-		self.devices = self.vicon.GetDevices()
-		self.reference_knee_angles, self.reference_foot_angles, self.reference_hip_angles = get_reference_angles(self.reference_angles_file_path)
+		self.graph.set('events', self.events)
+
+	def fetch_markers(self) -> None:
+		self.markers = self.vicon.GetMarkers(self.subject_name, self.dtype)
+		self.graph.set('markers', self.markers)
+
+	def fetch_devices(self) -> None:
+		self.set_devices(self.vicon.GetDevices(self.dtype))
+
+	def set_devices(self, devices: Dict[str, Device]) -> None:
+		self.devices = devices
+		self.graph.set('devices', self.devices)
+
+	def check_quality(self) -> TrialQualityReport:
+		"""Check the fetched markers and events before anything else is fetched or computed. Raises ValueError for a trial the reports can not use."""
+		self.trial_quality_report = self.graph.get('trial_quality_report')
+		if not self.trial_quality_report.is_valid:
+			raise ValueError('The trial did not pass the quality check:\n' + '\n'.join(str(error) for error in self.trial_quality_report.errors))
+		return self.trial_quality_report
+
+	def compute(self) -> None:
+		self.left_leg, self.right_leg = self.graph.get('legs')
+		self.gait_step_report = self.graph.get('gait_step_report')
+		self.gait_cycle_report = self.graph.get('gait_cycle_report')
+		self.gait_angles_report = self.graph.get('gait_angles_report')
+
+	def update(self, events: bool = True, markers: bool = False, devices: bool = False, reference: bool = False) -> List[str]:
+		"""
+		Refetch only the selected trial data and recompute the report parts that depend on it. Returns the recomputed parts.
+		A changed frame rate or region of interest shifts every frame index, so the whole report is fetched and made again.
+		"""
+		self.graph.recomputed = []
+		if (self.frame_rate, (self.start_frame, self.end_frame)) != (self.vicon.GetFrameRate(), self.vicon.GetTrialRegionOfInterest()):
+			self._make()
+			return self.graph.recomputed
+
+		if events:
+			self.fetch_events()
+		if markers:
+			self.fetch_markers()
+		if devices:
+			self.fetch_devices()
+		if reference:
+			self.load_reference_angles()
+
+		self.check_quality()
+		self.compute()
+		return self.graph.recomputed
+
+	def get_all_frames_angles(self, side: str) -> Dict[str, np.ndarray]:
+		return self.graph.get('all_frames_angles')[side.upper()[0]]
+
+	def iterate_all_frames_angles(self, chunk_frames: int = ALL_FRAMES_CHUNK) -> Iterator[Tuple[int, Dict[str, Dict[str, np.ndarray]]]]:
+		"""
+		Angles of both legs on every frame, chunk_frames frames at a time: (index of the first frame, angles by side and
+		joint). Already computed angles are reused; otherwise only one window is computed and held at a time, which lets
+		the exporters write hour long recordings without the whole trial angles in memory.
+		"""
+		if not self.graph.is_stale('all_frames_angles'):
+			all_frames_angles = self.graph.get('all_frames_angles')
+			for start_frame in range(0, len(all_frames_angles['L']['hip']), chunk_frames):
+				yield start_frame, {side: {joint: values[start_frame:start_frame + chunk_frames] for joint, values in angles.items()}
+									for side, angles in all_frames_angles.items()}
+			return
+
+		left_leg, right_leg = make_all_frames_legs(self.graph.get('markers_by_side'))
+		for (start_frame, left_angles), (_, right_angles) in zip(iterate_all_frames_angles(left_leg, chunk_frames), iterate_all_frames_angles(right_leg, chunk_frames)):
+			yield start_frame, {'L': left_angles, 'R': right_angles}
+
+	def check_precision(self) -> PrecisionReport:
+		"""Compare the angles of the report with the same angles computed in float64 from the same trial."""
+		markers_by_side = sort_by_side(self.vicon.GetMarkers(self.subject_name, np.float64))
+		reference_legs = make_strike_legs(markers_by_side, self.graph.get('strike_events'))
+		reference_angles = get_angle_set(make_all_frames_angles(markers_by_side), GaitAnglesReport(*reference_legs))
+		angles = get_angle_set(self.graph.get('all_frames_angles'), self.graph.get('gait_angles_report'))
+		return PrecisionReport(angles, reference_angles, self.dtype)
+
+	def get_gait_index_report(self) -> GaitIndexReport:
+		return self.graph.get('gait_index_report')
+
+	def get_emg_activation_report(self) -> EmgActivationReport:
+		return self.graph.get('emg_activation_report')
 
-		left_markers, right_markers = sort_by_side(self.markers)
-		self.left_leg = Leg('L', left_markers, self.events['Left Foot Strike'], self.events['Left Foot Off'])
-		self.right_leg = Leg('R', right_markers, self.events['Right Foot Strike'], self.events['Right Foot Off'])
+	def get_emg_spectral_report(self) -> EmgSpectralReport:
+		return self.graph.get('emg_spectral_report')
 
-		self.gait_step_report = GaitStepReport(self.left_leg, self.right_leg, self.frame_rate)
-		self.gait_cycle_report = GaitCycleReport(self.left_leg, self.right_leg)
-		self.gait_angles_report = GaitAnglesReport(self.left_leg, self.right_leg)
+	def load_reference_angles(self) -> None:
+		(self.reference_knee_angles, self.reference_foot_angles, self.reference_hip_angles, self.reference_knee_deviation,
+		 self.reference_foot_deviation, self.reference_hip_deviation, self.gait_index_basis) = load_reference(self.reference_angles_file_path, self.reference_query)
+		self.graph.set('gait_index_basis', self.gait_index_basis)
 
 	def _check_if_subject_exists(self) -> None:
 		subject_names = self.vicon.GetSubjectNames()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import json
+import sqlite3
+from typing import List, Dict, Tuple, Optional, Any
+
+import numpy as np
+
+from src.reports.gait_angles_report import GaitAnglesReport
+from src.reports.gait_cycle_report import GaitCycleReport
+from src.reports.gait_index_report import JOINTS, GaitIndexBasis, make_gait_index_basis
+from src.reports.gait_step_report import GaitStepReport
+
+NORMATIVE_DATABASE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cycles (
+	id INTEGER PRIMARY KEY,
+	subject_name TEXT NOT NULL,
+	trial_name TEXT NOT NULL DEFAULT '',
+	side TEXT NOT NULL,
+	age REAL,
+	sex TEXT,
+	speed REAL,
+	cadence REAL,
+	step_length REAL,
+	step_height REAL,
+	bipodal_1 REAL,
+	monopodal REAL,
+	bipodal_2 REAL,
+	balance REAL,
+	hip BLOB NOT NULL,
+	knee BLOB NOT NULL,
+	foot BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cycles_side_sex_age_speed ON cycles (side, sex, age, speed);
+CREATE INDEX IF NOT EXISTS cycles_age ON cycles (age);
+CREATE INDEX IF NOT EXISTS cycles_speed ON cycles (speed);
+CREATE TABLE IF NOT EXISTS gait_index_bases (
+	query TEXT PRIMARY KEY,
+	cycles_count INTEGER NOT NULL,
+	last_cycle_id INTEGER,
+	basis BLOB NOT NULL
+);
+"""
+
+
+def get_where(side: Optional[str] = None, sex: Optional[str] = None, min_age: Optional[float] = None, max_age: Optional[float] = None,
+			  min_speed: Optional[float] = None, max_speed: Optional[float] = None) -> Tuple[str, List[Any]]:
+	conditions: List[str] = []
+	values: List[Any] = []
+	for condition, value in (('side = ?', side[0].upper() if side else None), ('sex = ?', sex.upper() if sex else None),
+							 ('age >= ?', min_age), ('age <= ?', max_age), ('speed >= ?', min_speed), ('speed <= ?', max_speed)):
+		if value is not None:
+			conditions.append(condition)
+			values.append(value)
+
+	return (f' WHERE {" AND ".join(conditions)}' if conditions else ''), values
+
+
+class NormativeBand:
+	def __init__(self, curves: Dict[str, np.ndarray]):
+		self.count: int = len(curves['hip'])
+		self.mean: Dict[str, np.ndarray] = {joint: curves[joint].mean(axis=0) for joint in JOINTS}
+		self.deviation: Dict[str, np.ndarray] = {joint: curves[joint].std(axis=0, ddof=1 if self.count > 1 else 0) for joint in JOINTS}
+
+	def __str__(self) -> str:
+		return f'Normative band ({self.count} cycles)'
+
+
+class NormativeDatabase:
+	def __init__(self, database_path: str):
+		self.database_path = database_path
+		self.connection = sqlite3.connect(database_path, check_same_thread=False)
+		self.connection.executescript(SCHEMA)
+
+	def add_trial(self, subject_name: str, age: float, sex: str, gait_angles_report: GaitAnglesReport, gait_step_report: GaitStepReport,
+				  gait_cycle_report: GaitCycleReport, trial_name: str = '') -> None:
+		rows = []
+		for side in ('left', 'right'):
+			durations = getattr(gait_cycle_report, f'{side}_phases_percentage_duration')
+			rows.append((subject_name, trial_name, side[0].upper(), age, sex.upper() if sex else None,
+						 float(getattr(gait_step_report, f'{side}_step_speed')),
+						 float(getattr(gait_step_report, f'{side}_step_cadence')),
+						 float(getattr(gait_step_report, f'{side}_step_length')),
+						 float(getattr(gait_step_report, f'{side}_step_height')),
+						 durations['Bipodal 1'], durations['Monopodal'], durations['Bipodal 2'], durations['Balance'],
+						 *(np.asarray(getattr(gait_angles_report, f'{side}_{joint}_angles'), dtype=np.float64).tobytes() for joint in JOINTS)))
+
+		with self.connection:
+			self.connection.executemany('INSERT INTO cycles (subject_name, trial_name, side, age, sex, speed, cadence, step_length, step_height, '
+										'bipodal_1, monopodal, bipodal_2, balance, hip, knee, foot) '
+										'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+	def get_curves(self, side: Optional[str] = None, sex: Optional[str] = None, min_age: Optional[float] = None, max_age: Optional[float] = None,
+				   min_speed: Optional[float] = None, max_speed: Optional[float] = None) -> Dict[str, np.ndarray]:
+		where, values = get_where(side, sex, min_age, max_age, min_speed, max_speed)
+		rows = self.connection.execute(f'SELECT hip, knee, foot FROM cycles{where}', values).fetchall()
+		if not rows:
+			raise ValueError(f'The normative database "{self.database_path}" has no cycles matching the query.')
+
+		# Curves are stored as raw float64 buffers, so stacking them is a single copy per joint
+		return {joint: np.frombuffer(b''.join(row[i] for row in rows), dtype=np.float64).reshape(len(rows), -1) for i, joint in enumerate(JOINTS)}
+
+	def get_gait_index_basis(self, **query) -> GaitIndexBasis:
+		"""
+		GDI/GPS basis of the cycles matching the query. The principal components are computed once and stored in the
+		database; they are recomputed only when cycles matching the query were added or removed.
+		"""
+		where, values = get_where(**query)
+		cycles_count, last_cycle_id = self.connection.execute(f'SELECT COUNT(*), MAX(id) FROM cycles{where}', values).fetchone()
+		key = json.dumps({name: value for name, value in query.items() if value is not None}, sort_keys=True)
+		row = self.connection.execute('SELECT cycles_count, last_cycle_id, basis FROM gait_index_bases WHERE query = ?', (key,)).fetchone()
+		if row is not None and row[0] == cycles_count and row[1] == last_cycle_id:
+			return GaitIndexBasis.from_bytes(row[2])
+
+		basis = make_gait_index_basis(self.get_curves(**query))
+		with self.connection:
+			self.connection.execute('INSERT OR REPLACE INTO gait_index_bases (query, cycles_count, last_cycle_id, basis) VALUES (?, ?, ?, ?)',
+									(key, cycles_count, last_cycle_id, basis.to_bytes()))
+		return basis
+
+	def query(self, **query) -> NormativeBand:
+		return NormativeBand(self.get_curves(**query))
+
+	def get_reference_angles(self, **query) -> Tuple[List[float], List[float], List[float], List[float], List[float], List[float]]:
+		band = self.query(**query)
+		return (band.mean['knee'].tolist(), band.mean['foot'].tolist(), band.mean['hip'].tolist(),
+				band.deviation['knee'].tolist(), band.deviation['foot'].tolist(), band.deviation['hip'].tolist())
+
+	def close(self) -> None:
+		self.connection.close()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+from typing import Dict
+
+import numpy as np
+
+from src.reports.gait_angles_report import GaitAnglesReport
+
+# Largest angle difference from the float64 results that is still below the precision of the markers
+MAX_ANGLE_DEVIATION = 0.05  # deg
+
+
+def get_angle_set(all_frames_angles: Dict[str, Dict[str, np.ndarray]], gait_angles_report: GaitAnglesReport) -> Dict[str, np.ndarray]:
+	"""Every angle curve of a report, as float64 arrays keyed by side, joint and range."""
+	angles: Dict[str, np.ndarray] = {}
+	for side, side_name in (('L', 'left'), ('R', 'right')):
+		for joint in ('hip', 'knee', 'foot'):
+			angles[f'{side} {joint} (all frames)'] = np.asarray(all_frames_angles[side][joint], dtype=np.float64)
+			angles[f'{side} {joint} (cycle)'] = np.asarray(getattr(gait_angles_report, f'{side_name}_{joint}_angles'), dtype=np.float64)
+	return angles
+
+
+class PrecisionReport:
+	def __init__(self, angles: Dict[str, np.ndarray], reference_angles: Dict[str, np.ndarray], dtype: np.dtype):
+		self.dtype: str = np.dtype(dtype).name
+		# Largest absolute difference of every curve from the float64 path, in degrees
+		self.max_deviations: Dict[str, float] = {}
+		self.max_angle_deviation: float = 0
+		self._make(angles, reference_angles)
+
+	def _make(self, angles: Dict[str, np.ndarray], reference_angles: Dict[str, np.ndarray]):
+		for name, values in angles.items():
+			differences = np.abs(values - reference_angles[name])
+			# A frame that is NaN on one path only (e.g. a zero length vector) counts as an infinite difference
+			differences[np.isnan(values) != np.isnan(reference_angles[name])] = np.inf
+			finite = differences[~np.isnan(differences)]
+			self.max_deviations[name] = float(finite.max()) if len(finite) else 0.0
+		self.max_angle_deviation = max(self.max_deviations.values(), default=0.0)
+
+	@property
+	def is_accurate(self) -> bool:
+		return self.max_angle_deviation <= MAX_ANGLE_DEVIATION
+
+	def __str__(self) -> str:
+		lines = [f'{name}: {deviation:.6f} deg' for name, deviation in self.max_deviations.items()]
+		lines.append(f'Max angle deviation of {self.dtype} from float64: {self.max_angle_deviation:.6f} deg '
+					 f'({"within" if self.is_accurate else "above"} {MAX_ANGLE_DEVIATION} deg)')
+		return '\n'.join(lines)
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import datetime
+import sqlite3
+from typing import List, Dict, Tuple, Optional, Any, Union
+
+import numpy as np
+
+from src.reports.gait_angles_report import GaitAnglesReport
+from src.reports.gait_cycle_report import GaitCycleReport
+from src.reports.gait_index_report import JOINTS, GaitIndexReport
+from src.reports.gait_step_report import GaitStepReport
+from src.reports.motion_report import MotionReport
+
+# Spatiotemporal parameters stored for every trial and side, in the order of the columns of the trials table
+PARAMETERS = ('speed', 'cadence', 'step_length', 'step_height', 'step_duration', 'bipodal_1', 'monopodal', 'bipodal_2', 'balance',
+			  'gait_profile_score')
+PHASES = {'bipodal_1': 'Bipodal 1', 'monopodal': 'Monopodal', 'bipodal_2': 'Bipodal 2', 'balance': 'Balance'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+	id INTEGER PRIMARY KEY,
+	subject_name TEXT NOT NULL,
+	session_date TEXT NOT NULL,
+	trial_name TEXT NOT NULL DEFAULT '',
+	label TEXT NOT NULL DEFAULT '',
+	side TEXT NOT NULL,
+	speed REAL,
+	cadence REAL,
+	step_length REAL,
+	step_height REAL,
+	step_duration REAL,
+	bipodal_1 REAL,
+	monopodal REAL,
+	bipodal_2 REAL,
+	balance REAL,
+	gait_profile_score REAL,
+	hip BLOB NOT NULL,
+	knee BLOB NOT NULL,
+	foot BLOB NOT NULL,
+	UNIQUE (subject_name, session_date, trial_name, side)
+);
+CREATE INDEX IF NOT EXISTS trials_subject_date ON trials (subject_name, session_date);
+"""
+
+
+def get_session_date(session_date: Union[str, datetime.date, None]) -> str:
+	# Dates are stored as ISO text, so that they sort chronologically
+	if session_date is None:
+		return datetime.date.today().isoformat()
+	if isinstance(session_date, datetime.date):
+		return session_date.isoformat()
+	return datetime.date.fromisoformat(session_date).isoformat()
+
+
+def get_session_means(values: np.ndarray, indices: np.ndarray, sessions_count: int) -> np.ndarray:
+	"""Mean of the rows of values of every session (given by indices), NaN for a session without rows."""
+	counts = np.bincount(indices, minlength=sessions_count)
+	present = counts > 0
+	sums = np.zeros((sessions_count,) + values.shape[1:])
+	# The rows of each session are summed in one pass once they are grouped by session
+	sums[present] = np.add.reduceat(values[np.argsort(indices, kind='stable')], (np.cumsum(counts) - counts)[present], axis=0)
+	with np.errstate(invalid='ignore'):
+		return sums / counts.reshape((-1,) + (1,) * (values.ndim - 1))
+
+
+class SubjectHistory:
+	"""Stored trials of a subject, oldest first, one row per trial and side."""
+
+	def __init__(self, subject_name: str, rows: List[Tuple[Any, ...]]):
+		self.subject_name: str = subject_name
+		self.session_dates: List[str] = [row[0] for row in rows]
+		self.trial_names: List[str] = [row[1] for row in rows]
+		self.labels: List[str] = [row[2] for row in rows]
+		self.sides: np.ndarray = np.array([row[3] for row in rows], dtype='<U1')
+		self.parameters: Dict[str, np.ndarray] = {name: np.array([row[4 + i] for row in rows], dtype=np.float64) for i, name in enumerate(PARAMETERS)}
+		# Curves are stored as raw float64 buffers, so stacking them is a single copy per joint
+		self.curves: Dict[str, np.ndarray] = {joint: np.frombuffer(b''.join(row[4 + len(PARAMETERS) + i] for row in rows), dtype=np.float64).reshape(len(rows), -1)
+											  for i, joint in enumerate(JOINTS)}
+
+		# First label given to a trial of every session
+		self.session_labels: Dict[str, str] = {}
+		for session_date, label in zip(self.session_dates, self.labels):
+			if not self.session_labels.get(session_date):
+				self.session_labels[session_date] = label
+
+	@property
+	def sessions(self) -> List[str]:
+		return sorted(self.session_labels)
+
+	def __len__(self) -> int:
+		return len(self.session_dates)
+
+	def __str__(self) -> str:
+		return f'{self.subject_name}: {len(set(zip(self.session_dates, self.trial_names)))} trials in {len(self.sessions)} sessions'
+
+
+class SubjectHistoryDatabase:
+	"""
+	Local SQLite history of the processed trials: the cycle curves and the spatiotemporal parameters of both sides of
+	every trial, indexed by subject and session date, so the whole history of a subject is read with one query.
+	"""
+
+	def __init__(self, database_path: str):
+		self.database_path = database_path
+		self.connection = sqlite3.connect(database_path, check_same_thread=False)
+		self.connection.executescript(SCHEMA)
+
+	def add_trial(self, subject_name: str, session_date: Union[str, datetime.date, None], gait_angles_report: GaitAnglesReport,
+				  gait_step_report: GaitStepReport, gait_cycle_report: GaitCycleReport, frame_rate: float, trial_name: str = '', label: str = '',
+				  gait_index_report: Optional[GaitIndexReport] = None) -> None:
+		"""Store a trial. Adding a trial with the same subject, date and name again replaces it."""
+		rows = []
+		for side in ('left', 'right'):
+			durations = getattr(gait_cycle_report, f'{side}_phases_percentage_duration')
+			gait_profile_scores = gait_index_report.gait_profile_scores[side[0].upper()] if gait_index_report is not None else []
+			rows.append((subject_name, get_session_date(session_date), trial_name, label, side[0].upper(),
+						 float(getattr(gait_step_report, f'{side}_step_speed')),
+						 float(getattr(gait_step_report, f'{side}_step_cadence')),
+						 float(getattr(gait_step_report, f'{side}_step_length')),
+						 float(getattr(gait_step_report, f'{side}_step_height')),
+						 float(getattr(gait_step_report, f'{side}_step_frames_duration')) / frame_rate,
+						 *(float(durations[phase]) for phase in PHASES.values()),
+						 float(np.nanmean(gait_profile_scores)) if np.any(np.isfinite(gait_profile_scores)) else None,
+						 *(np.asarray(getattr(gait_angles_report, f'{side}_{joint}_angles'), dtype=np.float64).tobytes() for joint in JOINTS)))
+
+		with self.connection:
+			self.connection.executemany(f'INSERT OR REPLACE INTO trials (subject_name, session_date, trial_name, label, side, {", ".join(PARAMETERS)}, '
+										f'{", ".join(JOINTS)}) VALUES ({", ".join("?" * (5 + len(PARAMETERS) + len(JOINTS)))})', rows)
+
+	def add_report(self, report: MotionReport, session_date: Union[str, datetime.date, None] = None, trial_name: str = '', label: str = '') -> None:
+		"""Store a computed report, with the GPS against the reference it was made with."""
+		self.add_trial(report.subject_name, session_date, report.gait_angles_report, report.gait_step_report, report.gait_cycle_report,
+					   report.frame_rate, trial_name, label, report.get_gait_index_report())
+
+	def get_subject_names(self) -> List[str]:
+		return [row[0] for row in self.connection.execute('SELECT DISTINCT subject_name FROM trials ORDER BY subject_name')]
+
+	def get_history(self, subject_name: str, since: Union[str, datetime.date, None] = None, until: Union[str, datetime.date, None] = None) -> SubjectHistory:
+		conditions, values = ['subject_name = ?'], [subject_name]
+		if since is not None:
+			conditions.append('session_date >= ?')
+			values.append(get_session_date(since))
+		if until is not None:
+			conditions.append('session_date <= ?')
+			values.append(get_session_date(until))
+		rows = self.connection.execute(f'SELECT session_date, trial_name, label, side, {", ".join(PARAMETERS)}, {", ".join(JOINTS)} FROM trials '
+									   f'WHERE {" AND ".join(conditions)} ORDER BY session_date, id', values).fetchall()
+		if not rows:
+			raise ValueError(f'The history "{self.database_path}" has no trials of subject "{subject_name}" in the given dates.')
+		return SubjectHistory(subject_name, rows)
+
+	def remove_trial(self, subject_name: str, session_date: Union[str, datetime.date], trial_name: str = '') -> None:
+		with self.connection:
+			self.connection.execute('DELETE FROM trials WHERE subject_name = ? AND session_date = ? AND trial_name = ?',
+									(subject_name, get_session_date(session_date), trial_name))
+
+	def close(self) -> None:
+		self.connection.close()
+
+
+class SubjectComparisonReport:
+	"""
+	Sessions of a subject compared with a baseline session (the first one by default): the mean curves and
+	parameters of the trials of every session, and their change from the baseline.
+	"""
+
+	def __init__(self, history: SubjectHistory, sessions: Optional[List[str]] = None, baseline: Optional[str] = None):
+		self.subject_name: str = history.subject_name
+		self.sessions: List[str] = []
+		self.labels: List[str] = []
+		self.baseline: str = ''
+		# Per side ('L'/'R'): joint -> sessions x curve points, and parameter -> one value per session
+		self.mean_curves: Dict[str, Dict[str, np.ndarray]] = {}
+		self.parameters: Dict[str, Dict[str, np.ndarray]] = {}
+		self.changes: Dict[str, Dict[str, np.ndarray]] = {}
+		self.percent_changes: Dict[str, Dict[str, np.ndarray]] = {}
+		# Per side: joint -> RMS difference of the mean curve of every session from the baseline one, in degrees
+		self.curve_differences: Dict[str, Dict[str, np.ndarray]] = {}
+		self._make(history, sessions, baseline)
+
+	def _make(self, history: SubjectHistory, sessions: Optional[List[str]], baseline: Optional[str]):
+		self.sessions = sorted(get_session_date(session) for session in sessions) if sessions else history.sessions
+		self.baseline = get_session_date(baseline) if baseline else self.sessions[0]
+		if self.baseline not in self.sessions:
+			self.sessions = sorted(self.sessions + [self.baseline])
+		missing = [session for session in self.sessions if session not in history.session_labels]
+		if missing:
+			raise ValueError(f'Subject "{self.subject_name}" has no trials on {", ".join(missing)}')
+		self.labels = [history.session_labels[session] for session in self.sessions]
+		baseline_index = self.sessions.index(self.baseline)
+
+		positions = {session: i for i, session in enumerate(self.sessions)}
+		session_indices = np.array([positions.get(date, -1) for date in history.session_dates])
+		for side in ('L', 'R'):
+			rows = (history.sides == side) & (session_indices >= 0)
+			# Trials of the same session are averaged: the sums of every session divided by its number of trials
+			indices = session_indices[rows]
+			self.mean_curves[side] = {}
+			self.curve_differences[side] = {}
+			for joint in JOINTS:
+				curves = get_session_means(history.curves[joint][rows], indices, len(self.sessions))
+				self.mean_curves[side][joint] = curves
+				self.curve_differences[side][joint] = np.sqrt(np.mean((curves - curves[baseline_index]) ** 2, axis=1))
+
+			self.parameters[side] = {}
+			self.changes[side] = {}
+			self.percent_changes[side] = {}
+			for name in PARAMETERS:
+				values = history.parameters[name][rows]
+				# A missing value (e.g. a GPS without reference) is left out of the mean of its session
+				finite = np.isfinite(values)
+				means = get_session_means(values[finite], indices[finite], len(self.sessions))
+				self.parameters[side][name] = means
+				with np.errstate(invalid='ignore', divide='ignore'):
+					self.changes[side][name] = means - means[baseline_index]
+					self.percent_changes[side][name] = self.changes[side][name] / np.abs(means[baseline_index]) * 100
+
+	def __str__(self) -> str:
+		return f'{self.subject_name}: {len(self.sessions)} sessions compared with {self.baseline}'
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+from src.reports.gait_cycle_report import get_cycle_phases
+from src.utils.body import Leg
+from src.utils.vicon_nexus import Marker, Event
+
+# Markers used by the step, cycle and angles reports, without the side prefix
+REQUIRED_MARKERS = ('ASI', 'PSI', 'KNE', 'ANK', 'HEE', 'TOE')
+EVENT_NAMES = ('Left Foot Strike', 'Left Foot Off', 'Right Foot Strike', 'Right Foot Off')
+# Faster than any marker of a walking subject, so a faster move is a labeling or reconstruction error
+MAX_MARKER_SPEED = 8000  # mm/s
+
+ERROR = 'error'
+WARNING = 'warning'
+
+
+class QualityIssue:
+	def __init__(self, level: str, message: str):
+		self.level: str = level
+		self.message: str = message
+
+	def __str__(self) -> str:
+		return self.message
+
+
+def get_runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+	"""Runs of True values of every row, as (row, start, end) arrays, end exclusive."""
+	padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+	padded[:, 1:-1] = mask
+	changes = np.diff(padded, axis=1)
+	rows, starts = np.nonzero(changes == 1)
+	_, ends = np.nonzero(changes == -1)
+	return rows, starts, ends
+
+
+def split_intervals(names: List[str], rows: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> Dict[str, np.ndarray]:
+	"""Intervals of each row as an N x 2 array of [start, end) frames, only for the rows that have any."""
+	intervals = np.column_stack((starts, ends))
+	return {names[row]: intervals[rows == row] for row in np.unique(rows)}
+
+
+def get_left_axes(trajectories: Dict[str, np.ndarray], exists: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+	"""Unit vector pointing to the left of the pelvis in every frame, from the ASI and PSI markers, and where it is known."""
+	forward = (trajectories['LASI'] + trajectories['RASI'] - trajectories['LPSI'] - trajectories['RPSI']) / 2
+	left = np.cross([0, 0, 1], forward)
+	norms = np.linalg.norm(left, axis=1)
+	valid = exists['LASI'] & exists['RASI'] & exists['LPSI'] & exists['RPSI'] & (norms > 0)
+	return left / np.where(norms > 0, norms, 1)[:, np.newaxis], valid
+
+
+def get_event_issues(events: Dict[str, Event], start_frame: int) -> List[str]:
+	"""Problems of the events that would make GaitCycleReport or GaitStepReport fail or produce wrong phases."""
+	issues: List[str] = []
+	for name in EVENT_NAMES:
+		if name not in events or not events[name].frames:
+			issues.append(f'The trial does not contain a "{name}". Please return to Nexus and add one.')
+		elif np.any(np.diff(events[name].frames) <= 0):
+			issues.append(f'The "{name}" events are not in increasing order or have duplicates.')
+		elif name.endswith('Strike') and len(events[name].frames) < 2:
+			issues.append(f'The trial needs two "{name}" events to delimit a gait cycle.')
+	if issues:
+		return issues
+
+	left_leg = Leg('L', {}, events['Left Foot Strike'], events['Left Foot Off'])
+	right_leg = Leg('R', {}, events['Right Foot Strike'], events['Right Foot Off'])
+	is_left_foot_first = left_leg.strike_event.frames[0] <= right_leg.strike_event.frames[0]
+	for primary_leg, secondary_leg, is_primary_leg_first in ((left_leg, right_leg, is_left_foot_first), (right_leg, left_leg, not is_left_foot_first)):
+		if not is_primary_leg_first and (len(secondary_leg.strike_event.frames) < 2 or len(secondary_leg.off_event.frames) < 2):
+			issues.append(f'The {secondary_leg} needs a second Foot Strike and Foot Off within the {primary_leg} gait cycle.')
+			continue
+
+		phases = get_cycle_phases(primary_leg, secondary_leg, is_primary_leg_first)
+		frames = [primary_leg.strike_event.frames[0], phases['Monopodal'], phases['Bipodal'], phases['Balance'], primary_leg.strike_event.frames[1]]
+		if np.any(np.diff(frames) <= 0):
+			issues.append(f'The {primary_leg} gait cycle events are out of order (frames {", ".join(str(frame + start_frame) for frame in frames)}). '
+						  f'Expected {primary_leg} Strike < {primary_leg} Off < {secondary_leg} Strike < {secondary_leg} Off < {primary_leg} Strike. '
+						  f'Please check the events in Nexus.')
+	return issues
+
+
+class TrialQualityReport:
+	"""
+	Pre-flight check of a trial, run on the markers and events before the reports are computed.
+	Frames are relative to the start of the trial region of interest, messages use the Nexus frames.
+	"""
+
+	def __init__(self, markers: Dict[str, Marker], events: Dict[str, Event], frame_rate: float, start_frame: int = 0):
+		self.missing_markers: List[str] = []
+		# Intervals of [start, end) frames, as N x 2 arrays, for the markers or marker pairs that have any
+		self.gaps: Dict[str, np.ndarray] = {}
+		self.spikes: Dict[str, np.ndarray] = {}
+		self.swaps: Dict[str, np.ndarray] = {}
+		self.issues: List[QualityIssue] = []
+		self._make(markers, events, frame_rate, start_frame)
+
+	@property
+	def errors(self) -> List[QualityIssue]:
+		return [issue for issue in self.issues if issue.level == ERROR]
+
+	@property
+	def warnings(self) -> List[QualityIssue]:
+		return [issue for issue in self.issues if issue.level == WARNING]
+
+	@property
+	def is_valid(self) -> bool:
+		return not self.errors
+
+	def _make(self, markers: Dict[str, Marker], events: Dict[str, Event], frame_rate: float, start_frame: int):
+		self.missing_markers = [side + name for side in 'LR' for name in REQUIRED_MARKERS if side + name not in markers]
+		for name in self.missing_markers:
+			self.issues.append(QualityIssue(ERROR, f'The marker "{name}" is missing from the trial.'))
+		self.issues.extend(QualityIssue(ERROR, message) for message in get_event_issues(events, start_frame))
+		if not markers:
+			return
+
+		# All markers in one array, so every check is a single sweep over markers x frames
+		names = list(markers)
+		exists = np.array([np.asarray(marker.is_exist_trajectory, dtype=bool) for marker in markers.values()])
+		trajectories = np.array([marker.trajectory for marker in markers.values()])
+
+		self.gaps = split_intervals(names, *get_runs(~exists))
+		speeds = np.linalg.norm(np.diff(trajectories, axis=1), axis=2) * frame_rate
+		rows, starts, ends = get_runs(exists[:, 1:] & exists[:, :-1] & (speeds > MAX_MARKER_SPEED))
+		# A speed is between a frame and the next one, the spike is at the next one
+		self.spikes = split_intervals(names, rows, starts + 1, ends + 1)
+		self._find_swaps(names, exists, trajectories)
+
+		analysed_cycles = self._get_analysed_cycles(events)
+		for name, intervals in self.gaps.items():
+			cycle = analysed_cycles.get(name[:1].upper())
+			is_required = name[1:].upper() in REQUIRED_MARKERS and name[:1].upper() in 'LR'
+			# The reports read the markers of the analysed cycle, where a gap gives zero coordinates and wrong results
+			in_cycle = (intervals[:, 0] <= cycle[1]) & (intervals[:, 1] > cycle[0]) if is_required and cycle is not None else np.zeros(0, dtype=bool)
+			if np.any(in_cycle):
+				self.issues.append(QualityIssue(ERROR, f'The marker "{name}" has gaps in the analysed gait cycle '
+													   f'({self._format_intervals(intervals[in_cycle], start_frame)}). Please fill the gaps in Nexus.'))
+			else:
+				self.issues.append(QualityIssue(WARNING, f'The marker "{name}" has {len(intervals)} gaps ({self._format_intervals(intervals, start_frame)}).'))
+		for name, intervals in self.spikes.items():
+			self.issues.append(QualityIssue(WARNING, f'The marker "{name}" moves faster than {MAX_MARKER_SPEED} mm/s '
+													 f'({self._format_intervals(intervals, start_frame)}).'))
+		for name, intervals in self.swaps.items():
+			self.issues.append(QualityIssue(WARNING, f'The markers "L{name}" and "R{name}" are likely swapped ({self._format_intervals(intervals, start_frame)}).'))
+
+	def _find_swaps(self, names: List[str], exists: np.ndarray, trajectories: np.ndarray):
+		indices = {name.upper(): i for i, name in enumerate(names)}
+		if not all(name in indices for name in ('LASI', 'RASI', 'LPSI', 'RPSI')):
+			return
+
+		left_axes, valid = get_left_axes({name: trajectories[i] for name, i in indices.items()}, {name: exists[i] for name, i in indices.items()})
+		pairs = [name[1:] for name in indices if name.startswith('L') and 'R' + name[1:] in indices]
+		left_indices = [indices['L' + pair] for pair in pairs]
+		right_indices = [indices['R' + pair] for pair in pairs]
+		# A left marker that is on the right of its right pair, relative to the pelvis
+		lateral = np.einsum('pfi,fi->pf', trajectories[left_indices] - trajectories[right_indices], left_axes)
+		swapped = (lateral < 0) & valid & exists[left_indices] & exists[right_indices]
+		self.swaps = split_intervals(pairs, *get_runs(swapped))
+
+	@staticmethod
+	def _get_analysed_cycles(events: Dict[str, Event]) -> Dict[str, Tuple[int, int]]:
+		cycles: Dict[str, Tuple[int, int]] = {}
+		for side, name in (('L', 'Left Foot Strike'), ('R', 'Right Foot Strike')):
+			if name in events and len(events[name].frames) >= 2:
+				cycles[side] = (events[name].frames[0], events[name].frames[1])
+		return cycles
+
+	@staticmethod
+	def _format_intervals(intervals: np.ndarray, start_frame: int, limit: int = 5) -> str:
+		text = ', '.join(f'{start + start_frame}' if end - start == 1 else f'{start + start_frame}-{end - 1 + start_frame}'
+						 for start, end in intervals[:limit].tolist())
+		return text + (f' and {len(intervals) - limit} more' if len(intervals) > limit else '')
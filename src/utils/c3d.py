@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import os
+import struct
+from typing import List, Dict, Tuple, Optional, Any
+
+import numpy as np
+
+from src.utils.vicon_nexus import Marker, Event, Channel, Output, Device
+
+BLOCK_SIZE = 512
+PROCESSOR_INTEL = 84
+PROCESSOR_DEC = 85
+PROCESSOR_MIPS = 86
+
+
+def _dec_to_ieee(values: np.ndarray) -> np.ndarray:
+	"""Convert DEC (VAX F) floats read as little-endian float32 into IEEE floats."""
+	words = values.view(np.uint32)
+	swapped = ((words >> 16) | (words << 16)).astype(np.uint32)
+	return swapped.view(np.float32) / 4
+
+
+def _read_parameter_value(buffer: np.ndarray, position: int, data_type: int, dimensions: Tuple[int, ...], byte_order: str, is_dec: bool) -> Any:
+	count = int(np.prod(dimensions)) if dimensions else 1
+	size = abs(data_type) * count
+	raw = buffer[position:position + size]
+
+	if data_type == -1:
+		text = raw.tobytes().decode('latin-1')
+		if len(dimensions) < 2:
+			return text.strip()
+		length = dimensions[0]
+		return [text[i:i + length].strip() for i in range(0, len(text), length)]
+
+	if data_type == 1:
+		values = np.frombuffer(raw, dtype=np.int8)
+	elif data_type == 2:
+		values = np.frombuffer(raw, dtype=f'{byte_order}i2')
+	elif is_dec:
+		values = _dec_to_ieee(np.frombuffer(raw, dtype='<f4'))
+	else:
+		values = np.frombuffer(raw, dtype=f'{byte_order}f4')
+
+	if not dimensions:
+		return values[0].item()
+	return values.reshape(dimensions, order='F')
+
+
+def read_parameters(buffer: np.ndarray, parameters_offset: int, byte_order: str, is_dec: bool) -> Dict[str, Dict[str, Any]]:
+	groups: Dict[int, str] = {}
+	values: List[Tuple[int, str, Any]] = []
+	position = parameters_offset + 4
+
+	while position + 2 < len(buffer):
+		name_length = abs(int(buffer[position:position + 1].view(np.int8)[0]))
+		group_id = int(buffer[position + 1:position + 2].view(np.int8)[0])
+		if name_length == 0:
+			break
+
+		name = buffer[position + 2:position + 2 + name_length].tobytes().decode('latin-1').upper()
+		offset_position = position + 2 + name_length
+		next_offset = struct.unpack_from(f'{byte_order}h', buffer, offset_position)[0]
+		body = offset_position + 2
+
+		if group_id < 0:
+			groups[-group_id] = name
+		else:
+			data_type = int(buffer[body:body + 1].view(np.int8)[0])
+			dimensions_count = int(buffer[body + 1])
+			dimensions = tuple(int(d) for d in buffer[body + 2:body + 2 + dimensions_count])
+			value = _read_parameter_value(buffer, body + 2 + dimensions_count, data_type, dimensions, byte_order, is_dec)
+			values.append((group_id, name, value))
+
+		if next_offset == 0:
+			break
+		position = offset_position + next_offset
+
+	parameters: Dict[str, Dict[str, Any]] = {name: {} for name in groups.values()}
+	for group_id, name, value in values:
+		parameters.setdefault(groups.get(group_id, str(group_id)), {})[name] = value
+
+	return parameters
+
+
+def _as_list(value: Any) -> List[str]:
+	if value is None:
+		return []
+	if isinstance(value, str):
+		return [value] if value else []
+	return list(value)
+
+
+def _as_uint32(words: Any) -> int:
+	words = np.asarray(words, dtype=np.int64).ravel() & 0xFFFF
+	return int(words[0] + (words[1] << 16)) if len(words) > 1 else int(words[0])
+
+
+class C3DFile:
+	"""Reads a C3D file and exposes it through the same calls MotionReport makes on ViconNexusAPI."""
+
+	def __init__(self, file_path: str, marker_names: Optional[List[str]] = None, channel_names: Optional[List[str]] = None):
+		self.file_path = file_path
+		self.marker_names = marker_names
+		self.channel_names = channel_names
+		self._buffer: np.ndarray = np.memmap(file_path, dtype=np.uint8, mode='r')
+		self.parameters: Dict[str, Dict[str, Any]] = {}
+		self._frames: np.ndarray = None
+		self._make()
+
+	def _make(self) -> None:
+		parameters_block = int(self._buffer[0])
+		if self._buffer[1] != 0x50:
+			raise ValueError(f'"{self.file_path}" is not a C3D file.')
+
+		parameters_offset = (parameters_block - 1) * BLOCK_SIZE
+		processor = int(self._buffer[parameters_offset + 3])
+		if processor not in (PROCESSOR_INTEL, PROCESSOR_DEC, PROCESSOR_MIPS):
+			raise ValueError(f'"{self.file_path}" has an unknown processor type ({processor}).')
+
+		self.byte_order = '>' if processor == PROCESSOR_MIPS else '<'
+		self.is_dec = processor == PROCESSOR_DEC
+		self.parameters = read_parameters(self._buffer, parameters_offset, self.byte_order, self.is_dec)
+
+		header = self._buffer[:BLOCK_SIZE]
+		point_count, analog_per_frame, first_frame, last_frame = struct.unpack_from(f'{self.byte_order}4H', header, 2)
+		data_block = struct.unpack_from(f'{self.byte_order}H', header, 16)[0]
+		samples_per_frame = struct.unpack_from(f'{self.byte_order}H', header, 18)[0]
+		scale, frame_rate = self._header_float(12), self._header_float(20)
+
+		self.point_scale: float = self._parameter('POINT', 'SCALE', scale)
+		self.frame_rate: float = self._parameter('POINT', 'RATE', frame_rate)
+		self.point_count: int = self._parameter('POINT', 'USED', point_count) & 0xFFFF
+		self.first_frame: int = first_frame
+		self.last_frame: int = last_frame
+		if 'ACTUAL_START_FIELD' in self.parameters.get('TRIAL', {}):
+			self.first_frame = _as_uint32(self.parameters['TRIAL']['ACTUAL_START_FIELD'])
+			self.last_frame = _as_uint32(self.parameters['TRIAL']['ACTUAL_END_FIELD'])
+
+		self.analog_count: int = self._parameter('ANALOG', 'USED', analog_per_frame // samples_per_frame if samples_per_frame else 0) & 0xFFFF
+		self.analog_samples_per_frame: int = samples_per_frame if self.analog_count else 0
+		self.analog_rate: float = self._parameter('ANALOG', 'RATE', self.frame_rate * self.analog_samples_per_frame)
+
+		is_float = self.point_scale < 0
+		data_start = (self._parameter('POINT', 'DATA_START', data_block) & 0xFFFF) - 1
+		point_type = np.dtype(f'{self.byte_order}f4') if is_float else np.dtype(f'{self.byte_order}i2')
+		analog_type = point_type
+		if not is_float and str(self._parameter('ANALOG', 'FORMAT', 'SIGNED')).upper() == 'UNSIGNED':
+			analog_type = np.dtype(f'{self.byte_order}u2')
+
+		frame_dtype = np.dtype([('points', point_type, (self.point_count, 4)),
+								('analog', analog_type, (self.analog_samples_per_frame, self.analog_count))])
+		frame_count = self.last_frame - self.first_frame + 1
+		available_frames = (len(self._buffer) - data_start * BLOCK_SIZE) // frame_dtype.itemsize
+		self._frames = np.frombuffer(self._buffer, dtype=frame_dtype, count=min(frame_count, available_frames), offset=data_start * BLOCK_SIZE)
+
+	def _header_float(self, offset: int) -> float:
+		value = np.frombuffer(self._buffer[offset:offset + 4], dtype=f'{self.byte_order}f4')
+		return float(_dec_to_ieee(value)[0] if self.is_dec else value[0])
+
+	def _parameter(self, group: str, name: str, default: Any = None) -> Any:
+		value = self.parameters.get(group, {}).get(name, default)
+		if isinstance(value, np.ndarray) and value.size == 1:
+			return value.item()
+		return value
+
+	def _labels(self, group: str, name: str) -> List[str]:
+		labels = _as_list(self.parameters.get(group, {}).get(name))
+		index = 2
+		while f'{name}{index}' in self.parameters.get(group, {}):
+			labels.extend(_as_list(self.parameters[group][f'{name}{index}']))
+			index += 1
+		return labels
+
+	def _points(self, indices: List[int], dtype: np.dtype = np.float64) -> Tuple[np.ndarray, np.ndarray]:
+		points = self._frames['points'][:, indices, :]
+		# Only the floats of DEC files need converting, integer points are plain little-endian int16
+		if self.is_dec and points.dtype.kind == 'f':
+			points = _dec_to_ieee(np.ascontiguousarray(points))
+		coordinates = points[:, :, :3].astype(dtype)
+		if self.point_scale > 0:
+			coordinates *= self.point_scale
+		return coordinates, points[:, :, 3] >= 0
+
+	def _analog(self, indices: List[int]) -> np.ndarray:
+		analog = self._frames['analog'][:, :, indices]
+		if self.is_dec and analog.dtype.kind == 'f':
+			analog = _dec_to_ieee(np.ascontiguousarray(analog))
+		return analog.reshape(-1, len(indices))
+
+	def _subject_prefix(self, subject_name: str) -> str:
+		names = self._labels('SUBJECTS', 'NAMES')
+		prefixes = self._labels('SUBJECTS', 'LABEL_PREFIXES')
+		if subject_name in names and self._parameter('SUBJECTS', 'USES_PREFIXES', 1) and len(prefixes) == len(names):
+			return prefixes[names.index(subject_name)]
+		return ''
+
+	def GetFrameRate(self) -> float:
+		return self.frame_rate
+
+	def GetTrialRegionOfInterest(self) -> Tuple[int, int]:
+		return self.first_frame, self.first_frame + len(self._frames) - 1
+
+	def GetSubjectNames(self) -> List[str]:
+		names = self._labels('SUBJECTS', 'NAMES')
+		return names if names else [os.path.splitext(os.path.basename(self.file_path))[0]]
+
+	def GetMarkerNames(self, subject_name: str) -> List[str]:
+		prefix = self._subject_prefix(subject_name)
+		names = [label[len(prefix):] for label in self._labels('POINT', 'LABELS')[:self.point_count] if label.startswith(prefix)]
+		if self.marker_names is not None:
+			names = [name for name in names if name in self.marker_names]
+		return names
+
+	def GetTrajectory(self, subject_name: str, marker_name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+		labels = self._labels('POINT', 'LABELS')
+		coordinates, exists = self._points([labels.index(self._subject_prefix(subject_name) + marker_name)])
+		return coordinates[:, 0, 0], coordinates[:, 0, 1], coordinates[:, 0, 2], exists[:, 0]
+
+	def GetMarkers(self, subject_name: str, dtype: np.dtype = np.float64) -> Dict[str, Marker]:
+		prefix = self._subject_prefix(subject_name)
+		labels = self._labels('POINT', 'LABELS')
+		marker_names = self.GetMarkerNames(subject_name)
+		coordinates, exists = self._points([labels.index(prefix + name) for name in marker_names], dtype)
+
+		markers: Dict[str, Marker] = {}
+		for i, marker_name in enumerate(marker_names):
+			marker_trajectory = (coordinates[:, i, 0], coordinates[:, i, 1], coordinates[:, i, 2], exists[:, i])
+			markers[marker_name] = Marker(marker_name, marker_trajectory, 1, len(self._frames), dtype)
+
+		return markers
+
+	def GetEvents(self, subject_name: str, context: str, event: str) -> Tuple[List[int], List[float]]:
+		group = self.parameters.get('EVENT', {})
+		labels = _as_list(group.get('LABELS'))
+		contexts = _as_list(group.get('CONTEXTS'))
+		subjects = _as_list(group.get('SUBJECTS'))
+		times = np.asarray(group.get('TIMES', np.zeros((2, 0))), dtype=np.float64).reshape(2, -1)
+		seconds = times[0] * 60 + times[1]
+		used = min(int(self._parameter('EVENT', 'USED', len(labels))), len(labels), seconds.shape[0])
+
+		frames: List[int] = []
+		offsets: List[float] = []
+		for i in np.argsort(seconds[:used], kind='stable'):
+			if labels[i] != event or contexts[i] != context:
+				continue
+			if subjects and subjects[i] and subjects[i] != subject_name:
+				continue
+			frame = int(round(seconds[i] * self.frame_rate)) + 1
+			frames.append(frame)
+			offsets.append(float(seconds[i] - (frame - 1) / self.frame_rate))
+
+		return frames, offsets
+
+	def GetEvent(self, subject_name: str, context: str, event: str) -> Event:
+		frames, offsets = self.GetEvents(subject_name, context, event)
+		return Event(context, event, frames, offsets)
+
+	def GetDevices(self, dtype: np.dtype = None) -> Dict[str, Device]:
+		labels = self._labels('ANALOG', 'LABELS')[:self.analog_count]
+		descriptions = self._labels('ANALOG', 'DESCRIPTIONS')
+		units = self._labels('ANALOG', 'UNITS')
+		indices = [i for i, label in enumerate(labels) if self.channel_names is None or label in self.channel_names]
+		if not indices:
+			return {}
+
+		scales = np.ones(self.analog_count) * self._parameter('ANALOG', 'GEN_SCALE', 1.0)
+		offsets = np.zeros(self.analog_count)
+		scales *= np.resize(np.asarray(self.parameters.get('ANALOG', {}).get('SCALE', 1.0), dtype=np.float64).ravel(), self.analog_count)
+		offsets += np.resize(np.asarray(self.parameters.get('ANALOG', {}).get('OFFSET', 0), dtype=np.float64).ravel(), self.analog_count)
+		analog = self._analog(indices)
+		if dtype is not None:
+			analog, offsets, scales = analog.astype(dtype), offsets.astype(dtype), scales.astype(dtype)
+		analog = (analog - offsets[indices]) * scales[indices]
+
+		device_channels: Dict[str, List[Channel]] = {}
+		device_units: Dict[str, str] = {}
+		for column, index in enumerate(indices):
+			device_name = descriptions[index] if index < len(descriptions) and descriptions[index] else 'Analog'
+			unit = units[index] if index < len(units) else 'Unknown'
+			data = analog[:, column]
+			channel = Channel(index + 1, labels[index], True, self.analog_rate, data, 0, len(data) - 1, unit)
+			device_channels.setdefault(device_name, []).append(channel)
+			device_units.setdefault(device_name, unit)
+
+		devices: Dict[str, Device] = {}
+		for device_id, (device_name, channels) in enumerate(device_channels.items(), start=1):
+			output = Output(1, device_name, 'Analog', device_units[device_name], True, channels)
+			devices[f"{device_id} {device_name}"] = Device(device_id, device_name, 'Analog', self.analog_rate, [output])
+
+		return devices
+
+
+if __name__ == '__main__':
+	import sys
+
+	for path in sys.argv[1:]:
+		c3d = C3DFile(path)
+		print(f'{path}: {c3d.point_count} markers, {c3d.analog_count} analog channels, '
+			  f'frames {c3d.GetTrialRegionOfInterest()} at {c3d.frame_rate} Hz')
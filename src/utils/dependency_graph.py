@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import threading
+from typing import List, Dict, Tuple, Callable, Any, Optional
+
+
+class DependencyGraph:
+	"""
+	Lazily computed values with explicit dependencies.
+
+	Every value has a version that is increased only when the value changes. A node is recomputed when the versions of
+	its dependencies differ from the ones it was computed with, so a change stops propagating as soon as a node produces
+	a value with the same fingerprint as before. Nodes can be requested from several threads; each node is computed once.
+	"""
+
+	def __init__(self):
+		self._computes: Dict[str, Callable[..., Any]] = {}
+		self._dependencies: Dict[str, List[str]] = {}
+		self._fingerprints: Dict[str, Optional[Callable[[Any], Any]]] = {}
+		self._values: Dict[str, Any] = {}
+		self._value_fingerprints: Dict[str, Any] = {}
+		self._versions: Dict[str, int] = {}
+		self._computed_with: Dict[str, Tuple[int, ...]] = {}
+		self._locks: Dict[str, threading.Lock] = {}
+		self.recomputed: List[str] = []
+
+	def add_source(self, name: str, fingerprint: Callable[[Any], Any] = None) -> None:
+		self._dependencies[name] = []
+		self._fingerprints[name] = fingerprint
+		self._versions[name] = 0
+		self._locks[name] = threading.Lock()
+
+	def add_node(self, name: str, compute: Callable[..., Any], dependencies: List[str], fingerprint: Callable[[Any], Any] = None) -> None:
+		for dependency in dependencies:
+			if dependency not in self._dependencies:
+				raise ValueError(f'"{name}" depends on "{dependency}", which is not part of the graph.')
+
+		self._computes[name] = compute
+		self._dependencies[name] = list(dependencies)
+		self._fingerprints[name] = fingerprint
+		self._versions[name] = 0
+		self._locks[name] = threading.Lock()
+
+	def set(self, name: str, value: Any) -> bool:
+		if name in self._computes:
+			raise ValueError(f'"{name}" is computed by the graph and can not be set.')
+		with self._locks[name]:
+			return self._store(name, value)
+
+	def get(self, name: str) -> Any:
+		if name in self._computes:
+			for dependency in self._dependencies[name]:
+				self.get(dependency)
+			self.compute(name)
+		return self._values[name]
+
+	def compute(self, name: str) -> bool:
+		"""Recompute a single node, assuming its dependencies are up to date. Returns True if the node was recomputed."""
+		dependencies = self._dependencies[name]
+		with self._locks[name]:
+			versions = tuple(self._versions[dependency] for dependency in dependencies)
+			if self._computed_with.get(name) == versions and name in self._values:
+				return False
+
+			value = self._computes[name](*(self._values[dependency] for dependency in dependencies))
+			self._computed_with[name] = versions
+			self._store(name, value)
+			self.recomputed.append(name)
+			return True
+
+	def is_stale(self, name: str) -> bool:
+		if name not in self._computes:
+			return name not in self._values
+		if name not in self._values or any(self.is_stale(dependency) for dependency in self._dependencies[name]):
+			return True
+		return self._computed_with.get(name) != tuple(self._versions[dependency] for dependency in self._dependencies[name])
+
+	def dependencies(self, name: str) -> List[str]:
+		return list(self._dependencies[name])
+
+	def dependants(self, name: str) -> List[str]:
+		dependants: List[str] = []
+		for node, dependencies in self._dependencies.items():
+			if name in dependencies:
+				dependants.append(node)
+				dependants.extend(dependant for dependant in self.dependants(node) if dependant not in dependants)
+		return dependants
+
+	def nodes(self) -> List[str]:
+		return list(self._dependencies)
+
+	def _store(self, name: str, value: Any) -> bool:
+		fingerprint = self._fingerprints[name](value) if self._fingerprints[name] else None
+		changed = name not in self._values or fingerprint is None or fingerprint != self._value_fingerprints.get(name)
+		self._values[name] = value
+		if changed:
+			self._value_fingerprints[name] = fingerprint
+			self._versions[name] += 1
+		return changed
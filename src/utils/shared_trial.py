@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import os
+import sys
+import threading
+import warnings
+from multiprocessing import shared_memory, resource_tracker
+from multiprocessing.reduction import ForkingPickler
+from typing import List, Dict, Tuple, NamedTuple, Optional, Any
+
+import numpy as np
+
+from src.utils.vicon_nexus import Marker, Channel, Device
+
+# Every array starts at a multiple of this many bytes of its block, so the views are aligned for any dtype
+ALIGNMENT = 64
+
+
+class SharedArrayHandle(NamedTuple):
+	"""Where an array lies in a shared memory block; another process maps it from this without copying its data."""
+	block_name: str
+	offset: int
+	shape: Tuple[int, ...]
+	strides: Tuple[int, ...]
+	dtype: str
+
+
+class _SharedMemory(shared_memory.SharedMemory):
+	def __del__(self) -> None:
+		# The blocks are kept in _blocks or _released_blocks until they can be closed, so a block still used by some
+		# arrays only gets here when it is dropped without close() or when the interpreter exits. The arrays keep it
+		# mapped until they are gone; only its descriptor is closed here
+		try:
+			super().__del__()
+		except BufferError:
+			warnings.warn(f'Shared memory block {self.name} deleted while some arrays still use it', ResourceWarning)
+			if os.name == 'posix' and self._fd >= 0:
+				os.close(self._fd)
+				self._fd = -1
+
+
+# Blocks whose arrays are sent as handles, with the address of their first byte: the blocks created by this process
+# and the blocks it attached to
+_blocks: Dict[str, Tuple[shared_memory.SharedMemory, int]] = {}
+_owned_blocks: set = set()
+# Closed blocks that are still mapped because some arrays use them; they are unmapped once these arrays are gone
+_released_blocks: List[shared_memory.SharedMemory] = []
+_lock = threading.Lock()
+_is_enabled = False
+
+
+def _open(name: str) -> shared_memory.SharedMemory:
+	if sys.version_info >= (3, 13):
+		# Only the process that created a block frees it
+		return _SharedMemory(name=name, track=False)
+	return _SharedMemory(name=name)
+
+
+def _register(block: shared_memory.SharedMemory) -> None:
+	_blocks[block.name] = (block, np.frombuffer(block.buf, dtype=np.uint8).ctypes.data)
+
+
+def _view(block: shared_memory.SharedMemory, offset: int, shape: Tuple[int, ...], strides: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+	# Unlike np.ndarray(buffer=...), np.frombuffer keeps the buffer of the block exported while the view lives, so the
+	# block cannot be unmapped under it
+	low = sum(min(0, (length - 1) * stride) for length, stride in zip(shape, strides))
+	high = sum(max(0, (length - 1) * stride) for length, stride in zip(shape, strides)) + dtype.itemsize
+	data = np.frombuffer(block.buf, dtype=np.uint8, count=high - low, offset=offset + low)
+	return np.ndarray(shape, dtype, buffer=data, offset=-low, strides=strides)
+
+
+def _try_close(block: shared_memory.SharedMemory) -> bool:
+	try:
+		block.close()
+		return True
+	except BufferError:
+		return False
+
+
+def _release_unused(keep: str = '') -> None:
+	# Called with _lock held. The blocks attached for earlier tasks are unmapped once no array of theirs is left
+	for name in [name for name in _blocks if name not in _owned_blocks and name != keep]:
+		if _try_close(_blocks[name][0]):
+			del _blocks[name]
+	_released_blocks[:] = [block for block in _released_blocks if not _try_close(block)]
+
+
+def get_handle(array: np.ndarray) -> Optional[SharedArrayHandle]:
+	"""The handle of an array (or of any view of it) placed in a shared block, None for an array in private memory."""
+	if not array.size:
+		return None
+	address = array.__array_interface__['data'][0]
+	for name, (block, start) in list(_blocks.items()):
+		if start <= address < start + block.size:
+			return SharedArrayHandle(name, address - start, array.shape, array.strides, array.dtype.str)
+	return None
+
+
+def attach(handle: SharedArrayHandle) -> np.ndarray:
+	"""Read-only view of a shared array, mapping its block the first time one of its arrays is attached."""
+	with _lock:
+		if handle.block_name not in _blocks:
+			_release_unused(handle.block_name)
+			_register(_open(handle.block_name))
+		block = _blocks[handle.block_name][0]
+	array = _view(block, handle.offset, handle.shape, handle.strides, np.dtype(handle.dtype))
+	array.flags.writeable = False
+	return array
+
+
+def _reduce_array(array: np.ndarray) -> Tuple[Any, ...]:
+	handle = get_handle(array) if _blocks else None
+	if handle is None:
+		return array.__reduce__()
+	return attach, (handle,)
+
+
+def enable_shared_arrays() -> None:
+	"""
+	Send the arrays placed in a shared block as their handles when a process pool pickles them (alone or inside a
+	Marker, a Channel or a functools.partial); other arrays are still sent by copy. Nothing changes until it is called:
+	SharedTrialMemory calls it, and so does the pipeline before it starts its own process pool. Call it before creating
+	a pool that will receive shared arrays.
+	"""
+	global _is_enabled
+	with _lock:
+		if _is_enabled:
+			return
+		if os.name == 'posix' and sys.version_info < (3, 13):
+			# Before Python 3.13 attaching a block also registers it with the resource tracker. Workers forked before
+			# the tracker runs would start their own, which unlinks the blocks they attached to when the worker exits;
+			# started before the pools are created, the tracker is shared by all the processes
+			resource_tracker.ensure_running()
+		# Process pools pickle the task arguments with the ForkingPickler itself, so the reducer cannot be limited to
+		# a subclass of it
+		ForkingPickler.register(np.ndarray, _reduce_array)
+		_is_enabled = True
+
+
+class SharedTrialMemory:
+	"""
+	Moves the marker trajectories and the channel samples of a trial into one shared memory block. The markers and
+	channels keep their values but use views of the block, so a process pool only receives their handles and the
+	workers map the data instead of copying it. Arrays that are already shared are left where they are.
+	"""
+
+	def __init__(self, markers: Dict[str, Marker] = None, devices: Dict[str, Device] = None):
+		self.markers: Dict[str, Marker] = markers or {}
+		self.channels: List[Channel] = [channel for device in (devices or {}).values() for output in device.outputs for channel in output.channels]
+		self.block: Optional[shared_memory.SharedMemory] = None
+		self.size: int = 0
+		self.arrays_count: int = 0
+
+		enable_shared_arrays()
+		self._make()
+
+	def _make(self) -> None:
+		arrays = []
+		for marker in self.markers.values():
+			arrays.append((marker, 'trajectory', np.asarray(marker.trajectory)))
+			arrays.append((marker, 'is_exist_trajectory', np.asarray(marker.is_exist_trajectory, dtype=bool)))
+		for channel in self.channels:
+			# Nexus channels fetched without a dtype hold the list it returned
+			arrays.append((channel, 'data', np.asarray(channel.data)))
+		arrays = [(owner, attribute, array) for owner, attribute, array in arrays if array.size and get_handle(array) is None]
+
+		offsets = []
+		for _, _, array in arrays:
+			offsets.append(self.size)
+			self.size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+		if not arrays:
+			return
+
+		self.block = _SharedMemory(create=True, size=self.size)
+		for (owner, attribute, array), offset in zip(arrays, offsets):
+			view = np.frombuffer(self.block.buf, dtype=array.dtype, count=array.size, offset=offset).reshape(array.shape)
+			view[...] = array
+			setattr(owner, attribute, view)
+		self.arrays_count = len(arrays)
+		with _lock:
+			_register(self.block)
+			_owned_blocks.add(self.block.name)
+
+	def close(self) -> None:
+		"""
+		Free the block. The markers and channels stay valid: the block is only unmapped once no array uses it, but
+		their arrays are sent by copy again from now on.
+		"""
+		if self.block is None:
+			return
+		with _lock:
+			del _blocks[self.block.name]
+			_owned_blocks.discard(self.block.name)
+			self.block.unlink()
+			if not _try_close(self.block):
+				_released_blocks.append(self.block)
+			_release_unused()
+		self.block = None
+
+	def __enter__(self) -> 'SharedTrialMemory':
+		return self
+
+	def __exit__(self, *exception) -> None:
+		self.close()
+
+	def __str__(self) -> str:
+		return f'{self.arrays_count} arrays, {self.size / 2 ** 20:.2f} MB in {self.block.name if self.block else "no block"}'
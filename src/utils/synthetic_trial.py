@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+from src.utils.vicon_nexus import Marker, Event, Channel, Output, Device
+
+# Height above the floor and forward offset from the pelvis of every marker, in mm
+MARKER_POSITIONS = {'ASI': (100, 950), 'PSI': (-100, 950), 'THI': (20, 700), 'KNE': (0, 500),
+					'TIB': (10, 300), 'ANK': (0, 100), 'HEE': (-50, 50), 'TOE': (150, 40)}
+
+
+class SyntheticTrial:
+	"""
+	Deterministic walking trial generated from a seed, with the same calls MotionReport makes on ViconNexusAPI.
+	Used to run and compare the reports offline, without Nexus or recorded files.
+	"""
+
+	def __init__(self, seed: int = 0, seconds: float = 4.0, frame_rate: float = 100.0, analog_rate: float = 1000.0, channels_count: int = 4,
+				 speed: float = 1000.0, noise: float = 0.3, subject_name: str = 'Synthetic'):
+		self.seed = seed
+		self.frame_rate = frame_rate
+		self.analog_rate = analog_rate
+		self.subject_name = subject_name
+		self.frames_count = int(seconds * frame_rate)
+		self.trajectories: Dict[str, np.ndarray] = {}
+		self.events: Dict[Tuple[str, str], List[int]] = {}
+		self.channels: Dict[str, np.ndarray] = {}
+		self._make(seconds, channels_count, speed, noise)
+
+	def _make(self, seconds: float, channels_count: int, speed: float, noise: float):
+		generator = np.random.default_rng(self.seed)
+		times = np.arange(self.frames_count) / self.frame_rate
+		# Each subject walks with a slightly different cadence and amplitude
+		cycle_seconds = 1 + 0.05 * generator.standard_normal()
+		amplitude = 80 * (1 + 0.1 * generator.standard_normal())
+		for side, lateral, phase in (('L', 100, 0), ('R', -100, np.pi)):
+			swing = np.sin(2 * np.pi * times / cycle_seconds + phase)
+			lift = np.cos(2 * np.pi * times / cycle_seconds + phase)
+			for name, (forward, height) in MARKER_POSITIONS.items():
+				marker_amplitude = 5 if name in ('ASI', 'PSI') else amplitude * (950 - height) / 900
+				trajectory = np.column_stack((speed * times + forward + marker_amplitude * swing, np.full(self.frames_count, lateral),
+											  height + 10 * lift * (height < 600)))
+				self.trajectories[side + name] = trajectory + generator.normal(0, noise, trajectory.shape)
+
+		# Events as placed in Nexus (see the README): the Foot Off of a track is the other foot lifting off
+		for context, strike, off in (('Left', 0.1, 0.2), ('Right', 0.6, 0.7)):
+			starts = np.arange(0, seconds, cycle_seconds)
+			for event, offset in (('Foot Strike', strike), ('Foot Off', off)):
+				frames = np.round((starts + offset * cycle_seconds) * self.frame_rate).astype(int) + 1
+				self.events[(context, event)] = [int(frame) for frame in frames if frame < self.frames_count - 5]
+
+		samples = self.frames_count * int(self.analog_rate / self.frame_rate)
+		analog_times = np.arange(samples) / self.analog_rate
+		for i in range(channels_count):
+			# Bursts of activity once per cycle, at a different moment for each muscle
+			is_active = np.sin(2 * np.pi * analog_times / cycle_seconds + i) > 0.5
+			self.channels[f'EMG{i + 1}'] = generator.normal(0, 0.01, samples) * (1 + 5 * is_active)
+
+	def GetFrameRate(self) -> float:
+		return self.frame_rate
+
+	def GetTrialRegionOfInterest(self) -> Tuple[int, int]:
+		return 1, self.frames_count
+
+	def GetSubjectNames(self) -> List[str]:
+		return [self.subject_name]
+
+	def GetMarkerNames(self, subject_name: str) -> List[str]:
+		return list(self.trajectories)
+
+	def GetMarkers(self, subject_name: str, dtype: np.dtype = np.float64) -> Dict[str, Marker]:
+		exists = np.ones(self.frames_count, dtype=bool)
+		return {name: Marker(name, (trajectory[:, 0], trajectory[:, 1], trajectory[:, 2], exists), 1, self.frames_count, dtype)
+				for name, trajectory in self.trajectories.items()}
+
+	def GetEvent(self, subject_name: str, context: str, event: str) -> Event:
+		return Event(context, event, list(self.events.get((context, event), [])), [0.0] * len(self.events.get((context, event), [])))
+
+	def GetDevices(self, dtype: np.dtype = None) -> Dict[str, Device]:
+		channels = [Channel(i + 1, name, True, self.analog_rate, data, 0, len(data) - 1, 'V', dtype) for i, (name, data) in enumerate(self.channels.items())]
+		if not channels:
+			return {}
+		return {'1 EMG': Device(1, 'EMG', 'EMG', self.analog_rate, [Output(1, 'EMG', 'EMG', 'V', True, channels)])}
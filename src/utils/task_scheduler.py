@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Tuple, Callable, Any, Optional
+
+
+class Task:
+	def __init__(self, name: str, function: Callable[..., Any], dependencies: List[str], lock: Optional[str] = None):
+		self.name: str = name
+		self.function: Callable[..., Any] = function
+		self.dependencies: List[str] = dependencies
+		self.lock: Optional[str] = lock
+
+	def __str__(self) -> str:
+		return self.name
+
+
+class TaskTiming:
+	def __init__(self, name: str, ready: float, start: float, end: float, worker: str):
+		self.name: str = name
+		self.ready: float = ready
+		self.start: float = start
+		self.end: float = end
+		self.worker: str = worker
+
+	@property
+	def duration(self) -> float:
+		return self.end - self.start
+
+	def __str__(self) -> str:
+		return f'{self.name}: {self.start:.3f} s - {self.end:.3f} s ({self.duration:.3f} s, {self.worker})'
+
+
+class SchedulerReport:
+	def __init__(self, total_duration: float, timings: Dict[str, TaskTiming], critical_path: List[str]):
+		self.total_duration: float = total_duration
+		self.timings: Dict[str, TaskTiming] = timings
+		self.critical_path: List[str] = critical_path
+
+	@property
+	def critical_path_duration(self) -> float:
+		return sum(self.timings[name].duration for name in self.critical_path)
+
+	def __str__(self) -> str:
+		lines = [str(timing) for timing in sorted(self.timings.values(), key=lambda timing: timing.start)]
+		lines.append(f'Total: {self.total_duration:.3f} s')
+		lines.append(f'Critical path ({self.critical_path_duration:.3f} s): {" -> ".join(self.critical_path)}')
+		return '\n'.join(lines)
+
+
+def _run_task(function: Callable[..., Any], arguments: List[Any]) -> Tuple[Any, float, float, str]:
+	start = time.perf_counter()
+	result = function(*arguments)
+	end = time.perf_counter()
+	worker = threading.current_thread().name if multiprocessing.parent_process() is None else multiprocessing.current_process().name
+	return result, start, end, worker
+
+
+class TaskScheduler:
+	"""
+	Runs tasks as a DAG on a pool of workers. A task receives the results of its dependencies as positional arguments,
+	in the order the dependencies were given. Tasks that share a lock name never run at the same time, which is used for
+	resources that can not be called concurrently (e.g. the Nexus connection). Any executor can be used; with a process
+	pool the task functions and their results must be picklable.
+	"""
+
+	def __init__(self, max_workers: int = 4, executor: Executor = None):
+		self.max_workers = max_workers
+		self.executor = executor
+		self.tasks: Dict[str, Task] = {}
+		self.report: SchedulerReport = None
+
+	def add_task(self, name: str, function: Callable[..., Any], dependencies: List[str] = None, lock: Optional[str] = None) -> None:
+		if name in self.tasks:
+			raise ValueError(f'Task "{name}" is already scheduled.')
+		for dependency in dependencies or []:
+			if dependency not in self.tasks:
+				raise ValueError(f'Task "{name}" depends on "{dependency}", which must be added first.')
+
+		self.tasks[name] = Task(name, function, list(dependencies or []), lock)
+
+	def run(self) -> Dict[str, Any]:
+		executor = self.executor if self.executor is not None else ThreadPoolExecutor(max_workers=self.max_workers)
+		results: Dict[str, Any] = {}
+		timings: Dict[str, TaskTiming] = {}
+		ready_times: Dict[str, float] = {}
+		remaining: Dict[str, set] = {name: set(task.dependencies) for name, task in self.tasks.items()}
+		dependants: Dict[str, List[str]] = {name: [] for name in self.tasks}
+		for name, task in self.tasks.items():
+			for dependency in task.dependencies:
+				dependants[dependency].append(name)
+
+		origin = time.perf_counter()
+		futures: Dict[Future, str] = {}
+		busy_locks: set = set()
+		waiting: List[str] = []
+
+		def submit(name: str) -> None:
+			task = self.tasks[name]
+			ready_times.setdefault(name, time.perf_counter() - origin)
+			if task.lock is not None:
+				if task.lock in busy_locks:
+					waiting.append(name)
+					return
+				busy_locks.add(task.lock)
+			arguments = [results[dependency] for dependency in task.dependencies]
+			futures[executor.submit(_run_task, task.function, arguments)] = name
+
+		try:
+			for name in [name for name, dependencies in remaining.items() if not dependencies]:
+				submit(name)
+
+			while futures:
+				done, _ = wait(futures, return_when=FIRST_COMPLETED)
+				for future in done:
+					name = futures.pop(future)
+					result, start, end, worker = future.result()
+					results[name] = result
+					timings[name] = TaskTiming(name, ready_times[name], start - origin, end - origin, worker)
+
+					lock = self.tasks[name].lock
+					if lock is not None:
+						busy_locks.discard(lock)
+						next_task = next((waiting_name for waiting_name in waiting if self.tasks[waiting_name].lock == lock), None)
+						if next_task is not None:
+							waiting.remove(next_task)
+							submit(next_task)
+
+					for dependant in dependants[name]:
+						remaining[dependant].discard(name)
+						if not remaining[dependant]:
+							submit(dependant)
+		except BaseException:
+			for future in futures:
+				future.cancel()
+			raise
+		finally:
+			if self.executor is None:
+				executor.shutdown(wait=True)
+
+		self.report = SchedulerReport(time.perf_counter() - origin, timings, self._get_critical_path(timings))
+		return results
+
+	def _get_critical_path(self, timings: Dict[str, TaskTiming]) -> List[str]:
+		if not timings:
+			return []
+
+		# Walk back from the task that finished last, each time through whatever kept the task from starting earlier:
+		# the dependency that finished last, or the task that held the same lock right before it
+		path = [max(timings.values(), key=lambda timing: timing.end).name]
+		while True:
+			task = self.tasks[path[-1]]
+			candidates = [timings[dependency] for dependency in task.dependencies]
+			if task.lock is not None:
+				candidates.extend(timing for name, timing in timings.items()
+								  if self.tasks[name].lock == task.lock and timing.end <= timings[task.name].start and name not in path)
+			if not candidates:
+				break
+			path.append(max(candidates, key=lambda timing: timing.end).name)
+
+		return path[::-1]
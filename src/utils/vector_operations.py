@@ -8,29 +8,30 @@ Created on June 2024
 import numpy as np
 
 
-def calculate_angles(vectors1: np.ndarray, vectors2: np.ndarray) -> np.ndarray:
+def calculate_angles(vectors1: np.ndarray, vectors2: np.ndarray, dtype: np.dtype = None) -> np.ndarray:
 	"""
 	Returnează unghiurile în radiani dintre vectorii corespunzători din două liste de vectori.
 
 	Parameters:
 	vectors1 (np.ndarray): Prima listă de vectori.
 	vectors2 (np.ndarray): A doua listă de vectori.
+	dtype (np.dtype): Precizia calculului (float32 sau float64). Implicit, cea a vectorilor.
 
 	Returns:
 	np.ndarray: Lista cu unghiurile în radiani dintre vectorii corespunzători.
 	"""
-	vectors1 = np.array(vectors1)
-	vectors2 = np.array(vectors2)
+	vectors1 = np.asarray(vectors1, dtype=dtype)
+	vectors2 = np.asarray(vectors2, dtype=dtype)
 
 	dot_products = np.einsum('ij,ij->i', vectors1, vectors2)  # Calculate dot products
+	cross_norms = np.linalg.norm(np.cross(vectors1, vectors2), axis=1)  # Calculate norms of cross products
 
-	norms_a = np.linalg.norm(vectors1, axis=1)  # Calculate norms of vectors_a
-	norms_b = np.linalg.norm(vectors2, axis=1)  # Calculate norms of vectors_b
+	# atan2 keeps the precision near 0 and 180 degrees, where arccos of the cosine loses it (mostly in float32)
+	angles = np.arctan2(cross_norms, dot_products)  # Calculate angles in radians
 
-	cos_angles = dot_products / (norms_a * norms_b)  # Calculate cosines of angles
-	cos_angles = np.clip(cos_angles, -1.0, 1.0)  # Clip values to avoid numerical errors
-
-	angles = np.arccos(cos_angles)  # Calculate angles in radians
+	# Angles with a zero length vector are undefined
+	is_zero_vector = (np.linalg.norm(vectors1, axis=1) == 0) | (np.linalg.norm(vectors2, axis=1) == 0)
+	angles[is_zero_vector] = np.nan
 
 	return angles
 
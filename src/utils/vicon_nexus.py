@@ -12,12 +12,12 @@ from viconnexusapi import ViconNexus
 
 
 class Marker:
-    def __init__(self, name: str, marker_trajectory: tuple, start_frame: int, end_frame: int):
+    def __init__(self, name: str, marker_trajectory: tuple, start_frame: int, end_frame: int, dtype: np.dtype = np.float64):
         self.name: str = name
         self.is_exist_trajectory: List[bool] = marker_trajectory[3][start_frame - 1:end_frame + 1]
         self.trajectory = np.column_stack((marker_trajectory[0][start_frame - 1:end_frame + 1],
                                              marker_trajectory[1][start_frame - 1:end_frame + 1],
-                                             marker_trajectory[2][start_frame - 1:end_frame + 1]))
+                                             marker_trajectory[2][start_frame - 1:end_frame + 1])).astype(dtype, copy=False)
 
     def __str__(self) -> str:
         return self.name
@@ -35,14 +35,15 @@ class Event:
 
 
 class Channel:
-    def __init__(self, id: int, name: str, ready: bool, rate: int, data: List[int], start_frame: int, end_frame: int, unit: str):
+    def __init__(self, id: int, name: str, ready: bool, rate: int, data: List[int], start_frame: int, end_frame: int, unit: str, dtype: np.dtype = None):
         self.id: int = id
         self.name: str = name
         self.ready: bool = ready
         self.rate: int = rate
         self.start_frame: int = start_frame
         self.end_frame: int = end_frame
-        self.data: List[int] = data[start_frame:end_frame + 1]
+        # With a dtype the samples are kept as a numpy array instead of the list returned by Nexus
+        self.data: List[int] = data[start_frame:end_frame + 1] if dtype is None else np.asarray(data[start_frame:end_frame + 1], dtype=dtype)
         self.unit: str = unit
 
     def __str__(self) -> str:
@@ -78,13 +79,13 @@ class ViconNexusAPI(ViconNexus.ViconNexus):
     def __init__(self, host='localhost'):
         super().__init__(host)
 
-    def GetMarkers(self, subject_name: str) -> Dict[str, Marker]:
+    def GetMarkers(self, subject_name: str, dtype: np.dtype = np.float64) -> Dict[str, Marker]:
         start_frame, end_frame = self.GetTrialRegionOfInterest()
         markers: Dict[str, Marker] = {}
 
         for marker_name in self.GetMarkerNames(subject_name):
             marker_trajectory = self.GetTrajectory(subject_name, marker_name)
-            markers[marker_name] = Marker(marker_name, marker_trajectory, start_frame, end_frame)
+            markers[marker_name] = Marker(marker_name, marker_trajectory, start_frame, end_frame, dtype)
 
         return markers
 
@@ -92,27 +93,27 @@ class ViconNexusAPI(ViconNexus.ViconNexus):
         events: List[List[int], List[float]] = self.GetEvents(subject_name, context, event)
         return Event(context, event, events[0], events[1])
 
-    def GetDevices(self) -> Dict[str, Device]:
+    def GetDevices(self, dtype: np.dtype = None) -> Dict[str, Device]:
         device_ids: List[int] = self.GetDeviceIDs()
         devices: Dict[str, Device] = {}
 
         for device_id in device_ids:
-            device = self.GetDevice(device_id)
+            device = self.GetDevice(device_id, dtype)
             devices[f"{device_id} {device.name}"] = device
 
         return devices
 
-    def GetDevice(self, device_id: int) -> Device:
+    def GetDevice(self, device_id: int, dtype: np.dtype = None) -> Device:
         device_name, device_type, device_rate, output_ids, _, _ = self.GetDeviceDetails(device_id)
-        device_outputs: List[Output] = [self.GetOutput(output_id, device_id) for output_id in output_ids]
+        device_outputs: List[Output] = [self.GetOutput(output_id, device_id, dtype) for output_id in output_ids]
         return Device(device_id, device_name, device_type, device_rate, device_outputs)
 
-    def GetOutput(self, output_id: int, device_id: int) -> Output:
+    def GetOutput(self, output_id: int, device_id: int, dtype: np.dtype = None) -> Output:
         output_name, output_type, output_unit, output_ready, channel_names, channel_ids = self.GetDeviceOutputDetails(device_id, output_id)
-        output_channels: List[Channel] = [self.GetChannel(device_id, output_id, channel_id, channel_name, output_unit) for channel_id, channel_name in zip(channel_ids, channel_names)]
+        output_channels: List[Channel] = [self.GetChannel(device_id, output_id, channel_id, channel_name, output_unit, dtype) for channel_id, channel_name in zip(channel_ids, channel_names)]
         return Output(output_id, output_name, output_type, output_unit, output_ready, output_channels)
 
-    def GetChannel(self, device_id: int, output_id: int, channel_id: int, channel_name: str, unit: str = 'Unknown') -> Channel:
+    def GetChannel(self, device_id: int, output_id: int, channel_id: int, channel_name: str, unit: str = 'Unknown', dtype: np.dtype = None) -> Channel:
         start_frame, end_frame = self.GetTrialRegionOfInterest()
         channel_data, channel_ready, channel_rate = self.GetDeviceChannel(device_id, output_id, channel_id)
 
@@ -120,4 +121,4 @@ class ViconNexusAPI(ViconNexus.ViconNexus):
         start_index = int(start_frame * channel_rate / recording_rate)
         end_index = int(end_frame * channel_rate / recording_rate)
 
-        return Channel(channel_id, channel_name, channel_ready, channel_rate, channel_data, start_index, end_index, unit)
+        return Channel(channel_id, channel_name, channel_ready, channel_rate, channel_data, start_index, end_index, unit, dtype)
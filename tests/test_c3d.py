@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import struct
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+
+from src.utils.c3d import C3DFile, BLOCK_SIZE, PROCESSOR_INTEL, PROCESSOR_DEC, PROCESSOR_MIPS
+
+BYTE_ORDERS = {PROCESSOR_INTEL: '<', PROCESSOR_DEC: '<', PROCESSOR_MIPS: '>'}
+FRAME_RATE = 100.0
+FIRST_FRAME = 10
+FRAMES_COUNT = 5
+MARKER_NAMES = ['LASI', 'RASI']
+CHANNEL_NAMES = ['EMG1', 'EMG2']
+SAMPLES_PER_FRAME = 2
+# Integer files store the coordinates divided by POINT:SCALE
+INTEGER_SCALE = 0.5
+ANALOG_SCALES = [0.5, 2.0]
+ANALOG_OFFSETS = [0, 10]
+ANALOG_GEN_SCALE = 0.1
+# Label, context and time from the start of the capture (frame 1), out of order
+EVENTS = [('Foot Strike', 'Left', 0.12), ('Foot Strike', 'Left', 0.101), ('Foot Off', 'Left', 0.11), ('Foot Strike', 'Right', 0.13)]
+
+
+def encode_floats(values, processor: int) -> bytes:
+	values = np.asarray(values, dtype=np.float32).ravel()
+	if processor == PROCESSOR_DEC:
+		# VAX F floats are IEEE floats times 4 with their two 16-bit words swapped
+		words = (values * 4).view(np.uint32)
+		return ((words >> 16) | (words << 16)).astype('<u4').tobytes()
+	return values.astype(f'{BYTE_ORDERS[processor]}f4').tobytes()
+
+
+def make_group(group_id: int, name: str) -> Tuple[int, str, bytes]:
+	return -group_id, name, b'\x00'
+
+
+def make_parameter(group_id: int, name: str, processor: int, values, data_type: int = None) -> Tuple[int, str, bytes]:
+	byte_order = BYTE_ORDERS[processor]
+	if isinstance(values, str):
+		values = [values]
+	if isinstance(values, list) and values and isinstance(values[0], str):
+		length = max(len(value) for value in values)
+		data = ''.join(value.ljust(length) for value in values).encode('latin-1')
+		dimensions = (length,) if len(values) == 1 else (length, len(values))
+		body = struct.pack('bB', -1, len(dimensions)) + bytes(dimensions) + data
+	else:
+		array = np.asarray(values)
+		dimensions = array.shape
+		# Multi-dimensional values are stored with the first dimension varying fastest
+		flat = array.ravel(order='F')
+		if data_type == 2:
+			data = flat.astype(f'{byte_order}i2').tobytes()
+		else:
+			data = encode_floats(flat, processor)
+		body = struct.pack('bB', data_type, len(dimensions)) + bytes(dimensions) + data
+	return group_id, name, body + b'\x00'
+
+
+def make_parameters_block(records: List[Tuple[int, str, bytes]], processor: int) -> bytes:
+	block = bytearray(struct.pack('BBBB', 1, 0x50, 1, processor))
+	for i, (group_id, name, body) in enumerate(records):
+		# The offset counts from its own first byte to the next record, 0 ends the section
+		next_offset = 0 if i == len(records) - 1 else 2 + len(body)
+		block += struct.pack('bb', len(name), group_id) + name.encode('latin-1') + struct.pack(f'{BYTE_ORDERS[processor]}h', next_offset) + body
+	assert len(block) <= BLOCK_SIZE
+	return bytes(block.ljust(BLOCK_SIZE, b'\x00'))
+
+
+def get_points() -> np.ndarray:
+	"""Known coordinates and residuals: frames x markers x (x, y, z, residual), the second marker missing on frame 2."""
+	points = np.zeros((FRAMES_COUNT, len(MARKER_NAMES), 4))
+	for frame in range(FRAMES_COUNT):
+		for marker in range(len(MARKER_NAMES)):
+			points[frame, marker] = (10 * frame + marker, 100 + frame, 200 + 5 * marker, 2)
+	points[2, 1, 3] = -1
+	return points
+
+
+def get_analog() -> np.ndarray:
+	"""Raw samples: (frames x samples per frame) x channels."""
+	return np.arange(FRAMES_COUNT * SAMPLES_PER_FRAME * len(CHANNEL_NAMES)).reshape(-1, len(CHANNEL_NAMES)) * 3 - 20
+
+
+def write_c3d(path: str, processor: int, is_float: bool, first_frame: int = FIRST_FRAME, actual_start_field: int = None) -> None:
+	byte_order = BYTE_ORDERS[processor]
+	scale = -INTEGER_SCALE if is_float else INTEGER_SCALE
+	points = get_points()
+	if not is_float:
+		points[:, :, :3] /= INTEGER_SCALE
+
+	records = [make_group(1, 'POINT'),
+			   make_parameter(1, 'USED', processor, len(MARKER_NAMES), 2),
+			   make_parameter(1, 'SCALE', processor, scale, 4),
+			   make_parameter(1, 'RATE', processor, FRAME_RATE, 4),
+			   make_parameter(1, 'DATA_START', processor, 3, 2),
+			   make_parameter(1, 'LABELS', processor, MARKER_NAMES),
+			   make_group(2, 'ANALOG'),
+			   make_parameter(2, 'USED', processor, len(CHANNEL_NAMES), 2),
+			   make_parameter(2, 'RATE', processor, FRAME_RATE * SAMPLES_PER_FRAME, 4),
+			   make_parameter(2, 'GEN_SCALE', processor, ANALOG_GEN_SCALE, 4),
+			   make_parameter(2, 'SCALE', processor, ANALOG_SCALES, 4),
+			   make_parameter(2, 'OFFSET', processor, ANALOG_OFFSETS, 2),
+			   make_parameter(2, 'LABELS', processor, CHANNEL_NAMES),
+			   make_parameter(2, 'UNITS', processor, ['V', 'V']),
+			   make_group(3, 'EVENT'),
+			   make_parameter(3, 'USED', processor, len(EVENTS), 2),
+			   make_parameter(3, 'LABELS', processor, [label for label, _, _ in EVENTS]),
+			   make_parameter(3, 'CONTEXTS', processor, [context for _, context, _ in EVENTS]),
+			   make_parameter(3, 'TIMES', processor, np.array([[0, seconds] for _, _, seconds in EVENTS]).T, 4)]
+	if actual_start_field is not None:
+		# 32-bit frame numbers are stored as two 16-bit words, low word first
+		end_field = actual_start_field + FRAMES_COUNT - 1
+		records += [make_group(4, 'TRIAL'),
+					make_parameter(4, 'ACTUAL_START_FIELD', processor, [actual_start_field & 0xFFFF, actual_start_field >> 16], 2),
+					make_parameter(4, 'ACTUAL_END_FIELD', processor, [end_field & 0xFFFF, end_field >> 16], 2)]
+
+	header = bytearray(BLOCK_SIZE)
+	header[0:2] = bytes((2, 0x50))
+	struct.pack_into(f'{byte_order}4H', header, 2, len(MARKER_NAMES), SAMPLES_PER_FRAME * len(CHANNEL_NAMES), first_frame & 0xFFFF,
+					 (first_frame + FRAMES_COUNT - 1) & 0xFFFF)
+	header[12:16] = encode_floats([scale], processor)
+	struct.pack_into(f'{byte_order}2H', header, 16, 3, SAMPLES_PER_FRAME)
+	header[20:24] = encode_floats([FRAME_RATE], processor)
+
+	analog = get_analog().reshape(FRAMES_COUNT, -1)
+	data = bytearray()
+	for frame in range(FRAMES_COUNT):
+		if is_float:
+			data += encode_floats(points[frame], processor) + encode_floats(analog[frame], processor)
+		else:
+			data += points[frame].astype(f'{byte_order}i2').tobytes() + analog[frame].astype(f'{byte_order}i2').tobytes()
+
+	with open(path, 'wb') as file:
+		file.write(bytes(header) + make_parameters_block(records, processor) + bytes(data))
+
+
+FORMATS = [(processor, is_float) for processor in (PROCESSOR_INTEL, PROCESSOR_DEC, PROCESSOR_MIPS) for is_float in (True, False)]
+FORMAT_IDS = [f'{name}-{"float" if is_float else "int"}' for name in ('intel', 'dec', 'mips') for is_float in (True, False)]
+
+
+@pytest.fixture(params=FORMATS, ids=FORMAT_IDS)
+def c3d(request, tmp_path) -> C3DFile:
+	processor, is_float = request.param
+	path = str(tmp_path / 'trial.c3d')
+	write_c3d(path, processor, is_float)
+	return C3DFile(path)
+
+
+def test_header_and_parameters(c3d: C3DFile):
+	assert c3d.frame_rate == FRAME_RATE
+	assert c3d.point_count == len(MARKER_NAMES)
+	assert c3d.analog_count == len(CHANNEL_NAMES)
+	assert c3d.analog_rate == FRAME_RATE * SAMPLES_PER_FRAME
+	assert c3d.GetMarkerNames('trial') == MARKER_NAMES
+	assert c3d.GetTrialRegionOfInterest() == (FIRST_FRAME, FIRST_FRAME + FRAMES_COUNT - 1)
+
+
+def test_markers_and_residual_masks(c3d: C3DFile):
+	points = get_points()
+	markers = c3d.GetMarkers('trial')
+	for i, name in enumerate(MARKER_NAMES):
+		np.testing.assert_allclose(markers[name].trajectory, points[:, i, :3])
+		np.testing.assert_array_equal(markers[name].is_exist_trajectory, points[:, i, 3] >= 0)
+	assert not markers['RASI'].is_exist_trajectory[2]
+
+
+def test_analog_scaling(c3d: C3DFile):
+	channels = {channel.name: channel for device in c3d.GetDevices().values() for output in device.outputs for channel in output.channels}
+	analog = get_analog()
+	for i, name in enumerate(CHANNEL_NAMES):
+		expected = (analog[:, i] - ANALOG_OFFSETS[i]) * ANALOG_SCALES[i] * ANALOG_GEN_SCALE
+		np.testing.assert_allclose(channels[name].data, expected, rtol=1e-6)
+
+
+def test_event_frames(c3d: C3DFile):
+	# Times count from frame 1 of the capture, so the frames are in the numbering of the region of interest
+	frames, offsets = c3d.GetEvents('trial', 'Left', 'Foot Strike')
+	assert frames == [11, 13]
+	assert offsets == pytest.approx([0.001, 0.0], abs=1e-6)
+	assert c3d.GetEvents('trial', 'Left', 'Foot Off')[0] == [12]
+	assert c3d.GetEvents('trial', 'Right', 'Foot Strike')[0] == [14]
+
+
+def test_region_of_interest_beyond_16_bits(tmp_path):
+	path = str(tmp_path / 'long.c3d')
+	write_c3d(path, PROCESSOR_INTEL, True, first_frame=1, actual_start_field=70000)
+	assert C3DFile(path).GetTrialRegionOfInterest() == (70000, 70000 + FRAMES_COUNT - 1)
+
+
+def test_not_a_c3d_file(tmp_path):
+	path = tmp_path / 'text.c3d'
+	path.write_bytes(b'not a c3d file'.ljust(BLOCK_SIZE, b' '))
+	with pytest.raises(ValueError):
+		C3DFile(str(path))
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.reports.emg_activation_report import EmgActivationReport
+from src.utils.vicon_nexus import Event, Channel
+
+FRAME_RATE = 100
+ANALOG_RATE = 1000
+CYCLE_FRAMES = 100
+CYCLES_COUNT = 10
+# Burst of every channel, in % of the cycle
+BURSTS = [(20, 50), (55, 80)]
+TOLERANCE_PERCENT = 3
+
+
+def make_leg(context: str, first_frame: int) -> SimpleNamespace:
+	frames = [first_frame + i * CYCLE_FRAMES for i in range(CYCLES_COUNT + 1)]
+	return SimpleNamespace(strike_event=Event(context, 'Foot Strike', frames, [0.0] * len(frames)))
+
+
+def make_channel(index: int, bursts, seed: int) -> Channel:
+	generator = np.random.default_rng(seed)
+	samples = (CYCLES_COUNT + 2) * CYCLE_FRAMES * ANALOG_RATE // FRAME_RATE
+	# Cycle percentage of every sample, for cycles starting at frame 50 of the left leg
+	percent = ((np.arange(samples) * FRAME_RATE / ANALOG_RATE - 50) % CYCLE_FRAMES) * 100 / CYCLE_FRAMES
+	is_active = np.zeros(samples, dtype=bool)
+	for onset, offset in bursts:
+		is_active |= (percent >= onset) & (percent < offset)
+	data = generator.normal(0, 0.01, samples) * (1 + 5 * is_active)
+	return Channel(index, f'EMG{index + 1}', True, ANALOG_RATE, data, 0, samples - 1, 'V', np.float64)
+
+
+@pytest.fixture
+def report() -> EmgActivationReport:
+	channels = [make_channel(i, [burst], seed=i) for i, burst in enumerate(BURSTS)] + [make_channel(len(BURSTS), [], seed=len(BURSTS))]
+	return EmgActivationReport(channels, make_leg('Left', 50), make_leg('Right', 100), FRAME_RATE)
+
+
+def test_one_interval_per_cycle_at_the_burst(report: EmgActivationReport):
+	for channel, (onset, offset) in enumerate(BURSTS):
+		for cycle in range(CYCLES_COUNT):
+			intervals = report.get_intervals(channel, 'L', cycle)
+			assert len(intervals) == 1, (channel, cycle, intervals)
+			assert intervals[0][0] == pytest.approx(onset, abs=TOLERANCE_PERCENT)
+			assert intervals[0][1] == pytest.approx(offset, abs=TOLERANCE_PERCENT)
+
+
+def test_no_interval_on_a_resting_channel(report: EmgActivationReport):
+	assert not np.any(report.activations['channel'] == len(BURSTS))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import os
+import tracemalloc
+
+import numpy as np
+
+from src.report_pipeline import generate_report
+from src.reports.gait_index_report import get_cycle_curves, iterate_cycle_curves
+from src.reports.motion_report import MotionReport
+from src.utils.synthetic_trial import SyntheticTrial
+
+REFERENCE_ANGLES_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'exports', 'Unghiurile_Perry.xlsx')
+
+
+def make_report(seconds: float) -> MotionReport:
+	trial = SyntheticTrial(seed=0, seconds=seconds, channels_count=0)
+	return MotionReport(trial, trial.subject_name, REFERENCE_ANGLES_FILE_PATH)
+
+
+def get_peak_memory(report: MotionReport) -> int:
+	"""Peak memory of the gait indices and of a pass over the whole trial angles, as the exporters make it."""
+	tracemalloc.start()
+	try:
+		report.get_gait_index_report()
+		for _ in report.iterate_all_frames_angles():
+			pass
+		return tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+
+def test_cycle_windows_match_the_whole_trial_curves():
+	report = make_report(30)
+	basis = report.graph.get('gait_index_basis')
+	for leg in report.graph.get('strike_legs'):
+		expected = basis.score(get_cycle_curves(report.get_all_frames_angles(leg.side), leg.strike_event.frames))
+		# Small windows split the cycles into many groups
+		scores = [basis.score(curves) for curves in iterate_cycle_curves(leg, chunk_frames=250)]
+		for expected_values, values in zip(expected, zip(*scores)):
+			np.testing.assert_allclose(np.concatenate(values), expected_values, atol=1e-10)
+		np.testing.assert_allclose(report.get_gait_index_report().gait_profile_scores[leg.side], expected[1], atol=1e-10)
+
+
+def test_peak_memory_does_not_grow_with_the_recording():
+	# Both trials are longer than a window of ALL_FRAMES_CHUNK frames, the second one four times longer
+	short_report, long_report = make_report(700), make_report(2800)
+	short_peak, long_peak = get_peak_memory(short_report), get_peak_memory(long_report)
+	assert long_peak < 1.1 * short_peak, (short_peak, long_peak)
+	assert long_report.graph.is_stale('all_frames_angles')
+
+
+def test_pipeline_does_not_materialize_the_whole_trial_angles(tmp_path):
+	trial = SyntheticTrial(seed=0)
+	report, _ = generate_report(trial, trial.subject_name, REFERENCE_ANGLES_FILE_PATH, 'report', str(tmp_path), max_workers=1)
+	assert report.get_gait_index_report().gait_profile_scores['L'].size
+	assert report.graph.is_stale('all_frames_angles')
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import os
+
+import pytest
+
+from src.exporters import motion_report_pdf_exporter
+from src.reports.motion_report import MotionReport
+from src.utils.synthetic_trial import SyntheticTrial
+
+REFERENCE_ANGLES_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'exports', 'Unghiurile_Perry.xlsx')
+
+
+@pytest.fixture
+def trial() -> SyntheticTrial:
+	return SyntheticTrial(seed=0)
+
+
+@pytest.fixture
+def report(trial: SyntheticTrial) -> MotionReport:
+	return MotionReport(trial, trial.subject_name, REFERENCE_ANGLES_FILE_PATH)
+
+
+@pytest.fixture
+def render_count(monkeypatch) -> list:
+	calls = []
+	render_png = motion_report_pdf_exporter.render_png
+	monkeypatch.setattr(motion_report_pdf_exporter, 'render_png', lambda plot: calls.append(plot) or render_png(plot))
+	return calls
+
+
+def test_unchanged_trial_recomputes_nothing(report: MotionReport):
+	assert report.update() == []
+
+
+def test_moved_foot_off_recomputes_only_the_phases(trial: SyntheticTrial, report: MotionReport):
+	angles_report, left_phases = report.gait_angles_report, dict(report.gait_cycle_report.left_cycle_phases)
+	trial.events[('Left', 'Foot Off')][0] += 2
+	assert report.update() == ['trial_quality_report', 'legs', 'strike_events', 'gait_cycle_report']
+	assert report.gait_cycle_report.left_cycle_phases != left_phases
+	assert report.gait_angles_report is angles_report
+
+
+def test_moved_foot_strike_recomputes_the_angles(trial: SyntheticTrial, report: MotionReport):
+	trial.events[('Left', 'Foot Strike')][1] += 1
+	assert report.update() == ['trial_quality_report', 'legs', 'strike_events', 'strike_legs', 'gait_step_report', 'gait_cycle_report',
+							   'gait_angles_report']
+
+
+def test_figure_cache_is_reused_after_update(trial: SyntheticTrial, report: MotionReport, render_count: list, tmp_path):
+	motion_report_pdf_exporter.export(report, 'first', str(tmp_path))
+	assert len(render_count) == 2
+
+	# Only the phases of the left cycle move, so the right leg figure comes from the cache
+	trial.events[('Left', 'Foot Off')][0] += 2
+	report.update()
+	motion_report_pdf_exporter.export(report, 'second', str(tmp_path))
+	assert len(render_count) == 3
+	assert len(report.figure_cache) == 2
+
+
+def test_changed_region_of_interest_remakes_the_report(trial: SyntheticTrial, report: MotionReport, monkeypatch):
+	monkeypatch.setattr(trial, 'GetTrialRegionOfInterest', lambda: (2, trial.frames_count))
+	recomputed = report.update()
+	assert report.start_frame == 2
+	assert {'markers_by_side', 'strike_legs', 'gait_angles_report'} <= set(recomputed)
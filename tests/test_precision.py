@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from src.reports.motion_report import MotionReport
+from src.utils.synthetic_trial import SyntheticTrial
+
+REFERENCE_ANGLES_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'exports', 'Unghiurile_Perry.xlsx')
+# Largest angle deviation of the float32 path measured on our trials (see the README)
+FLOAT32_MAX_DEVIATION = 0.001
+
+
+def test_float32_angles_match_float64():
+	trial = SyntheticTrial(seed=0, seconds=10)
+	report = MotionReport(trial, trial.subject_name, REFERENCE_ANGLES_FILE_PATH, dtype=np.float32)
+	precision_report = report.check_precision()
+	assert precision_report.dtype == 'float32'
+	assert precision_report.max_deviations
+	assert precision_report.max_angle_deviation < FLOAT32_MAX_DEVIATION, str(precision_report)
+	assert precision_report.is_accurate
+
+
+@pytest.mark.parametrize('dtype', ['float16', 'int16', np.int32, 'complex128'])
+def test_other_dtypes_are_refused(dtype):
+	trial = SyntheticTrial(seed=0)
+	with pytest.raises(ValueError):
+		MotionReport(trial, trial.subject_name, REFERENCE_ANGLES_FILE_PATH, dtype=dtype)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src import report_service
+from src.report_service import ReportService, serve, submit_job, get_job, is_service_running, read_token, TOKEN_HEADER
+
+PARAMETERS = {'subject_name': 'Pat', 'reference_angles_file_path': 'reference.xlsx', 'report_name': 'Report', 'output_directory': 'exports'}
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+	monkeypatch.setattr(report_service, 'TOKEN_DIRECTORY', str(tmp_path))
+	# The workers are not started, so the jobs stay queued and no report is generated
+	server = serve(ReportService(), port=0)
+	thread = threading.Thread(target=server.serve_forever, daemon=True)
+	thread.start()
+	yield server
+	server.shutdown()
+	server.server_close()
+	thread.join()
+
+
+def post(server, body: bytes, headers: dict) -> int:
+	request = urllib.request.Request(f'http://127.0.0.1:{server.port}/jobs', data=body, headers=headers, method='POST')
+	try:
+		with urllib.request.urlopen(request, timeout=5) as response:
+			return response.status
+	except urllib.error.HTTPError as e:
+		return e.code
+
+
+def post_job(server, parameters, content_type: str = 'application/json', **headers) -> int:
+	return post(server, json.dumps(parameters).encode(), {TOKEN_HEADER: server.token, 'Content-Type': content_type, **headers})
+
+
+def test_token_file_is_private_and_removed(server):
+	assert read_token(server.port) == server.token
+	if os.name == 'posix':
+		assert os.stat(server.token_path).st_mode & 0o077 == 0
+	server.server_close()
+	assert not os.path.exists(server.token_path)
+
+
+def test_valid_job_is_accepted(server):
+	job = submit_job(PARAMETERS, server.port)
+	assert job['status'] == 'queued'
+	assert get_job(job['id'], server.port)['id'] == job['id']
+	assert is_service_running(server.port)
+
+
+def test_request_without_token_is_refused(server):
+	assert post(server, json.dumps(PARAMETERS).encode(), {'Content-Type': 'application/json'}) == 401
+	assert post_job(server, PARAMETERS, **{TOKEN_HEADER: 'wrong'}) == 401
+	assert not server.service.jobs
+
+
+def test_web_page_request_is_refused(server):
+	assert post_job(server, PARAMETERS, content_type='text/plain') == 415
+	assert post_job(server, PARAMETERS, Origin='http://evil.example') == 403
+	assert not server.service.jobs
+
+
+@pytest.mark.parametrize('parameters', [[], 'x', dict(PARAMETERS, report_name='../Report'), dict(PARAMETERS, report_name='a\\b'),
+										dict(PARAMETERS, precision='float16'), dict(PARAMETERS, precision='int16')])
+def test_invalid_job_is_refused(server, parameters):
+	assert post_job(server, parameters) == 400
+	assert not server.service.jobs
+
+
+def test_client_without_service(tmp_path, monkeypatch):
+	monkeypatch.setattr(report_service, 'TOKEN_DIRECTORY', str(tmp_path))
+	assert not is_service_running(port=1)
+	with pytest.raises(ConnectionError):
+		submit_job(PARAMETERS, port=1)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Created on October 2026
+
+@author: Ghimciuc Ioan
+"""
+
+import gc
+import os
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from multiprocessing.reduction import ForkingPickler
+
+import numpy as np
+import pytest
+
+from src.utils import shared_trial
+from src.utils.shared_trial import SharedTrialMemory, get_handle
+from src.utils.vicon_nexus import Marker
+
+FRAMES_COUNT = 10000
+ROOT_DIRECTORY = __file__.rsplit('tests', 1)[0]
+
+
+def make_marker() -> Marker:
+	frames = np.arange(FRAMES_COUNT, dtype=np.float64)
+	return Marker('LASI', (frames, 2 * frames, 3 * frames, [True] * FRAMES_COUNT), 1, FRAMES_COUNT)
+
+
+def describe(marker: Marker) -> tuple:
+	"""What the worker received: whether the trajectory is writeable, whether it is a view of a shared block, and its sum."""
+	trajectory = marker.trajectory
+	return trajectory.flags.writeable, trajectory.flags.owndata, get_handle(trajectory) is not None, float(trajectory.sum())
+
+
+def test_import_leaves_the_pickler_unchanged():
+	code = ('import numpy as np; import src.utils.shared_trial; from multiprocessing.reduction import ForkingPickler; '
+			'assert np.ndarray not in ForkingPickler._extra_reducers')
+	subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIRECTORY, check=True)
+
+
+def test_worker_receives_a_read_only_view():
+	marker = make_marker()
+	expected = float(marker.trajectory.sum())
+	with SharedTrialMemory({marker.name: marker}) as memory, ProcessPoolExecutor(max_workers=1) as pool:
+		assert get_handle(marker.trajectory).block_name == memory.block.name
+		# Only the handles are pickled, not the FRAMES_COUNT x 3 values
+		assert len(ForkingPickler.dumps(marker)) < marker.trajectory.nbytes / 10
+		writeable, owns_data, is_shared, total = pool.submit(describe, marker).result()
+	assert not writeable
+	assert not owns_data
+	assert is_shared
+	assert total == expected
+
+
+def test_close_with_live_views():
+	marker = make_marker()
+	expected = marker.trajectory.copy()
+	memory = SharedTrialMemory({marker.name: marker})
+	name = memory.block.name
+	view = marker.trajectory[::2]
+	memory.close()
+
+	# The block is unlinked, but stays mapped for the arrays that still use it, which are sent by copy from now on
+	if os.name == 'posix':
+		with pytest.raises(FileNotFoundError):
+			shared_memory.SharedMemory(name=name)
+	np.testing.assert_array_equal(marker.trajectory, expected)
+	np.testing.assert_array_equal(view, expected[::2])
+	assert get_handle(marker.trajectory) is None
+	assert [block.name for block in shared_trial._released_blocks] == [name]
+
+	# Once the arrays are gone, the next block closed unmaps it; that block is kept mapped for its own marker
+	del marker, view, memory
+	gc.collect()
+	other_memory = SharedTrialMemory({'RASI': make_marker()})
+	other_name = other_memory.block.name
+	other_memory.close()
+	assert [block.name for block in shared_trial._released_blocks] == [other_name]
+
+
+def test_deleted_block_in_use_warns():
+	block = shared_trial._SharedMemory(create=True, size=64)
+	block.unlink()
+	view = np.frombuffer(block.buf, dtype=np.uint8)
+	view_values = view.copy()
+	with pytest.warns(ResourceWarning):
+		block.__del__()
+	np.testing.assert_array_equal(view, view_values)
+	# Without arrays left, the block is unmapped without a warning
+	del view
+	gc.collect()
+	block.close()